@@ -1,5 +1,7 @@
 from platon_aide.main import Aide
+from platon_aide.async_main import AsyncAide
 
 __all__ = [
     "Aide",
+    "AsyncAide",
 ]
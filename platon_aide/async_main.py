@@ -0,0 +1,360 @@
+import asyncio
+import functools
+import itertools
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Literal, Union
+
+import aiohttp
+from loguru import logger
+from platon._utils.empty import empty
+from platon._utils.inner_contract import InnerContractFunction
+from platon._utils.method_formatters import receipt_formatter
+from platon._utils.rpc_abi import RPC
+from platon.datastructures import AttributeDict
+from platon.exceptions import TimeExhausted
+from platon.method import Method
+from platon.middleware.gplaton_poa import gplaton_poa_cleanup
+from platon.module import apply_result_formatters
+from platon_utils import add_0x_prefix
+
+from platon_aide.base.module import Module, PendingTransaction, defer_receipt
+from platon_aide.economic import Economic
+from platon_aide.main import Aide
+
+# 区块查询的结果在同步请求中经过gplaton_poa中间件的处理，异步请求不经过中间件，需要单独处理
+POA_METHODS = (RPC.platon_getBlockByHash, RPC.platon_getBlockByNumber)
+
+
+class AsyncRPC:
+    """ 基于aiohttp的异步JSON-RPC客户端，支持http和websocket链接
+    """
+
+    def __init__(self, uri: str, timeout=10):
+        if not uri.startswith('http') and not uri.startswith('ws'):
+            raise ValueError(f'unidentifiable uri {uri}')
+
+        self.uri = uri
+        self.timeout = timeout
+        self._session = None
+        self._ws = None
+        self._ws_lock = None
+        self._reader = None
+        self._futures = {}
+        self._counter = itertools.count()
+
+    async def _get_session(self):
+        if not self._session or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+
+    async def _get_ws(self):
+        self._ws_lock = self._ws_lock or asyncio.Lock()
+        async with self._ws_lock:
+            if not self._ws or self._ws.closed:
+                session = await self._get_session()
+                self._ws = await session.ws_connect(self.uri)
+                self._reader = asyncio.ensure_future(self._read(self._ws))
+        return self._ws
+
+    async def _read(self, ws):
+        """ 读取websocket消息，并按请求id分发响应
+        """
+        async for message in ws:
+            if message.type != aiohttp.WSMsgType.TEXT:
+                continue
+            response = json.loads(message.data)
+            future = self._futures.pop(response.get('id'), None)
+            if future and not future.done():
+                future.set_result(response)
+
+        for future in self._futures.values():
+            if not future.done():
+                future.set_exception(ConnectionError('the websocket connection is closed'))
+        self._futures.clear()
+
+    async def send(self, method, params=None) -> dict:
+        """ 发送RPC请求，并返回完整的响应
+        """
+        request = {
+            "jsonrpc": "2.0",
+            "bech32": True,
+            "method": method,
+            "params": params or [],
+            "id": next(self._counter),
+        }
+
+        if self.uri.startswith('ws'):
+            ws = await self._get_ws()
+            future = asyncio.get_running_loop().create_future()
+            self._futures[request['id']] = future
+            await ws.send_str(json.dumps(request))
+            response = await asyncio.wait_for(future, self.timeout)
+        else:
+            session = await self._get_session()
+            async with session.post(self.uri, json=request) as resp:
+                resp.raise_for_status()
+                response = await resp.json(content_type=None)
+        return response
+
+    async def request(self, method, params=None):
+        """ 发送RPC请求，并返回请求结果
+        """
+        response = await self.send(method, params)
+        if 'error' in response:
+            raise ValueError(response['error'])
+        return response['result']
+
+    async def close(self):
+        if self._ws and not self._ws.closed:
+            await self._ws.close()
+        if self._session and not self._session.closed:
+            await self._session.close()
+
+
+class AsyncModule:
+    """ 模块的异步代理，模块中的方法都会成为可等待的协程方法，用法与同步模块一致，如：
+    await aide.transfer.transfer(to_address, amount)
+    """
+
+    def __init__(self, aide: "AsyncAide", module: Module):
+        self._aide = aide
+        self._module = module
+
+    def __repr__(self):
+        return f'AsyncModule({self._module.__class__.__name__})'
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self._aide._wrap(self._module, name)
+
+
+class AsyncPlaton:
+    """ platon模块的异步代理，platon.py中以Method定义的查询方法，如：get_balance、get_transaction_count、get_block、call等，
+    使用与同步方法相同的参数和结果格式化器，通过异步RPC原生发送，其他方法和属性在线程池中执行，用法如下：
+    balance = await aide.platon.get_balance(address)
+    """
+
+    def __init__(self, aide: "AsyncAide"):
+        self._aide = aide
+        self._platon = aide.aide.platon
+
+    def __repr__(self):
+        return 'AsyncPlaton'
+
+    def _get_method(self, name):
+        for cls in type(self._platon).__mro__:
+            if name in cls.__dict__:
+                return cls.__dict__[name]
+        return None
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        method = self._get_method(name)
+        # get_block、estimate_gas等方法是对同名私有Method的简单封装
+        if callable(method) and not isinstance(method, Method):
+            method = self._get_method(f'_{name}')
+        if not isinstance(method, Method):
+            return self._aide._wrap(self._platon, name)
+
+        async def caller(*args, **kwargs):
+            return await self._aide.request_method(self._platon, method, *args, **kwargs)
+
+        caller.__name__ = name
+        return caller
+
+
+class AsyncAide:
+    """ Aide的asyncio版本，拥有与Aide相同的模块，其中的查询和交易方法都是可等待的，功能如下：
+    1. 交易在线程池中完成构造、签名和发送，等待回执时不占用线程，单个事件循环可以同时等待大量交易
+    2. 等待块高、周期和交易回执，通过异步RPC原生实现
+    3. platon模块的查询方法（如：get_balance、get_transaction_count、get_block、call）和内置合约查询（call_inner），通过异步RPC原生实现，详见AsyncPlaton
+    4. 多个AsyncAide可以在同一个事件循环中，同时访问多个节点
+
+    注意：模块中的方法（如：aide.transfer.get_balance、aide.staking.get_candidate_info）和交易，仍然在线程池中执行，
+    线程池大小决定了同时执行的RPC数量，需要大量并发查询时，请使用platon模块和call_inner
+    """
+
+    def __init__(self,
+                 uri: Union[str, List[str]],
+                 economic: Economic = None,
+                 workers: int = 32,
+                 poll_latency: float = 0.5,
+                 lazy: bool = False,
+                 snapshot: str = None,
+                 ):
+        """
+        Args:
+            uri: 节点开放的RPC链接，也可以是多个节点的RPC链接列表，详见Aide。异步请求只会发送到首个节点
+            economic: 链上经济模型数据，详见Aide
+            workers: 执行同步调用的线程池大小
+            poll_latency: 轮询交易回执和块高的间隔/s
+            lazy: 是否延迟初始化，详见Aide
+            snapshot: 启动快照数据库文件路径，详见Aide
+        """
+        self.aide = Aide(uri, economic=economic, lazy=lazy, snapshot=snapshot)
+        self.rpc = AsyncRPC(self.aide.uri)
+        self.platon = AsyncPlaton(self)
+        self.poll_latency = poll_latency
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._modules = {}
+
+    @classmethod
+    async def connect(cls, uri: str, economic: Economic = None, **kwargs):
+        """ 在线程池中完成连接和初始化，避免阻塞事件循环
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(cls, uri, economic=economic, **kwargs))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def __getattr__(self, name):
+        # 未定义的属性和方法，均代理到同步的aide对象
+        if name.startswith('_') or name == 'aide':
+            raise AttributeError(name)
+        return self._wrap(self.aide, name)
+
+    def _wrap(self, obj, name):
+        """ 将对象的方法包装为协程方法，将会访问链上的属性包装为可等待对象，模块包装为异步模块，其他属性直接返回
+        """
+        if isinstance(getattr(type(obj), name, None), property):
+            return self._run(getattr, obj, name)
+
+        attr = getattr(obj, name)
+        if isinstance(attr, Module):
+            # 模块在首次访问时才构造，与aide的延迟初始化保持一致
+            if id(attr) not in self._modules:
+                self._modules[id(attr)] = AsyncModule(self, attr)
+            return self._modules[id(attr)]
+
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def wrapper(*args, **kwargs):
+            return await self._run(attr, *args, **kwargs)
+
+        return wrapper
+
+    @staticmethod
+    def _deferred_call(func, *args, **kwargs):
+        with defer_receipt():
+            return func(*args, **kwargs)
+
+    async def _run(self, func, *args, **kwargs):
+        """ 在线程池中执行同步调用，交易回执则在事件循环中异步等待
+        """
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(self._executor, functools.partial(self._deferred_call, func, *args, **kwargs))
+
+        if isinstance(result, PendingTransaction):
+            try:
+                receipt = await self.wait_for_transaction_receipt(result.tx_hash)
+            except TimeExhausted as e:
+                # 交易可能已被节点丢弃，重新同步nonce，以免后续交易阻塞
+                self.aide.nonce_manager.resync(result.sender)
+                raise e
+            return result.result(receipt)
+
+        if isinstance(result, Module):
+            return AsyncModule(self, result)
+
+        return result
+
+    async def close(self):
+        """ 关闭异步链接，并释放线程池
+        """
+        await self.rpc.close()
+        self._executor.shutdown(wait=False)
+
+    async def request_method(self, module, method: Method, *args, **kwargs):
+        """ 使用platon.py中Method的参数和结果格式化器，通过异步RPC发送请求，结果与同步调用一致
+        """
+        (method_str, params), (result_formatters, error_formatters, null_result_formatters) = method.process_params(module, *args, **kwargs)
+        response = await self.rpc.send(method_str, params)
+        result = self.aide.web3.manager.formatted_response(response, params, error_formatters, null_result_formatters)
+        if method_str in POA_METHODS and result is not None:
+            result = gplaton_poa_cleanup(result)
+        return apply_result_formatters(result_formatters, result)
+
+    async def call_inner(self, function: InnerContractFunction, transaction: dict = None, block_identifier='latest'):
+        """ 异步查询内置合约，结果与function.call一致，用法如下：
+        await aide.call_inner(aide.web3.ppos.staking.function(InnerFn.staking_getVerifierList, {}))
+
+        Args:
+            function: 指定了方法和参数的内置合约方法对象
+            transaction: 调用交易的其他字段，如：from
+            block_identifier: 查询的块高
+        """
+        call_transaction = dict(transaction or {}, to=function.address, data=function._encode_transaction_data())
+        default_account = self.aide.web3.platon.default_account
+        if default_account is not empty:
+            call_transaction.setdefault('from', default_account)
+        return_data = await self.platon.call(call_transaction, block_identifier)
+        return function._formatter_result(function.func_id, return_data)
+
+    @property
+    async def block_number(self):
+        return int(await self.rpc.request('platon_blockNumber'), 16)
+
+    async def get_transaction_receipt(self, tx_hash):
+        """ 获取交易回执，交易未上链时返回None
+        """
+        receipt = await self.rpc.request('platon_getTransactionReceipt', [add_0x_prefix(tx_hash)])
+        if not receipt:
+            return None
+        return AttributeDict.recursive(receipt_formatter(receipt))
+
+    async def wait_for_transaction_receipt(self, tx_hash, timeout=120, poll_latency=None):
+        """ 异步等待交易回执
+        """
+        poll_latency = poll_latency or self.poll_latency
+
+        async def poll():
+            while True:
+                receipt = await self.get_transaction_receipt(tx_hash)
+                if receipt:
+                    return receipt
+                await asyncio.sleep(poll_latency)
+
+        try:
+            return await asyncio.wait_for(poll(), timeout)
+        except asyncio.TimeoutError:
+            raise TimeExhausted(f'transaction {tx_hash} is not in the chain after {timeout} seconds')
+
+    async def wait_block(self, to_block, time_out=None):
+        """ 异步等待块高
+        """
+        current_block = await self.block_number
+        time_out = time_out or (to_block - current_block) * 3
+        deadline = asyncio.get_running_loop().time() + time_out
+
+        while asyncio.get_running_loop().time() < deadline:
+            # 等待确定落链
+            if current_block > to_block:
+                logger.info(f'waiting block: {current_block} -> {to_block}')
+                return
+
+            await asyncio.sleep(self.poll_latency)
+            current_block = await self.block_number
+
+        raise TimeoutError('wait block timeout!')
+
+    async def wait_period(self,
+                          period_type: Literal['round', 'consensus', 'epoch', 'increasing'] = 'epoch',
+                          wait_count: int = 1,
+                          ):
+        """ 基于当前块高，异步等待n个指定周期
+        """
+        calculator = self.aide.calculator
+        current_period, _, _ = calculator.get_period_info(await self.block_number, period_type=period_type)
+        dest_period = current_period + wait_count - 1  # 去掉当前的指定周期
+        _, end_block = calculator.get_period_ends(dest_period, period_type=period_type)
+        await self.wait_block(end_block)
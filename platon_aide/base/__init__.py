@@ -1 +1 @@
-from platon_aide.base.module import Module
+from platon_aide.base.module import Module, PendingTransaction, defer_receipt, build_only
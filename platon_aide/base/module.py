@@ -1,8 +1,58 @@
+import threading
+import time
+from contextlib import contextmanager
 from typing import TYPE_CHECKING, Literal
 
+from platon.exceptions import TimeExhausted
+
 if TYPE_CHECKING:
     from platon_aide import Aide
 
+# 线程局部设置，用于在当前线程中延迟获取交易回执
+_local = threading.local()
+
+
+@contextmanager
+def defer_receipt():
+    """ 在with语句内，发送交易后不再阻塞等待回执，而是返回PendingTransaction对象，由调用方自行获取回执
+    """
+    _local.defer_receipt = True
+    try:
+        yield
+    finally:
+        _local.defer_receipt = False
+
+
+@contextmanager
+def build_only():
+    """ 在with语句内，发送交易的方法只构造交易，返回交易dict，不签名也不发送，与结果类型txn的效果相同，但只作用于当前线程
+    """
+    _local.build_only = True
+    try:
+        yield
+    finally:
+        _local.build_only = False
+
+
+class PendingTransaction:
+    """ 已发送、但尚未获取回执的交易
+    """
+
+    def __init__(self, module: "Module", tx_hash, func_id=None, sender=None):
+        self.module = module
+        self.tx_hash = tx_hash
+        self.func_id = func_id
+        self.sender = sender
+        self.sent_time = time.monotonic()
+
+    def __repr__(self):
+        return f'PendingTransaction({self.tx_hash})'
+
+    def result(self, receipt):
+        """ 根据交易回执，获取与同步调用一致的交易结果
+        """
+        return self.module._receipt_handler_(receipt, func_id=self.func_id)
+
 
 class Module:
 
@@ -24,7 +74,7 @@ class Module:
             func_id: 方法id（仅内置合约需要用到）
             private_key: 用于签名交易的私钥
         """
-        if self.aide.result_type == "txn":
+        if self.aide.result_type == "txn" or getattr(_local, 'build_only', False):
             return txn
 
         tx_hash = self.aide.send_transaction(txn, private_key=private_key)
@@ -32,7 +82,26 @@ class Module:
         if self.aide.result_type == 'hash':
             return tx_hash
 
-        receipt = self.aide.web3.platon.wait_for_transaction_receipt(tx_hash)
+        if getattr(_local, 'defer_receipt', False):
+            return PendingTransaction(self, tx_hash, func_id=func_id, sender=txn.get('from'))
+
+        try:
+            receipt = self.aide.web3.platon.wait_for_transaction_receipt(tx_hash)
+        except TimeExhausted as e:
+            # 交易可能已被节点丢弃，重新同步nonce，以免后续交易阻塞
+            self.aide.nonce_manager.resync(txn.get('from'))
+            raise e
+
+        return self._receipt_handler_(receipt, func_id=func_id)
+
+    def _receipt_handler_(self, receipt, func_id=None):
+        """
+        根据结果类型，将交易回执处理为交易结果
+
+        Args:
+            receipt: 交易回执
+            func_id: 方法id（仅内置合约需要用到）
+        """
         if type(receipt) is bytes:
             receipt = receipt.decode('utf-8')
 
@@ -1,11 +1,31 @@
 import math
-import warnings
 
 from decimal import Decimal
-from typing import Literal
+from typing import Literal, Sequence
 from loguru import logger
+from platon_utils import remove_0x_prefix
 
 from platon_aide.base import Module
+from platon_aide.utils import BlockSigners, EpochReward, EpochRewardEstimator, ProducerIndex, RewardEngine
+from platon_aide.utils import reward
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+PERIOD_TYPES = ('round', 'consensus', 'epoch', 'increasing')
+
+
+def get_period_table(economic) -> dict:
+    """ 通过经济模型或其派生常量，计算各类周期的区块数
+    """
+    return {
+        'round': economic.round_blocks,
+        'consensus': economic.consensus_blocks,
+        'epoch': economic.epoch_blocks,
+        'increasing': economic.increasing_blocks,
+    }
 
 
 class Calculator(Module):
@@ -17,25 +37,58 @@ class Calculator(Module):
         verifier_list = self.aide.web3.ppos.staking.get_verifier_list()
         return len(verifier_list)
 
-    def get_block_count(self, node_id, start_bn=None, end_bn=None):
-        """ 获取节点出块数
+    def get_block_count(self, node_id, start_bn=None, end_bn=None, **kwargs):
+        """ 获取节点出块数，需要统计多个节点时，请使用get_block_counts
         """
+        block_counts = self.get_block_counts(start_bn, end_bn, **kwargs)
+        return block_counts.get(remove_0x_prefix(node_id), 0)
+
+    def get_block_counts(self, start_bn=None, end_bn=None, window=500, processes=None, index: ProducerIndex = None):
+        """ 一次遍历获取[start_bn, end_bn)范围内，所有节点的出块数，返回{节点id: 出块数}
+        区块按窗口批量获取，签名节点在进程池中恢复，详见BlockSigners
+
+        Args:
+            start_bn: 起始块高，默认为0，指定index时默认为索引的起始块高
+            end_bn: 结束块高（不包含），默认为当前块高，指定index时默认为当前块高减去索引的确认块数
+            window: 每个批量获取的区块数
+            processes: 恢复签名节点的进程数，默认为cpu核数，为0时在当前进程中恢复
+            index: 出块节点索引，指定时从索引中查询，只会获取尚未索引的区块，详见ProducerIndex
+        """
+        if index:
+            # 索引不包含创世区块，也不包含尚未确认的区块
+            if start_bn is None:
+                start_bn = index.start_height if index.start_height is not None else 1
+            if end_bn is None:
+                end_bn = self.aide.platon.block_number - index.confirmations + 1
+            return index.get_block_counts(start_bn, end_bn)
+
         start_bn = start_bn or 0
         end_bn = end_bn or self.aide.platon.block_number
-        if end_bn - start_bn > 1000:
-            warnings.warn('too many blocks to analyze, it will be a long wait')
 
-        block_count = 0
-        for bn in range(start_bn, end_bn):
-            block = self.aide.platon.get_block(bn)
-            public_key = self.aide.ec_recover(block)
-            if node_id in public_key:
-                block_count = block_count + 1
+        block_counts = {}
+        with BlockSigners(self.aide, window=window, processes=processes) as signers:
+            for bn, node_id in signers.iter_signers(start_bn, end_bn):
+                block_counts[node_id] = block_counts.get(node_id, 0) + 1
+
+                if bn % 1000 == 0:
+                    logger.info(f'analyzed to {bn}th block, waiting...')
 
-            if bn % 100 == 0:
-                logger.info(f'analyzed to {bn}th block, count: {block_count}, waiting...')
+        return block_counts
 
-        return block_count
+    @property
+    def period_table(self) -> dict:
+        """ 各类周期的区块数，预先由经济模型的派生常量计算，经济模型或其参数变化时，派生常量会被重新构造，周期表随之重新计算
+        """
+        constants = self.aide.economic.constants
+        if self.__dict__.get('_period_constants') is not constants:
+            self.__dict__['_period_table'] = get_period_table(constants)
+            self.__dict__['_period_constants'] = constants
+        return self.__dict__['_period_table']
+
+    def _get_period_blocks(self, period_type):
+        if period_type not in PERIOD_TYPES:
+            raise ValueError('unknown period type.')
+        return self.period_table[period_type]
 
     def get_period_info(self,
                         block_number=None,
@@ -43,22 +96,14 @@ class Calculator(Module):
                         ):
         """ 通过区块高度和周期类型，获取区块所在的周期数和周期结束块高
         """
-        if period_type not in ['round', 'consensus', 'epoch', 'increasing']:
-            raise ValueError('unknown period type.')
-
-        blocks = {
-            'round': self.aide.economic.round_blocks,
-            'consensus': self.aide.economic.consensus_blocks,
-            'epoch': self.aide.economic.epoch_blocks,
-            'increasing': self.aide.economic.increasing_blocks,
-        }
-        period_blocks = blocks[period_type]
+        period_blocks = self._get_period_blocks(period_type)
 
         if not block_number:
             block_number = self.aide.platon.block_number
 
-        period = math.ceil(block_number / period_blocks) or 1
-        start_block, end_block = self.get_period_ends(period, period_type)
+        # 整数向上取整，避免浮点数除法的精度问题
+        period = -(-block_number // period_blocks) or 1
+        start_block, end_block = (period - 1) * period_blocks + 1, period * period_blocks
 
         return period, start_block, end_block
 
@@ -68,20 +113,67 @@ class Calculator(Module):
                         ):
         """ 通过周期数和周期类型，获取周期的起始结束块高
         """
-        if period_type not in ['round', 'consensus', 'epoch', 'increasing']:
-            raise ValueError('unknown period type.')
-
-        blocks = {
-            'round': self.aide.economic.round_blocks,
-            'consensus': self.aide.economic.consensus_blocks,
-            'epoch': self.aide.economic.epoch_blocks,
-            'increasing': self.aide.economic.increasing_blocks,
-        }
-        period_blocks = blocks[period_type]
+        period_blocks = self._get_period_blocks(period_type)
         start_block, end_block = (period - 1) * period_blocks + 1, period * period_blocks
 
         return start_block, end_block
 
+    def get_period_infos(self,
+                         block_numbers: Sequence[int],
+                         period_type: Literal['round', 'consensus', 'epoch', 'increasing'] = 'epoch'
+                         ):
+        """ 批量获取区块所在的周期数和周期起始结束块高，返回(周期数列表, 起始块高列表, 结束块高列表)
+        结果与get_period_info逐个计算的结果一致，但块高为0时不会查询最新块高，而是与块高1同属第1个周期
+        安装了numpy时进行向量化计算，block_numbers为numpy数组时返回numpy数组，否则返回列表
+
+        Args:
+            block_numbers: 块高序列或numpy数组
+            period_type: 周期类型
+        """
+        period_blocks = self._get_period_blocks(period_type)
+
+        if np is None:
+            periods = [-(-block_number // period_blocks) or 1 for block_number in block_numbers]
+            return (periods,
+                    [(period - 1) * period_blocks + 1 for period in periods],
+                    [period * period_blocks for period in periods],
+                    )
+
+        is_array = isinstance(block_numbers, np.ndarray)
+        block_numbers = np.asarray(block_numbers if is_array else list(block_numbers), dtype=np.int64)
+        periods = -(-block_numbers // period_blocks)
+        periods[periods == 0] = 1
+        return self._period_ends(periods, period_blocks, is_array)
+
+    def get_periods_ends(self,
+                         periods: Sequence[int],
+                         period_type: Literal['round', 'consensus', 'epoch', 'increasing'] = 'epoch'
+                         ):
+        """ 批量获取周期的起始结束块高，返回(起始块高列表, 结束块高列表)，结果与get_period_ends逐个计算的结果一致
+        安装了numpy时进行向量化计算，periods为numpy数组时返回numpy数组，否则返回列表
+
+        Args:
+            periods: 周期数序列或numpy数组
+            period_type: 周期类型
+        """
+        period_blocks = self._get_period_blocks(period_type)
+
+        if np is None:
+            periods = list(periods)
+            return [(period - 1) * period_blocks + 1 for period in periods], [period * period_blocks for period in periods]
+
+        is_array = isinstance(periods, np.ndarray)
+        periods = np.asarray(periods if is_array else list(periods), dtype=np.int64)
+        return self._period_ends(periods, period_blocks, is_array)[1:]
+
+    @staticmethod
+    def _period_ends(periods, period_blocks, is_array):
+        end_blocks = periods * period_blocks
+        start_blocks = end_blocks - (period_blocks - 1)
+        if is_array:
+            return periods, start_blocks, end_blocks
+        return periods.tolist(), start_blocks.tolist(), end_blocks.tolist()
+
     def get_reward_info(self):
         """ 获取当前结算周期的奖励信息
         """
@@ -120,6 +212,10 @@ class Calculator(Module):
             per_block_reward: 结算周期的出块奖励，可以通过self.get_reward_info获取
             block_count: 节点在结算周期的出块数，可以通过self.get_block_count获取
         """
+        # 参数均为整数时，使用与Decimal结果一致的整数运算
+        if reward.is_natural(total_staking_reward, verifier_count, per_block_reward, block_count) and verifier_count and reward.is_exact_context():
+            return reward.node_reward(total_staking_reward, verifier_count, per_block_reward, block_count)
+
         staking_reward = int(Decimal(total_staking_reward) / Decimal(verifier_count))
         block_reward = int(Decimal(per_block_reward) * Decimal(block_count))
         node_reward = staking_reward + block_reward
@@ -162,6 +258,10 @@ class Calculator(Module):
             block_count: 节点在结算周期的出块数，可以通过self.get_block_count获取
             node_reward_ratio: 节点在结算周期的委托分红比例
         """
+        if reward.is_natural(total_staking_reward, verifier_count, per_block_reward, block_count, node_reward_ratio) and verifier_count \
+                and reward.is_exact_context():
+            return reward.staking_reward(total_staking_reward, verifier_count, per_block_reward, block_count, node_reward_ratio)
+
         node_reward = Calculator.calc_node_reward(total_staking_reward,
                                                   verifier_count,
                                                   per_block_reward,
@@ -231,6 +331,14 @@ class Calculator(Module):
             delegate_total_amount: 节点在结算周期的锁定期委托总额
             delegate_amount: 结算周期内，账户对节点的锁定期委托总额
         """
+        args = (total_staking_reward, verifier_count, per_block_reward, block_count, node_reward_ratio)
+        if reward.is_natural(*args) and verifier_count and reward.is_exact_context():
+            all_delegate_reward = reward.delegate_reward_pool(*args)
+            if not delegate_total_amount and not delegate_amount:
+                return all_delegate_reward
+            if reward.is_natural(delegate_amount, delegate_total_amount) and delegate_total_amount:
+                return reward.delegate_reward(all_delegate_reward, delegate_amount, delegate_total_amount)
+
         dividend_ratio = Decimal(node_reward_ratio) / Decimal(10000)
         # 按照底层算法，计算质押奖励分红
         staking_reward = int(Decimal(total_staking_reward) / Decimal(verifier_count))
@@ -246,6 +354,54 @@ class Calculator(Module):
         delegate_reward = math.floor(Decimal(all_delegate_reward) * Decimal(delegate_amount) / Decimal(delegate_total_amount))
         return delegate_reward
 
+    @staticmethod
+    def calc_rewards(total_staking_reward,
+                     verifier_count,
+                     per_block_reward,
+                     block_counts,
+                     node_reward_ratios,
+                     ):
+        """ 批量计算一个结算周期内，多个节点的总奖励、质押奖励和全部委托分红，返回三个与block_counts等长的列表
+        结果与calc_node_reward、calc_staking_reward、calc_delegate_reward逐个计算的结果一致，详见RewardEngine
+
+        Args:
+            total_staking_reward: 结算周期的总质押奖励，可以通过self.get_reward_info获取
+            verifier_count: 结算周期的验证人数，可以通过self.get_verifier_count获取
+            per_block_reward: 结算周期的出块奖励，可以通过self.get_reward_info获取
+            block_counts: 各节点在结算周期的出块数，可以通过self.get_block_counts获取
+            node_reward_ratios: 各节点在结算周期的委托分红比例，可以是所有节点共用的比例
+        """
+        engine = RewardEngine(total_staking_reward, verifier_count, per_block_reward)
+        return engine.node_rewards(block_counts, node_reward_ratios)
+
+    @staticmethod
+    def calc_delegate_rewards(all_delegate_rewards,
+                              delegate_amounts,
+                              delegate_total_amounts,
+                              ):
+        """ 批量计算一个结算周期内，多个账户的委托分红，结果与calc_delegate_reward逐个计算的结果一致
+
+        Args:
+            all_delegate_rewards: 账户所委托节点的全部委托分红，可以通过calc_rewards获取，可以是所有账户共用的值
+            delegate_amounts: 结算周期内，各账户对节点的锁定期委托总额
+            delegate_total_amounts: 节点在结算周期的锁定期委托总额，可以是所有账户共用的值
+        """
+        return RewardEngine.delegate_rewards(all_delegate_rewards, delegate_amounts, delegate_total_amounts)
+
+    def estimate_epoch_rewards(self, epoch=None, delegators: dict = None, window=500, processes=None, index: ProducerIndex = None) -> EpochReward:
+        """ 一次遍历估算一个结算周期内，所有验证人的出块数、节点奖励、质押奖励和全部委托分红，以及指定委托人的委托分红
+        每个区块和每个验证人的质押信息只获取一次，委托信息批量查询，详见EpochRewardEstimator
+
+        Args:
+            epoch: 结算周期，默认为上一个结算周期
+            delegators: 需要计算委托分红的委托人，{节点id: [委托地址]}
+            window: 每个批量获取的区块数
+            processes: 恢复签名节点的进程数，默认为cpu核数，为0时在当前进程中恢复
+            index: 出块节点索引，指定时从索引中查询出块数，详见ProducerIndex
+        """
+        estimator = EpochRewardEstimator(self.aide, window=window, processes=processes, index=index)
+        return estimator.estimate(epoch, delegators)
+
     def calc_report_multi_sign_reward(self, staking_amount):
         """ 计算举报双签的奖励
         """
@@ -1,13 +1,68 @@
+import copy
+import hashlib
+import json
+import threading
 import warnings
-from functools import wraps, partial
-from typing import Literal
-from platon._utils.abi import filter_by_name
+from functools import wraps
+from typing import TYPE_CHECKING, List, Literal, Type
+
+from hexbytes import HexBytes
+
+from platon._utils.abi import filter_by_name, filter_by_type, get_abi_output_types, map_abi_data
+from platon._utils.contracts import encode_transaction_data
+from platon._utils.normalizers import BASE_RETURN_NORMALIZERS
 from platon.contract import ContractFunction
+from platon.exceptions import ContractLogicError
 from platon.types import ABI
 from platon_typing import HexStr, AnyAddress
+from platon_utils import encode_hex, function_abi_to_4byte_selector
 
 from platon_aide.base.module import Module
-from platon_aide.utils import contract_call, contract_transaction
+from platon_aide.utils import LogScanner, contract_call, contract_transaction
+
+if TYPE_CHECKING:
+    from platon_aide import Aide
+
+
+def abi_hash(abi) -> str:
+    """ 获取abi的hash，相同内容的abi，hash相同
+    """
+    if isinstance(abi, str):
+        abi = json.loads(abi)
+    return hashlib.sha256(json.dumps(abi, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+# Multicall3合约tryAggregate方法的abi，单个调用失败时不会影响其他调用
+MULTICALL_ABI = [{
+    "inputs": [
+        {"name": "requireSuccess", "type": "bool"},
+        {"components": [{"name": "target", "type": "address"}, {"name": "callData", "type": "bytes"}],
+         "name": "calls", "type": "tuple[]"},
+    ],
+    "name": "tryAggregate",
+    "outputs": [
+        {"components": [{"name": "success", "type": "bool"}, {"name": "returnData", "type": "bytes"}],
+         "name": "returnData", "type": "tuple[]"},
+    ],
+    "stateMutability": "payable",
+    "type": "function",
+}]
+
+
+def encode_call_data(fn: ContractFunction):
+    """ 编码合约方法调用的data
+    """
+    return encode_transaction_data(fn.web3, fn.vm_type, fn.function_identifier, fn.contract_abi, fn.abi, fn.args, fn.kwargs)
+
+
+def decode_call_result(web3, fn: ContractFunction, data):
+    """ 按合约方法的abi解析调用的返回数据，与直接调用合约方法的结果一致
+    """
+    output_types = get_abi_output_types(fn.abi)
+    output_data = web3.codec.decode_abi(output_types, data)
+    normalizers = list(BASE_RETURN_NORMALIZERS) + list(fn._return_data_normalizers or ())
+    normalized_data = map_abi_data(normalizers, output_types, output_data)
+    return normalized_data[0] if len(normalized_data) == 1 else normalized_data
 
 
 class Contract(Module):
@@ -15,6 +70,10 @@ class Contract(Module):
     bytecode: HexStr = None
     contract_address: AnyAddress = None
     vm_type: str = None
+    # 合约类工厂，仅由工厂生成的合约类设置
+    _factory: "ContractFactory" = None
+    # 绑定合约时需要同时修改合约类、地址和字节码，多个线程同时绑定时不能交错修改
+    _bind_lock = threading.Lock()
 
     def init(self,
              abi,
@@ -22,8 +81,10 @@ class Contract(Module):
              address=None,
              vm_type: Literal['solidity', 'wasm'] = 'solidity',
              ):
-        self.__build_contract(abi, bytecode, address, vm_type)
-        return self
+        """ 将当前合约对象绑定到合约并返回，相同abi和vm类型的合约共用缓存的合约类，只需要绑定地址，详见ContractFactory
+        与多个合约交互时，请通过get_factory(abi).bind(address)获取各自的合约对象
+        """
+        return self._bind(self.get_factory(abi, vm_type), address, bytecode)
 
     def deploy(self,
                abi,
@@ -45,49 +106,224 @@ class Contract(Module):
         if not address:
             raise Exception(f'deploy contract failed, because: {receipt}.')
 
-        self.__build_contract(abi, bytecode, address, vm_type)
+        return self._bind(self.get_factory(abi, vm_type), address, bytecode)
 
+    def _bind(self, factory: "ContractFactory", address, bytecode) -> "Contract":
+        # 切换为缓存的合约类，只需要修改类和地址
+        with self._bind_lock:
+            self.__class__ = factory.contract_class
+            self.contract_address = address
+            self.bytecode = bytecode
+            self.__dict__.pop('_origin', None)
         return self
 
-    def __build_contract(self,
-                         abi,
-                         bytecode=None,
-                         address=None,
-                         vm_type: Literal['solidity', 'wasm'] = 'solidity',
-                         ):
-        self.abi = abi
-        self.bytecode = bytecode
-        self.contract_address = address
+    def get_factory(self, abi, vm_type: Literal['solidity', 'wasm'] = 'solidity') -> "ContractFactory":
+        """ 获取abi对应的合约类工厂，工厂按(abi hash, vm类型)缓存
+        """
+        return ContractFactory.get(self.aide, abi, vm_type)
+
+    def prepare(self, fn_name, *args, **kwargs) -> ContractFunction:
+        """ 获取绑定了合约地址和参数、但未调用的合约方法对象，用于multicall
+        """
+        return self._factory.function(fn_name, self.contract_address)(*args, **kwargs)
+
+    def multicall(self,
+                  calls: List[ContractFunction],
+                  block_identifier='latest',
+                  multicall_address=None,
+                  batch_size=100,
+                  raise_error=False,
+                  ) -> list:
+        """ 批量调用多个view/pure合约方法，调用可以来自不同的合约，按调用顺序返回结果，用法如下：
+        results = aide.contract.multicall([token.prepare('balanceOf', address) for token in tokens])
+
+        所有调用在同一个块高执行，block_identifier为latest时，固定为当前块高。
+        未指定multicall_address时，调用被合并为JSON-RPC批量请求发送；指定时，通过链上的Multicall3合约的tryAggregate方法执行，
+        每batch_size个调用合并为一次合约调用。
+        单个调用失败时，默认将异常对象作为结果返回，不影响其他调用，raise_error为True时直接抛出
+
+        Args:
+            calls: 合约方法对象列表，可以通过prepare获取
+            block_identifier: 执行调用的块高
+            multicall_address: Multicall3合约地址
+            batch_size: 单个批量请求或Multicall3调用中的最大调用数
+            raise_error: 调用失败时是否抛出异常
+        """
+        if block_identifier == 'latest':
+            block_identifier = self.aide.platon.block_number
+
+        if multicall_address:
+            results = self._aggregate(calls, block_identifier, multicall_address, batch_size)
+        else:
+            with self.aide.batch(size=batch_size) as batch:
+                for fn in calls:
+                    batch.add(fn.call, block_identifier=block_identifier)
+            results = batch.results()
+
+        if raise_error:
+            error = next((result for result in results if isinstance(result, Exception)), None)
+            if error:
+                raise error
+        return results
+
+    def _aggregate(self, calls: List[ContractFunction], block_identifier, multicall_address, batch_size) -> list:
+        """ 通过Multicall3合约执行调用，多次合约调用之间同样合并为JSON-RPC批量请求
+        """
+        multicall = self.get_factory(MULTICALL_ABI).bind(multicall_address)
+        chunks = [calls[i:i + batch_size] for i in range(0, len(calls), batch_size)]
+        with self.aide.batch(size=len(chunks)) as batch:
+            for chunk in chunks:
+                aggregate = multicall.prepare('tryAggregate', False, [(fn.address, HexBytes(encode_call_data(fn))) for fn in chunk])
+                batch.add(aggregate.call, block_identifier=block_identifier)
+
+        results = []
+        for chunk, future in zip(chunks, batch.futures):
+            if future.exception():
+                results.extend([future.exception()] * len(chunk))
+                continue
+
+            for fn, (success, data) in zip(chunk, future.result()):
+                if not success:
+                    results.append(ContractLogicError(f'call {fn} failed: {data.hex()}'))
+                    continue
+                try:
+                    results.append(decode_call_result(self.aide.web3, fn, data))
+                except Exception as e:
+                    results.append(e)
+        return results
+
+    def scan_events(self,
+                    event_names: List[str] = None,
+                    from_block=0,
+                    to_block=None,
+                    address=None,
+                    topics: list = None,
+                    **kwargs):
+        """ 扫描区块范围内合约的事件，按区块顺序返回解析后的事件，用法如下：
+        for event in aide.contract.scan_events(['Transfer'], from_block=0, path='logs.db'):
+            print(event.blockNumber, event.args)
+
+        日志分段获取，分段大小会按节点的响应自动调整，指定path时记录检查点，中断后再次扫描会从检查点继续，详见LogScanner
+
+        Args:
+            event_names: 需要扫描的事件名称，为None时扫描全部事件
+            from_block: 起始块高
+            to_block: 结束块高，为None时扫描到当前块高减去确认块数
+            address: 合约地址或相同abi的合约地址列表，默认为当前合约地址
+            topics: getLogs的topic过滤条件，默认为所有需要扫描的事件的topic
+            kwargs: LogScanner的其他参数
+        """
+        scanner = LogScanner(self.aide,
+                             address=address or self.contract_address,
+                             topics=topics,
+                             abi=self.abi,
+                             event_names=event_names,
+                             vm_type=self.vm_type,
+                             **kwargs,
+                             )
+        with scanner:
+            yield from scanner.scan(from_block, to_block)
+
+    @property
+    def _origin(self):
+        # 完整的web3合约对象，构造开销较大，仅在使用时构造
+        origin = self.__dict__.get('_origin')
+        if origin is None:
+            origin = self.__dict__['_origin'] = self._factory.origin(self.contract_address)
+        return origin
+
+    @property
+    def functions(self):
+        return self._origin.functions
+
+    @property
+    def events(self):
+        return self._origin.events
+
+
+class ContractFactory:
+    """ 合约类工厂，对相同abi和vm类型的合约，只构造一次合约类，功能如下：
+    1. 解析abi，为每个方法和事件生成包装方法，并预先确定方法的abi和选择器
+    2. 生成的合约类按(abi hash, vm类型)缓存，与多个相同abi的合约交互时，只需要为合约对象绑定地址
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self, aide: "Aide", abi, vm_type: Literal['solidity', 'wasm'] = 'solidity'):
+        """
+        Args:
+            aide: 用于构造合约类的aide对象
+            abi: 合约abi
+            vm_type: 合约的vm类型
+        """
+        self.aide = aide
+        self.abi = json.loads(abi) if isinstance(abi, str) else abi
         self.vm_type = vm_type
-        self._origin = self.aide.web3.platon.contract(address=self.contract_address, abi=self.abi, bytecode=self.bytecode, vm_type=self.vm_type)
-        self.functions = self._origin.functions
-        self.events = self._origin.events
-        self._set_functions(self._origin.functions)
-        self._set_events(self._origin.events)
-        self._set_fallback(self._origin.fallback)
-
-    def _set_functions(self, functions):
-        # 合约event和function不会重名，因此不用担心属性已存在
-        for func in functions:
-            warp_function = self._function_wrap(getattr(functions, func))
-            setattr(self, func, warp_function)
-
-    def _set_events(self, events):
-        # 合约event和function不会重名，因此不用担心属性已存在
-        for event in events:
-            # 通过方法名获取方法
-            warp_event = self._event_wrap(event)
-            setattr(self, event.event_name, warp_event)
-
-    def _set_fallback(self, fallback):
+        # 未绑定地址的web3合约类，其中的方法和事件对象供合约对象复制使用
+        self.origin = aide.web3.platon.contract(abi=self.abi, vm_type=vm_type)
+        self.function_abis = {}  # 方法名 -> 非重载方法的abi
+        self.selectors = {}  # 方法名 -> 非重载方法的选择器
+        self.contract_class: Type[Contract] = self._build_class()
+
+    @classmethod
+    def get(cls, aide: "Aide", abi, vm_type: Literal['solidity', 'wasm'] = 'solidity', size=256) -> "ContractFactory":
+        """ 获取aide中缓存的合约类工厂，不存在时构造，最多缓存size个
+        """
+        key = (abi_hash(abi), vm_type)
+        factories = aide.contract_factories
+        with cls._lock:
+            factory = factories.get(key)
+            if factory:
+                factories.move_to_end(key)
+                return factory
+
+        factory = cls(aide, abi, vm_type)
+        with cls._lock:
+            factories[key] = factory
+            while len(factories) > size:
+                factories.popitem(last=False)
+        return factory
+
+    def bind(self, address=None, bytecode=None) -> Contract:
+        """ 获取绑定到地址的合约对象，不会重新解析abi
+        """
+        contract = self.contract_class(self.aide)
+        contract.contract_address = address
+        contract.bytecode = bytecode
+        return contract
+
+    def _build_class(self) -> Type[Contract]:
+        attrs = {
+            'abi': self.abi,
+            'vm_type': self.vm_type,
+            '_factory': self,
+        }
+
+        for fn_name in self.origin.functions:
+            attrs[fn_name] = self._function_wrap(fn_name)
+
+        for event in filter_by_type('event', self.abi):
+            attrs[event['name']] = self._event_wrap(event['name'])
+
+        fallback = self.origin.fallback
         if type(fallback) is ContractFunction:
-            warp_fallback = self._fallback_wrap(fallback)
-            setattr(self, fallback, warp_fallback)
+            attrs['fallback'] = self._fallback_wrap()
         else:
-            self.fallback = fallback
+            attrs['fallback'] = fallback
+
+        return type(f'Contract_{abi_hash(self.abi)[:8]}', (Contract,), attrs)
+
+    def function(self, fn_name, address) -> ContractFunction:
+        """ 获取绑定到地址的合约方法对象，复制未绑定的方法对象，而不是重新构造
+        """
+        fn = copy.copy(getattr(self.origin.functions, fn_name))
+        fn.address = address
+        # 非重载方法，预先设置abi，调用时不再从全部abi中匹配
+        fn.abi = self.function_abis.get(fn_name)
+        return fn
 
-    def _function_wrap(self, func):
-        fn_abis = filter_by_name(func.fn_name, self.abi)
+    def _function_wrap(self, fn_name):
+        fn_abis = filter_by_name(fn_name, self.abi)
         if len(fn_abis) == 0:
             raise ValueError('The method ABI is not found.')
 
@@ -98,24 +334,38 @@ class Contract(Module):
             if _abi.get('stateMutability') != fn_abi.get('stateMutability'):
                 raise ValueError('override method are of different types')
 
-        # 忽略首个参数 'self'，以适配公共合约包装类
+        if len(fn_abis) == 1:
+            self.function_abis[fn_name] = fn_abi
+            self.selectors[fn_name] = encode_hex(function_abi_to_4byte_selector(fn_abi))
+
+        factory = self
+
+        # 首个参数为合约对象，使用时才绑定合约地址
         def fit_func(__self__, *args, **kwargs):
-            return func(*args, **kwargs)
+            return factory.function(fn_name, __self__.contract_address)(*args, **kwargs)
 
         if fn_abi.get('stateMutability') in ['view', 'pure']:
-            return partial(contract_call(fit_func), self)
+            return contract_call(fit_func)
         else:
-            return partial(contract_transaction()(fit_func), self)
+            return contract_transaction()(fit_func)
 
-    @staticmethod
-    def _event_wrap(func):
+    def _event_wrap(self, event_name):
+        event_class = getattr(self.origin.events, event_name)
 
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            return func().processReceipt(*args, **kwargs)
+        @wraps(event_class)
+        def wrapper(__self__, *args, **kwargs):
+            event = event_class()
+            event.address = __self__.contract_address
+            return event.processReceipt(*args, **kwargs)
 
         return wrapper
 
-    @staticmethod
-    def _fallback_wrap(func):
-        return contract_transaction()(func)
+    def _fallback_wrap(self):
+        factory = self
+
+        def fit_func(__self__, *args, **kwargs):
+            fn = copy.copy(factory.origin.fallback)
+            fn.address = __self__.contract_address
+            return fn(*args, **kwargs)
+
+        return contract_transaction()(fit_func)
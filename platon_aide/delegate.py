@@ -17,7 +17,7 @@ class Delegate(Module):
 
     @property
     def staking_block_number(self):
-        return self.aide.staking.staking_info.StakingBlockNum
+        return self.aide.staking.get_staking_block_number()
 
     @contract_transaction()
     def delegate(self,
@@ -47,7 +47,7 @@ class Delegate(Module):
         """
         node_id = node_id or self.aide.node_id
         amount = amount or self.aide.economic.delegate_limit
-        staking_block_identifier = staking_block_identifier or self.aide.staking.staking_info.StakingBlockNum
+        staking_block_identifier = staking_block_identifier or self.aide.staking.get_staking_block_number(node_id)
 
         return self.aide.web3.ppos.delegate.withdrew_delegate(node_id,
                                                               staking_block_identifier,
@@ -75,7 +75,7 @@ class Delegate(Module):
         if self.aide.default_account:
             address = address or self.aide.default_account.address
         node_id = node_id or self.aide.node_id
-        staking_block_identifier = staking_block_identifier or self.aide.staking.staking_info.staking_block_number
+        staking_block_identifier = staking_block_identifier or self.aide.staking.get_staking_block_number(node_id)
 
         delegate_info = self.aide.web3.ppos.delegate.get_delegate_info(address, node_id, staking_block_identifier)
         if delegate_info == 'Query delegate info failed:Delegate info is not found':
@@ -5,8 +5,19 @@ from dataclasses import dataclass
 from dacite import from_dict
 
 
+class EconomicData:
+    """ 经济模型参数的基类，参数被修改时更新该对象的参数版本号，使所属经济模型的派生常量在下次访问时重新计算
+    版本号属于各自的对象，修改一个经济模型的参数，不会影响其他经济模型
+    """
+    _version = 0
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        super().__setattr__('_version', self._version + 1)
+
+
 @dataclass
-class CommonData:
+class CommonData(EconomicData):
     maxEpochMinutes: int
     nodeBlockTimeWindow: int
     perRoundBlocks: int
@@ -15,7 +26,7 @@ class CommonData:
 
 
 @dataclass
-class StakingData:
+class StakingData(EconomicData):
     stakeThreshold: int
     operatingThreshold: int
     maxValidators: int
@@ -25,7 +36,7 @@ class StakingData:
 
 
 @dataclass
-class SlashingData:
+class SlashingData(EconomicData):
     slashFractionDuplicateSign: int
     duplicateSignReportReward: int
     maxEvidenceAge: int
@@ -36,7 +47,7 @@ class SlashingData:
 
 
 @dataclass
-class GovernData:
+class GovernData(EconomicData):
     versionProposalVoteDurationSeconds: int
     versionProposalSupportRate: int
     textProposalVoteDurationSeconds: int
@@ -50,7 +61,7 @@ class GovernData:
 
 
 @dataclass
-class RewardData:
+class RewardData(EconomicData):
     newBlockRate: int
     platonFoundationYear: int
     increaseIssuanceRatio: int
@@ -58,12 +69,85 @@ class RewardData:
 
 
 @dataclass
-class RestrictingData:
+class RestrictingData(EconomicData):
     minimumRelease: int
 
 
+class EconomicConstants:
+    """ 经济模型的派生常量，构造时由经济模型参数一次计算完成，之后不可修改
+    各常量的含义与Economic的同名属性一致，参数变化时由Economic重新构造
+    """
+    __slots__ = ('version',
+                 'block_time', 'round_time', 'round_blocks',
+                 'consensus_time', 'consensus_blocks', 'consensus_rounds',
+                 'epoch_time', 'epoch_blocks', 'epoch_rounds', 'epoch_consensus',
+                 'increasing_time', 'increasing_blocks', 'increasing_rounds', 'increasing_consensus', 'increasing_epoch',
+                 'verifier_count', 'validator_count', 'staking_limit', 'add_staking_limit', 'delegate_limit',
+                 'unstaking_freeze_epochs', 'not_block_slash_rate', 'param_proposal_epochs', 'text_proposal_epochs',
+                 )
+
+    def __init__(self, economic: "Economic"):
+        # 先记录参数版本号，计算期间参数发生变化时，下次访问会重新计算
+        values = {'version': economic._get_version()}
+        common, staking, slashing, gov = economic.common, economic.staking, economic.slashing, economic.gov
+
+        # todo: 获取区块平均时间
+        values['block_time'] = block_time = int(common.nodeBlockTimeWindow // common.perRoundBlocks)
+        values['round_blocks'] = round_blocks = common.perRoundBlocks
+        values['round_time'] = round_time = round_blocks * block_time
+        values['verifier_count'] = verifier_count = common.maxConsensusVals
+
+        values['consensus_rounds'] = consensus_rounds = verifier_count
+        values['consensus_time'] = consensus_time = consensus_rounds * round_time
+        values['consensus_blocks'] = consensus_rounds * round_blocks
+
+        values['epoch_consensus'] = epoch_consensus = (common.maxEpochMinutes * 60) // consensus_time
+        values['epoch_time'] = epoch_time = epoch_consensus * consensus_time
+        values['epoch_blocks'] = epoch_consensus * values['consensus_blocks']
+        values['epoch_rounds'] = epoch_consensus * consensus_rounds
+
+        # todo: 修改为实时计算
+        values['increasing_epoch'] = increasing_epoch = (common.additionalCycleTime * 60) // epoch_time
+        values['increasing_time'] = increasing_epoch * epoch_time
+        values['increasing_consensus'] = increasing_consensus = increasing_epoch * epoch_consensus
+        values['increasing_rounds'] = increasing_rounds = increasing_consensus * consensus_rounds
+        values['increasing_blocks'] = increasing_rounds * round_blocks
+
+        values['validator_count'] = staking.maxValidators
+        values['staking_limit'] = staking.stakeThreshold
+        values['add_staking_limit'] = staking.operatingThreshold
+        values['delegate_limit'] = staking.operatingThreshold
+        values['unstaking_freeze_epochs'] = staking.unStakeFreezeDuration
+        values['not_block_slash_rate'] = slashing.slashBlocksReward
+        values['param_proposal_epochs'] = gov.paramProposalVoteDurationSeconds // epoch_time
+        values['text_proposal_epochs'] = gov.textProposalVoteDurationSeconds // epoch_time
+
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+    def __reduce__(self):
+        # 不可修改的对象无法按默认方式还原，改为通过构造参数还原
+        return _restore_constants, ({name: getattr(self, name) for name in self.__slots__},)
+
+    def __repr__(self):
+        return f'{type(self).__name__}({", ".join(f"{name}={getattr(self, name)}" for name in self.__slots__)})'
+
+
+def _restore_constants(values: dict) -> EconomicConstants:
+    constants = EconomicConstants.__new__(EconomicConstants)
+    for name, value in values.items():
+        object.__setattr__(constants, name, value)
+    return constants
+
+
 @dataclass
-class Economic:
+class Economic(EconomicData):
     common: CommonData
     restricting: RestrictingData
     staking: StakingData
@@ -71,155 +155,174 @@ class Economic:
     reward: RewardData
     slashing: SlashingData
 
+    def __getstate__(self):
+        # 派生常量不随对象保存，还原后重新计算
+        state = dict(self.__dict__)
+        state.pop('_constants', None)
+        return state
+
+    def _get_version(self) -> tuple:
+        """ 经济模型的参数版本，由经济模型及各部分参数的版本号组成，任一参数被修改、或任一部分被替换时都会变化
+        """
+        return (self._version, self.common._version, self.restricting._version, self.staking._version,
+                self.gov._version, self.reward._version, self.slashing._version)
+
+    @property
+    def constants(self) -> EconomicConstants:
+        """ 经济模型的派生常量，只在参数变化后的首次访问时重新计算，需要频繁读取时，可以直接读取其中的属性
+        """
+        constants = self.__dict__.get('_constants')
+        if constants is None or constants.version != self._get_version():
+            constants = self.__dict__['_constants'] = EconomicConstants(self)
+        return constants
+
     # 区块
     @property
     def block_time(self):
         """ 区块时长/s
         """
-        # todo: 获取区块平均时间
-        return int(self.common.nodeBlockTimeWindow // self.common.perRoundBlocks)
+        return self.constants.block_time
 
     # 窗口期
     @property
     def round_time(self):
         """ 窗口期时长/m
         """
-        return self.round_blocks * self.block_time
+        return self.constants.round_time
 
     @property
     def round_blocks(self):
         """ 窗口期区块数量
         """
-        return self.common.perRoundBlocks
+        return self.constants.round_blocks
 
     # 共识轮
     @property
     def consensus_time(self):
         """ 共识轮时长/m
         """
-        return self.consensus_rounds * self.round_time
+        return self.constants.consensus_time
 
     @property
     def consensus_blocks(self):
         """ 共识轮区块数量
         """
-        return self.consensus_rounds * self.round_blocks
+        return self.constants.consensus_blocks
 
     @property
     def consensus_rounds(self):
         """ 共识轮窗口期数量
         """
-        return self.verifier_count
+        return self.constants.consensus_rounds
 
     # 结算周期
     @property
     def epoch_time(self):
         """ 结算周期时长/m
         """
-        return self.epoch_consensus * self.consensus_time
+        return self.constants.epoch_time
 
     @property
     def epoch_blocks(self):
         """ 结算周期区块数量
         """
-        return self.epoch_consensus * self.consensus_blocks
+        return self.constants.epoch_blocks
 
     @property
     def epoch_rounds(self):
         """ 结算周期窗口期数量
         """
-        return self.epoch_consensus * self.consensus_rounds
+        return self.constants.epoch_rounds
 
     @property
     def epoch_consensus(self):
         """ 结算周期共识轮数量
         """
-        return (self.common.maxEpochMinutes * 60) // self.consensus_time
+        return self.constants.epoch_consensus
 
     @property
     def increasing_time(self):
         """ 增发周期时长/m
         """
-        return self.increasing_epoch * self.epoch_time
+        return self.constants.increasing_time
 
     @property
     def increasing_blocks(self):
         """ 增发周期区块数
         """
-        return self.increasing_rounds * self.round_blocks
+        return self.constants.increasing_blocks
 
     @property
     def increasing_rounds(self):
         """ 增发周期窗口期数
         """
-        return self.increasing_consensus * self.consensus_rounds
+        return self.constants.increasing_rounds
 
     @property
     def increasing_consensus(self):
         """ 增发周期共识轮数
         """
-        return self.increasing_epoch * self.epoch_consensus
+        return self.constants.increasing_consensus
 
     @property
     def increasing_epoch(self):
         """ 增发周期结算周期数
         """
-        # todo: 修改为实时计算
-        return (self.common.additionalCycleTime * 60) // self.epoch_time
+        return self.constants.increasing_epoch
 
     @property
     def verifier_count(self):
         """ 最大共识验证人数量
         """
-        return self.common.maxConsensusVals
+        return self.constants.verifier_count
 
     @property
     def validator_count(self):
         """ 最大验证人数量
         """
-        return self.staking.maxValidators
+        return self.constants.validator_count
 
     @property
     def staking_limit(self):
         """ 质押最小金额限制
         """
-        return self.staking.stakeThreshold
+        return self.constants.staking_limit
 
     @property
     def add_staking_limit(self):
         """ 增持质押最小金额限制
         """
-        return self.staking.operatingThreshold
+        return self.constants.add_staking_limit
 
     @property
     def delegate_limit(self):
         """ 委托最小金额限制
         """
-        return self.staking.operatingThreshold
+        return self.constants.delegate_limit
 
     @property
     def unstaking_freeze_epochs(self):
         """ 解质押后，质押金额冻结的结算周期数
         """
-        return self.staking.unStakeFreezeDuration
+        return self.constants.unstaking_freeze_epochs
 
     @property
     def not_block_slash_rate(self):
         """ 节点零出块处罚时，罚金对应的区块奖励倍数
         """
-        return self.slashing.slashBlocksReward
+        return self.constants.not_block_slash_rate
 
     @property
     def param_proposal_epochs(self):
         """ 参数提案投票期的结算周期数
         """
-        return self.gov.paramProposalVoteDurationSeconds // self.epoch_time
+        return self.constants.param_proposal_epochs
 
     @property
     def text_proposal_epochs(self):
         """ 文本提案投票期的结算周期数
         """
-        return self.gov.textProposalVoteDurationSeconds // self.epoch_time
+        return self.constants.text_proposal_epochs
 
 
 def new_economic(data: Union[dict, str]):
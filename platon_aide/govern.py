@@ -252,7 +252,7 @@ class VersionProposal(BaseProposal):
 class ParamProposal(BaseProposal):
     Module: str
     Name: str
-    NewVersion: str
+    NewValue: str
 
 
 class CancelProposal(BaseProposal):
@@ -1,11 +1,10 @@
+import threading
 import time
 import warnings
-from typing import Literal
+from collections import OrderedDict
+from typing import List, Literal, Mapping, Union
 
-import rlp
-from hexbytes import HexBytes
 from loguru import logger
-from platon._utils.inner_contract import InnerContractEvent
 from platon.main import get_default_modules
 from platon.middleware import gplaton_poa_middleware
 from platon_account import Account, DEFAULT_HRP
@@ -21,12 +20,9 @@ from platon_aide.delegate import Delegate
 from platon_aide.slashing import Slashing
 from platon_aide.govern import Govern
 from platon_aide.graphqls import Graphql
-from platon_aide.utils import get_web3
-from platon_account._utils.signing import to_standard_signature_bytes
-from platon_hash.auto import keccak
-from platon_keys.datatypes import Signature
-from platon_typing import HexStr
-from platon_utils import remove_0x_prefix, to_canonical_address
+from platon_aide.utils import get_web3, NonceManager, is_nonce_error, is_known_error, is_replacement_error, Batch, batch_middleware, TTLCache, get_seal_data, recover_signer, HeadWatcher, ReceiptTracker, MultiProvider, AccountCache, \
+    TransactionPipeline, GasStrategy, ResultCache, get_inner_contract_event, decode_receipts, BootstrapSnapshot, \
+    EconomicRefresher
 
 
 def get_modules(exclude: list = None):
@@ -44,6 +40,34 @@ def get_modules(exclude: list = None):
     return modules
 
 
+class component:
+    """ Aide的组件，首次访问时才构造，构造结果会缓存在实例中，并将构造耗时记录到实例的startup_times中
+    """
+
+    def __init__(self, func):
+        self.func = func
+        self.name = func.__name__
+        self.__doc__ = func.__doc__
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+
+        with instance._component_lock:
+            # 其他线程可能已经完成构造
+            if self.name in instance.__dict__:
+                return instance.__dict__[self.name]
+
+            start = time.perf_counter()
+            value = self.func(instance)
+            instance.startup_times[self.name] = time.perf_counter() - start
+            instance.__dict__[self.name] = value
+
+        if instance.lazy:
+            logger.debug(f'aide component {self.name} is constructed in {instance.startup_times[self.name]:.3f}s')
+        return value
+
+
 class Aide:
     """ 主类，功能如下：
     1. 各个子模块的集合体，通过它来调用子模块发送交易
@@ -51,24 +75,74 @@ class Aide:
     3. 包含一些常用方法，如：创建账户、等待块高/周期、区块解码等
     """
 
-    def __init__(self, uri: str, economic: Economic = None):
+    def __init__(self,
+                 uri: Union[str, List[str]],
+                 economic: Economic = None,
+                 lazy: bool = False,
+                 identity_ttl: float = 300,
+                 snapshot: str = None,
+                 verify_snapshot: bool = True,
+                 ):
         """
         Args:
-            uri: 节点开放的RPC链接
+            uri: 节点开放的RPC链接，也可以是同一条链的多个节点的RPC链接列表，此时查询请求会在节点间负载均衡，
+                 交易和节点相关的请求固定在首个可用节点，详见MultiProvider
             economic: 链上经济模型数据，会自动获取（需要debug接口开放），缺少经济模型数据会导致部分功能不可用。
+            lazy: 是否延迟初始化，为True时不检查节点连接，各个模块、经济模型数据和graphql客户端会在首次访问时才构造，适用于只使用少量功能的短脚本
+            identity_ttl: 节点身份信息（节点id、版本、bls公钥等）和质押块高的缓存有效期/s，为0时不缓存
+            snapshot: 启动快照数据库文件路径，存在该节点的快照时从快照启动，不再从节点获取链id、hrp、经济模型数据等，
+                      不存在时正常启动，并在启动后保存快照（延迟初始化时不保存），使用快照时不检查节点连接，详见BootstrapSnapshot
+            verify_snapshot: 是否通过创世区块hash确认快照属于节点所在的链，为False时启动过程不访问节点
         """
-        self.uri = uri
-        self.economic = economic
+        self.uris = list(uri) if isinstance(uri, (list, tuple)) else [uri]
+        self.uri = self.uris[0]
+        self.lazy = lazy
+        self.startup_times = {}  # 各个组件的构造耗时/s，延迟构造的组件在首次访问后才会记录
+        self._component_lock = threading.RLock()
+        if economic:
+            self.economic = economic
         self.default_account: LocalAccount = None  # 发送签名交易时适用的默认地址
         self.result_type = 'auto'  # 交易返回的结果类型，包括：auto, txn, hash, receipt, event（仅适用于内置合约，其他合约必须要手动解析）
+        self.nonce_manager = NonceManager(self)  # 本地nonce管理器，未指定nonce的交易由它分配
+        self.account_cache = AccountCache()  # 账户缓存，避免每次发送交易都从私钥推导地址
+        self.identity_cache = TTLCache(ttl=identity_ttl)  # 节点身份信息缓存，节点重启或升级后，需要调用invalidate_identity使其失效
+        self.gas_strategy: GasStrategy = None  # 合约交易的gas策略，为None时每次都预估gas
+        self.result_cache: ResultCache = None  # 不可变结果缓存，通过enable_result_cache启用
+        self.contract_factories = OrderedDict()  # 合约类工厂缓存，(abi hash, vm类型) -> 合约类工厂，详见ContractFactory
         # web3相关设置
-        self.web3 = get_web3(uri)
+        start = time.perf_counter()
+        self.web3 = get_web3(uri if len(self.uris) == 1 else self.uris, check_connection=not (lazy or snapshot))
+        if isinstance(self.web3.provider, MultiProvider):
+            self.web3.provider.switch_callbacks.append(self._on_primary_switch)
         self.web3.middleware_onion.inject(gplaton_poa_middleware, layer=0)
-        self.hrp = self.web3.hrp
-        self.chain_id = self.web3.platon.chain_id
+        # 批量请求中间件必须位于最内层，使批量请求的结果同样经过其他中间件的处理
+        self.web3.middleware_onion.inject(batch_middleware, 'batch', layer=0)
+        self.startup_times['web3'] = time.perf_counter() - start
         # 设置模块
         self.__init_web3__()
-        self.__init_platon__()
+        self.snapshot_loaded = False  # 是否从启动快照启动
+        if snapshot:
+            start = time.perf_counter()
+            with BootstrapSnapshot(snapshot) as bootstrap:
+                self.snapshot_loaded = bootstrap.load(self, verify=verify_snapshot)
+            self.startup_times['snapshot'] = time.perf_counter() - start
+        if not lazy:
+            self.__init_platon__()
+            if snapshot and not self.snapshot_loaded:
+                self.save_snapshot(snapshot)
+            logger.debug(f'aide startup times: {self.startup_times}')
+
+    def save_snapshot(self, path='bootstrap.db') -> dict:
+        """ 保存启动快照，之后的aide可以通过snapshot参数从快照启动，返回保存的快照数据，详见BootstrapSnapshot
+        """
+        with BootstrapSnapshot(path) as bootstrap:
+            return bootstrap.save(self)
+
+    def _on_primary_switch(self, endpoint):
+        """ 主节点切换后，本地的nonce和节点身份信息已不再可信，需要重新获取
+        """
+        self.nonce_manager.resync()
+        self.identity_cache.invalidate()
 
     def __init_web3__(self):
         """ 设置web相关模块
@@ -80,49 +154,108 @@ class Aide:
         self.debug = self.web3.debug
 
     def __init_platon__(self):
-        """ 设置platon内置合约相关模块
+        """ 设置platon内置合约相关模块，即立即构造所有的组件
         """
-        if not self.economic:
-            try:
-                self.economic = new_economic(self.debug.economic_config())
-            except IOError:
-                warnings.warn('The debug api is not open, cannot get the economic data automatically')
-
-        self.graphql = Graphql(f'{self.uri}/platon/graphql')
-        self.calculator = Calculator(self)
-        self.transfer = Transfer(self)
-        self.restricting = Restricting(self)
-        self.staking = Staking(self)
-        self.delegate = Delegate(self)
-        self.slashing = Slashing(self)
-        self.govern = Govern(self)
-        self.contract = Contract(self)
+        for name in self.components():
+            getattr(self, name)
+
+    @classmethod
+    def components(cls):
+        """ 获取所有组件的名称
+        """
+        return [name for name, value in vars(cls).items() if isinstance(value, component)]
+
+    @component
+    def hrp(self):
+        return self.web3.hrp
+
+    @component
+    def chain_id(self):
+        return self.web3.platon.chain_id
+
+    @component
+    def economic(self):
+        try:
+            return new_economic(self.debug.economic_config())
+        except IOError:
+            warnings.warn('The debug api is not open, cannot get the economic data automatically')
+
+    @component
+    def head_watcher(self):
+        return HeadWatcher(self)
+
+    @component
+    def graphql(self):
+        return Graphql(f'{self.uri}/platon/graphql')
+
+    @component
+    def calculator(self):
+        return Calculator(self)
+
+    @component
+    def transfer(self):
+        return Transfer(self)
+
+    @component
+    def restricting(self):
+        return Restricting(self)
+
+    @component
+    def staking(self):
+        return Staking(self)
+
+    @component
+    def delegate(self):
+        return Delegate(self)
+
+    @component
+    def slashing(self):
+        return Slashing(self)
+
+    @component
+    def govern(self):
+        return Govern(self)
+
+    @component
+    def contract(self):
+        return Contract(self)
+
+    def _node_info(self):
+        return self.identity_cache.get('node_info', self.web3.node.admin.node_info)
+
+    def _program_version(self):
+        return self.identity_cache.get('program_version', self.web3.node.admin.get_program_version)
 
     @property
     def node_id(self):
-        node_info = self.web3.node.admin.node_info()
+        node_info = self._node_info()
         node_id = node_info['enode'].split('//')[1].split('@')[0]  # 请使用enode中的节点id
         return node_id
 
     @property
     def node_version(self):
-        version_info = self.web3.node.admin.get_program_version()
+        version_info = self._program_version()
         return version_info['Version']
 
     @property
     def bls_pubkey(self):
-        node_info = self.web3.node.admin.node_info()
+        node_info = self._node_info()
         return node_info['blsPubKey']
 
     @property
     def bls_proof(self):
-        return self.web3.node.admin.get_schnorr_NIZK_prove()
+        return self.identity_cache.get('bls_proof', self.web3.node.admin.get_schnorr_NIZK_prove)
 
     @property
     def version_sign(self):
-        version_info = self.web3.node.admin.get_program_version()
+        version_info = self._program_version()
         return version_info['Sign']
 
+    def invalidate_identity(self):
+        """ 让节点身份信息和质押块高的缓存失效，下次使用时重新获取
+        """
+        self.identity_cache.invalidate()
+
     @combomethod
     def create_account(self, hrp=None):
         """ 创建账户
@@ -157,24 +290,17 @@ class Aide:
         return to_checksum_address(address)
 
     def wait_block(self, to_block, time_out=None):
-        """ 等待块高
+        """ 等待块高，直到to_block确定落链
+        所有等待共享一个区块头监听器，有websocket链接时通过订阅新区块唤醒，否则根据出块间隔自适应地查询块高，详见HeadWatcher
         """
-        current_block = self.platon.block_number
-        time_out = time_out or (to_block - current_block) * 3
-
-        for i in range(time_out):
-            time.sleep(1)
-            current_block = self.platon.block_number
+        current_block = self.head_watcher.get_block_number()
+        if current_block > to_block:
+            return
 
-            if i % 10 == 0:
-                logger.info(f'waiting block: {current_block} -> {to_block}')
-
-            # 等待确定落链
-            if current_block > to_block:
-                logger.info(f'waiting block: {current_block} -> {to_block}')
-                return
-
-        raise TimeoutError('wait block timeout!')
+        time_out = time_out or (to_block - current_block + 1) * self.head_watcher.block_time * 3
+        logger.info(f'waiting block: {current_block} -> {to_block}')
+        current_block = self.head_watcher.wait(to_block, timeout=time_out)
+        logger.info(f'waiting block: {current_block} -> {to_block}')
 
     def wait_period(self,
                     period_type: Literal['round', 'consensus', 'epoch', 'increasing'] = 'epoch',
@@ -187,10 +313,90 @@ class Aide:
         _, end_block = self.calculator.get_period_ends(dest_period, period_type=period_type)
         self.wait_block(end_block)
 
+    def batch(self, size=100, window=0.05, workers=None) -> Batch:
+        """ 创建批量请求对象，其中的调用产生的RPC请求会被合并为JSON-RPC批量请求，详见Batch
+        """
+        return Batch(self, size=size, window=window, workers=workers)
+
+    def enable_result_cache(self, size=10000, path=None, confirmations=10) -> ResultCache:
+        """ 启用不可变结果缓存，固定在已确认块高或区块hash上的请求结果会被缓存，详见ResultCache
+        """
+        self.disable_result_cache()
+        self.result_cache = ResultCache(self, size=size, path=path, confirmations=confirmations)
+        # 缓存中间件位于批量请求中间件之外，命中缓存的请求不会进入批量请求
+        self.web3.middleware_onion.remove('batch')
+        self.web3.middleware_onion.inject(self.result_cache.middleware, 'result_cache', layer=0)
+        self.web3.middleware_onion.inject(batch_middleware, 'batch', layer=0)
+        return self.result_cache
+
+    def disable_result_cache(self):
+        """ 停用不可变结果缓存
+        """
+        if self.result_cache:
+            self.web3.middleware_onion.remove('result_cache')
+            self.result_cache.close()
+            self.result_cache = None
+
+    def receipt_tracker(self, timeout=120, batch_size=100, history=True) -> ReceiptTracker:
+        """ 创建交易回执跟踪器，批量等待多个交易的回执，详见ReceiptTracker
+        """
+        return ReceiptTracker(self, timeout=timeout, batch_size=batch_size, history=history)
+
+    def economic_refresher(self, economic: Economic = None, batch_size=100) -> EconomicRefresher:
+        """ 创建经济模型参数的增量刷新器，跟踪通过的参数提案，在生效块高修改经济模型中对应的参数，详见EconomicRefresher
+        """
+        return EconomicRefresher(self, economic=economic, batch_size=batch_size)
+
+    def pipeline(self,
+                 build_workers=16,
+                 sign_processes=None,
+                 sign_batch_size=50,
+                 send_workers=4,
+                 send_batch_size=100,
+                 queue_size=1000,
+                 gas_price_ttl=10,
+                 history=True,
+                 ) -> TransactionPipeline:
+        """ 创建交易流水线，并发构造、批量签名和批量发送大量交易，详见TransactionPipeline
+        """
+        return TransactionPipeline(self,
+                                   build_workers=build_workers,
+                                   sign_processes=sign_processes,
+                                   sign_batch_size=sign_batch_size,
+                                   send_workers=send_workers,
+                                   send_batch_size=send_batch_size,
+                                   queue_size=queue_size,
+                                   gas_price_ttl=gas_price_ttl,
+                                   history=history,
+                                   )
+
     def set_default_account(self, account: LocalAccount):
-        """ 设置发送交易的默认账户
+        """ 设置发送交易的默认账户，默认账户会被注册为签名账户
         """
         self.default_account = account
+        if account:
+            self.register_account(account)
+
+    def register_account(self, account: Union[LocalAccount, str, bytes]) -> LocalAccount:
+        """ 注册签名账户，可以是账户或私钥。使用注册账户的私钥发送交易时，不再重新推导公钥和地址
+        """
+        if not isinstance(account, LocalAccount):
+            account = self.platon.account.from_key(account, hrp=self.hrp)
+        self.account_cache.register(account)
+        return account
+
+    def unregister_account(self, account: Union[LocalAccount, str, bytes]):
+        """ 注销签名账户，可以是账户、私钥或地址
+        """
+        self.account_cache.unregister(account)
+
+    def get_address(self, private_key=None):
+        """ 获取私钥对应的地址，未指定私钥时返回默认账户的地址，没有默认账户时返回None
+        """
+        private_key = private_key or self.default_account
+        if not private_key:
+            return None
+        return self.account_cache.get_address(private_key, self.hrp)
 
     def set_result_type(self,
                         result_type: Literal['auto', 'txn', 'hash', 'receipt', 'event']
@@ -199,46 +405,71 @@ class Aide:
         """
         self.result_type = result_type
 
+    def set_gas_strategy(self, gas_strategy: GasStrategy = None):
+        """ 设置合约交易的gas策略，详见GasStrategy，为None时每次都预估gas
+        """
+        self.gas_strategy = gas_strategy
+
     def send_transaction(self, txn: dict, private_key=None):
         """ 签名交易并发送，返回交易hash
+        未指定nonce时，由本地nonce管理器分配，遇到nonce错误会重新同步并重试一次
+        交易已在交易池中时视为发送成功，交易池中已有相同nonce的交易时不会重试，以免交易被发送两次
         """
-        if not private_key and self.default_account:
-            private_key = self.default_account.key
+        private_key = private_key or self.default_account
+        signer = self.account_cache.get_signer(private_key)
 
-        if not txn.get('nonce'):
-            account = self.platon.account.from_key(private_key, hrp=self.hrp)
-            txn['nonce'] = self.platon.get_transaction_count(account.address)
+        if txn.get('nonce') is not None:
+            return self._send_transaction(txn, signer)
 
+        address = self.account_cache.get_address(private_key, self.hrp)
+        for retry in range(2):
+            txn['nonce'] = self.nonce_manager.next_nonce(address)
+            try:
+                return self._send_transaction(txn, signer)
+            except Exception as e:
+                if is_nonce_error(e) and not retry:
+                    logger.warning(f'nonce {txn["nonce"]} of {address} is invalid, resync and retry: {e}')
+                    self.nonce_manager.resync(address)
+                    continue
+                # 相同nonce的交易已在交易池中，该nonce不能归还复用
+                if is_replacement_error(e):
+                    self.nonce_manager.resync(address)
+                else:
+                    self.nonce_manager.release(address, txn['nonce'])
+                raise e
+
+    def _send_transaction(self, txn: dict, private_key):
         signed_txn = self.platon.account.sign_transaction(txn, private_key, self.hrp)
-        tx_hash = self.platon.send_raw_transaction(signed_txn.rawTransaction)
+        try:
+            tx_hash = self.platon.send_raw_transaction(signed_txn.rawTransaction)
+        except Exception as e:
+            # 相同的交易已在交易池中，视为发送成功
+            if is_known_error(e):
+                logger.debug(f'transaction {bytes(signed_txn.hash).hex()} is already known: {e}')
+                return bytes(signed_txn.hash).hex()
+            raise
         return bytes(tx_hash).hex()
 
     @staticmethod
     def decode_data(receipt, func_id=None):
-        return InnerContractEvent(func_id).processReceipt(receipt)
+        return get_inner_contract_event(func_id).processReceipt(receipt)
+
+    @staticmethod
+    def decode_receipts(receipts, func_ids=None, processes=0, chunk_size=2000):
+        """ 批量解析内置合约交易回执，返回紧凑的InnerEvent记录，适用于解析大量历史交易，详见decode_receipts
+        """
+        return decode_receipts(receipts, func_ids, processes=processes, chunk_size=chunk_size)
 
     def ec_recover(self, block_identifier):
         """ 使用keccak方式，解出区块的签名节点公钥
+        block_identifier可以是块高、区块hash或已获取的区块，批量解析请使用calculator.get_block_counts
         """
-        block = self.web3.platon.get_block(block_identifier)
-
-        extra = block.proofOfAuthorityData[:32]
-        sign = block.proofOfAuthorityData[32:]
-        raw_data = [bytes.fromhex(remove_0x_prefix(block.parentHash.hex())),
-                    to_canonical_address(block.miner),
-                    bytes.fromhex(remove_0x_prefix(block.stateRoot.hex())),
-                    bytes.fromhex(remove_0x_prefix(block.transactionsRoot.hex())),
-                    bytes.fromhex(remove_0x_prefix(block.receiptsRoot.hex())),
-                    bytes.fromhex(remove_0x_prefix(block.logsBloom.hex())),
-                    block.number,
-                    block.gasLimit,
-                    block.gasUsed,
-                    block.timestamp,
-                    extra,
-                    bytes.fromhex(remove_0x_prefix(block.nonce.hex()))
-                    ]
-        hash_bytes = HexBytes(keccak(rlp.encode(raw_data)))
-        signature_bytes = HexBytes(sign)
-        signature_bytes_standard = to_standard_signature_bytes(signature_bytes)
-        signature = Signature(signature_bytes=signature_bytes_standard)
-        return remove_0x_prefix(HexStr(signature.recover_public_key_from_msg_hash(hash_bytes).to_hex()))
+        if isinstance(block_identifier, Mapping):
+            block = block_identifier
+        else:
+            block = self.web3.platon.get_block(block_identifier)
+
+        seal_data = get_seal_data(block)
+        if not seal_data:
+            raise ValueError(f'the block {block["number"]} has no signature')
+        return recover_signer(*seal_data)
@@ -21,6 +21,19 @@ class Staking(Module):
             return candidate_info
         raise AttributeError('the node has no staking information.')
 
+    def get_staking_block_number(self, node_id=None):
+        """ 获取节点当前质押的块高，结果会缓存在aide的节点身份信息缓存中
+        """
+        node_id = node_id or self.aide.node_id
+
+        def getter():
+            candidate_info = self.get_candidate_info(node_id)
+            if not candidate_info:
+                raise AttributeError(f'the node {node_id} has no staking information.')
+            return candidate_info.StakingBlockNum
+
+        return self.aide.identity_cache.get(('staking_block_number', node_id), getter)
+
     @contract_transaction()
     def create_staking(self,
                        amount=None,
@@ -41,13 +54,12 @@ class Staking(Module):
                        ):
 
         if not benefit_address:
-            benefit_account = self.aide.platon.account.from_key(private_key, hrp=self.aide.hrp) if private_key else self.aide.default_account
-            if not benefit_account:
+            benefit_address = self.aide.get_address(private_key)
+            if not benefit_address:
                 raise ValueError('the benefit address cannot be empty')
 
-            benefit_address = benefit_account.address
-
         node_id = node_id or self.aide.node_id
+        self.aide.identity_cache.invalidate(('staking_block_number', node_id))  # 质押后质押块高会发生变化
         amount = amount or self.aide.economic.staking_limit
         version = version or self.aide.node_version
         version_sign = version_sign or self.aide.version_sign
@@ -73,6 +85,7 @@ class Staking(Module):
     @contract_transaction()
     def withdrew_staking(self, node_id=None, txn=None, private_key=None):
         node_id = node_id or self.aide.node_id
+        self.aide.identity_cache.invalidate(('staking_block_number', node_id))
         return self.aide.web3.ppos.staking.withdrew_staking(node_id)
 
     @contract_transaction()
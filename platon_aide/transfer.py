@@ -1,5 +1,15 @@
+import itertools
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import TYPE_CHECKING, Iterable, Tuple
+
+from loguru import logger
+
 from platon_aide.base.module import Module
 
+if TYPE_CHECKING:
+    from platon_aide import Aide
+
 
 class Transfer(Module):
     transferGas: int = 21000
@@ -21,7 +31,149 @@ class Transfer(Module):
 
         return self._transaction_handler_(base_txn, private_key=private_key)
 
+    def bulk_transfer(self,
+                      transfers: Iterable[Tuple[str, int]],
+                      private_keys=None,
+                      window=1000,
+                      gas_price_ttl=10,
+                      timeout=120,
+                      **kwargs,
+                      ) -> "BulkTransfer":
+        """ 批量转账，transfers为(to_address, amount)的可迭代对象，可以是生成器，详见BulkTransfer
+        """
+        return BulkTransfer(self.aide,
+                            transfers,
+                            private_keys=private_keys,
+                            window=window,
+                            gas_price_ttl=gas_price_ttl,
+                            timeout=timeout,
+                            **kwargs,
+                            )
+
     def get_balance(self, address, block_identifier=None):
         """ 查询自由金额的余额
         """
         return self.aide.platon.get_balance(address, block_identifier)
+
+
+class BulkTransfer:
+    """ 批量转账，用于向大量账户转账，功能如下：
+    1. 按需从transfers中读取转账，同时处理中的转账数不超过window，输入数据量很大时内存占用也保持平稳
+    2. 通过交易流水线发送交易，gas price按固定间隔刷新，nonce在本地分配，多个出资账户轮流出资
+    3. 迭代时按确认顺序返回转账结果(to_address, amount, result)，result为交易回执，转账失败时为异常对象
+    4. 迭代结束后，可以通过stats获取转账的统计数据，包括TPS
+
+    用法如下：
+    bulk = aide.transfer.bulk_transfer((account.address, 10 ** 18) for account in accounts)
+    for to_address, amount, result in bulk:
+        ...
+    print(bulk.stats())
+    """
+
+    def __init__(self,
+                 aide: "Aide",
+                 transfers: Iterable[Tuple[str, int]],
+                 private_keys=None,
+                 window=1000,
+                 gas_price_ttl=10,
+                 timeout=120,
+                 **kwargs,
+                 ):
+        """
+        Args:
+            aide: 发送交易的aide对象
+            transfers: (to_address, amount)的可迭代对象
+            private_keys: 出资账户的私钥列表，默认使用aide的默认账户
+            window: 同时处理中的最大转账数
+            gas_price_ttl: gas price的刷新间隔/s
+            timeout: 等待交易回执的最长时间/s
+            kwargs: 交易流水线的其他参数，详见TransactionPipeline
+        """
+        self.aide = aide
+        self.transfers = transfers
+        self.private_keys = private_keys or [aide.default_account]
+        self.window = window
+        self.gas_price_ttl = gas_price_ttl
+        self.timeout = timeout
+        self.kwargs = kwargs
+        self.submitted = 0
+        self.confirmed = 0
+        self.failed = 0
+        self.start_time = None
+        self.end_time = None
+        self.send_tps = 0
+
+    def __iter__(self):
+        self.start_time = time.monotonic()
+        private_keys = itertools.cycle(self.private_keys)
+        in_flight = {}  # 转账结果的Future -> (to_address, amount)
+
+        with self.aide.pipeline(gas_price_ttl=self.gas_price_ttl, history=False, **self.kwargs) as pipeline, \
+                self.aide.receipt_tracker(timeout=self.timeout, history=False) as tracker:
+            for to_address, amount in self.transfers:
+                if len(in_flight) >= self.window:
+                    yield from self._complete(in_flight)
+
+                txn = {
+                    "to": to_address,
+                    "gas": Transfer.transferGas,
+                    "data": '',
+                    "chainId": self.aide.chain_id,
+                    "value": amount,
+                }
+                future = Future()
+                pipeline.submit(txn, private_key=next(private_keys)).add_done_callback(
+                    lambda hash_future, future=future: self._track(tracker, hash_future, future)
+                )
+                in_flight[future] = (to_address, amount)
+                self.submitted += 1
+
+            while in_flight:
+                yield from self._complete(in_flight)
+
+        self.send_tps = pipeline.stats()['tps']
+        logger.info(f'bulk transfer finished: {self.stats()}')
+
+    @staticmethod
+    def _track(tracker, hash_future: Future, future: Future):
+        """ 交易发送后，跟踪交易回执，并将结果传递给转账结果的Future
+        """
+        error = hash_future.exception()
+        if error:
+            future.set_exception(error)
+            return
+
+        def done(receipt_future):
+            if receipt_future.exception():
+                future.set_exception(receipt_future.exception())
+            else:
+                future.set_result(receipt_future.result())
+
+        tracker.track(hash_future.result()).add_done_callback(done)
+
+    def _complete(self, in_flight: dict):
+        """ 等待至少一个转账完成，并按完成顺序返回转账结果
+        """
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            to_address, amount = in_flight.pop(future)
+            result = future.exception() or future.result()
+            if isinstance(result, Exception) or result.get('status') == 0:
+                self.failed += 1
+            else:
+                self.confirmed += 1
+            self.end_time = time.monotonic()
+            yield to_address, amount, result
+
+    def stats(self) -> dict:
+        """ 获取转账的统计数据，tps为确认转账的速度（笔/s），send_tps为交易发送的速度（笔/s）
+        """
+        elapsed = (self.end_time - self.start_time) if self.start_time and self.end_time else 0
+        return {
+            'submitted': self.submitted,
+            'confirmed': self.confirmed,
+            'failed': self.failed,
+            'elapsed': elapsed,
+            'tps': self.confirmed / elapsed if elapsed > 0 else 0,
+            'send_tps': self.send_tps,
+        }
@@ -5,3 +5,70 @@ from platon_aide.utils.utils import (
     contract_transaction,
     mock_duplicate_sign,
 )
+from platon_aide.utils.nonce import (
+    NonceManager,
+    is_known_error,
+    is_nonce_error,
+    is_replacement_error,
+)
+from platon_aide.utils.batch import (
+    Batch,
+    batch_middleware,
+)
+from platon_aide.utils.cache import (
+    TTLCache,
+)
+from platon_aide.utils.signer import (
+    BlockSigners,
+    get_seal_data,
+    recover_signer,
+)
+from platon_aide.utils.producer_index import (
+    ProducerIndex,
+)
+from platon_aide.utils.head import (
+    HeadWatcher,
+)
+from platon_aide.utils.receipt import (
+    ReceiptTracker,
+)
+from platon_aide.utils.provider import (
+    MultiProvider,
+    get_provider,
+)
+from platon_aide.utils.account import (
+    AccountCache,
+)
+from platon_aide.utils.pipeline import (
+    TransactionPipeline,
+)
+from platon_aide.utils.gas import (
+    GasStrategy,
+)
+from platon_aide.utils.result_cache import (
+    ResultCache,
+)
+from platon_aide.utils.log_scanner import (
+    LogScanner,
+)
+from platon_aide.utils.inner_event import (
+    InnerEvent,
+    InnerEventDecoder,
+    decode_receipts,
+    get_inner_contract_event,
+)
+from platon_aide.utils.reward import (
+    RewardEngine,
+)
+from platon_aide.utils.epoch_reward import (
+    EpochReward,
+    EpochRewardEstimator,
+    NodeReward,
+)
+from platon_aide.utils.snapshot import (
+    BootstrapSnapshot,
+)
+from platon_aide.utils.param_tracker import (
+    EconomicRefresher,
+    ParamChange,
+)
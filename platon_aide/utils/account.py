@@ -0,0 +1,90 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from hexbytes import HexBytes
+from platon_account import Account
+from platon_account.signers.local import LocalAccount
+from platon_keys.datatypes import PrivateKey
+from platon_utils import is_bech32_address
+
+
+def key_digest(private_key) -> bytes:
+    """ 获取私钥的摘要，用作缓存的键，避免在缓存中保存私钥
+    """
+    if isinstance(private_key, LocalAccount):
+        private_key = private_key.key
+    if isinstance(private_key, PrivateKey):
+        private_key = private_key.to_bytes()
+    return hashlib.sha256(bytes(HexBytes(private_key))).digest()
+
+
+class AccountCache:
+    """ 账户缓存，避免每次发送交易都通过私钥重新推导公钥和地址，功能如下：
+    1. 注册的签名账户按私钥摘要保存，签名时直接使用已推导的密钥对象，不再进行椭圆曲线运算
+    2. 未注册的私钥仅按私钥摘要缓存地址，缓存数量有上限，不会保存私钥本身
+    """
+
+    def __init__(self, size=1024):
+        """
+        Args:
+            size: 未注册私钥的地址缓存数量上限
+        """
+        self.size = size
+        self._accounts = {}  # 私钥摘要 -> 注册的账户
+        self._addresses = OrderedDict()  # (私钥摘要, hrp) -> 地址
+        self._lock = threading.Lock()
+
+    def register(self, account: LocalAccount):
+        """ 注册签名账户
+        """
+        with self._lock:
+            self._accounts[key_digest(account)] = account
+
+    def unregister(self, account):
+        """ 注销签名账户，可以是账户、私钥或地址
+        """
+        with self._lock:
+            if isinstance(account, str) and is_bech32_address(account):
+                digests = [digest for digest, registered in self._accounts.items() if registered.address == account]
+            else:
+                digests = [key_digest(account)]
+
+            for digest in digests:
+                self._accounts.pop(digest, None)
+
+    def get_account(self, private_key) -> LocalAccount:
+        """ 获取私钥对应的已注册账户，未注册时返回None
+        """
+        if isinstance(private_key, LocalAccount):
+            return private_key
+        return self._accounts.get(key_digest(private_key))
+
+    def get_address(self, private_key, hrp):
+        """ 获取私钥对应的地址，注册账户直接返回其地址，未注册的私钥在首次推导后缓存地址
+        """
+        account = self.get_account(private_key)
+        if account and account.address.startswith(hrp):
+            return account.address
+
+        key = (key_digest(private_key), hrp)
+        with self._lock:
+            address = self._addresses.get(key)
+            if address:
+                self._addresses.move_to_end(key)
+                return address
+
+        address = Account.from_key(private_key, hrp=hrp).address
+        with self._lock:
+            self._addresses[key] = address
+            while len(self._addresses) > self.size:
+                self._addresses.popitem(last=False)
+        return address
+
+    def get_signer(self, private_key):
+        """ 获取用于签名交易的密钥，注册账户返回已推导的密钥对象，未注册的私钥原样返回
+        """
+        account = self.get_account(private_key)
+        if account:
+            return account._key_obj
+        return private_key
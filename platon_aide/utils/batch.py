@@ -0,0 +1,281 @@
+import itertools
+import threading
+import time
+import warnings
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Callable, Union
+
+from platon import HTTPProvider
+from platon._utils.encoding import FriendlyJsonSerde
+from platon._utils.request import make_post_request
+from platon_utils import to_bytes, to_text
+
+from platon_aide.utils.provider import MultiProvider, is_sticky
+
+if TYPE_CHECKING:
+    from platon_aide import Aide
+
+# 线程局部的请求收集器，仅在批量请求的工作线程中设置
+_local = threading.local()
+
+# 批量请求默认的最大工作线程数，每个执行中的调用占用一个线程
+MAX_WORKERS = 32
+
+
+def batch_middleware(make_request, web3):
+    """ 批量请求中间件，将批量工作线程中的RPC请求转交给请求收集器，其他线程的请求不受影响
+    需要通过middleware_onion.inject(batch_middleware, 'batch', layer=0)放在最内层，
+    放在外层时，被转交的请求会跳过内层中间件，批量请求的结果不会经过gplaton_poa等中间件的处理
+    """
+
+    def middleware(method, params):
+        collector = getattr(_local, 'collector', None)
+        if collector:
+            return collector.request(method, params)
+        return make_request(method, params)
+
+    return middleware
+
+
+class RequestCollector:
+    """ 请求收集器，将多个线程发起的RPC请求合并为一个JSON-RPC批量请求发送
+    当收集的请求达到size个、所有可执行的调用都已发出请求，或者首个请求等待超过window秒时，发送所有已收集的请求
+    """
+
+    def __init__(self, provider: Union[HTTPProvider, MultiProvider], size=100, window=0.05, workers=100):
+        self.provider = provider
+        self.size = size
+        self.window = window
+        self.workers = workers
+        self.batch_count = 0  # 已发送的批量请求数
+        self.request_count = 0  # 已发送的单个请求数
+        self.unfinished = 0  # 已开始执行但未完成的调用数
+        self._pending = []
+        self._deadline = 0  # 当前收集中的批量请求的发送时间
+        self._generation = 0  # 当前收集中的批量请求的序号
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+
+    def request(self, method, params):
+        """ 提交一个RPC请求，并阻塞等待它所在的批量请求返回
+        """
+        future = Future()
+        request = {
+            "jsonrpc": "2.0",
+            "bech32": True,
+            "method": method,
+            "params": params or [],
+            "id": next(self._counter),
+        }
+
+        with self._lock:
+            # 合并窗口从批量请求的首个请求开始计算，同一批量请求中的所有请求共享发送时间
+            if not self._pending:
+                self._deadline = time.monotonic() + self.window
+            deadline, generation = self._deadline, self._generation
+            self._pending.append((request, future))
+            # 没有其他线程会再产生请求时，无需等待合并窗口
+            is_ready = len(self._pending) >= self.size or self._is_idle()
+
+        if is_ready:
+            self.flush(generation)
+
+        wait([future], timeout=max(deadline - time.monotonic(), 0))
+        if not future.done():
+            self.flush(generation)
+
+        return future.result()
+
+    def _is_idle(self):
+        # 合并窗口已结束，或者所有能够同时执行的调用都已在当前收集的请求中，不会再有新的请求加入
+        return time.monotonic() >= self._deadline or len(self._pending) >= min(self.unfinished, self.workers)
+
+    def add_calls(self, count):
+        """ 标记添加了多个待执行的调用
+        """
+        with self._lock:
+            self.unfinished += count
+
+    def finish_call(self):
+        """ 标记一个调用已完成，若其他调用都已发出请求，则立即发送已收集的请求
+        """
+        with self._lock:
+            self.unfinished -= 1
+            is_ready = self._pending and self._is_idle()
+
+        if is_ready:
+            self.flush()
+
+    @staticmethod
+    def _post(provider: HTTPProvider, data):
+        return make_post_request(provider.endpoint_uri, data, **provider.get_request_kwargs())
+
+    def flush(self, generation=None):
+        """ 立即发送所有已收集的请求，并按请求id分发响应
+        指定generation时，仅当该序号的批量请求还未发送时才发送，避免提前发送后续的批量请求
+        """
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            pending, self._pending = self._pending, []
+            self._generation += 1
+
+        if not pending:
+            return
+
+        serde = FriendlyJsonSerde()
+        try:
+            data = to_bytes(text=serde.json_encode([request for request, _ in pending]))
+            if isinstance(self.provider, MultiProvider):
+                # 批量请求中包含需要固定在主节点的请求时，整个批量请求都在主节点执行
+                sticky = any(is_sticky(request['method']) for request, _ in pending)
+                raw_response = self.provider.execute(lambda endpoint: self._post(endpoint.provider, data), sticky=sticky)
+            else:
+                raw_response = self._post(self.provider, data)
+            responses = serde.json_decode(to_text(raw_response))
+        except Exception as e:
+            for _, future in pending:
+                future.set_exception(e)
+            return
+
+        self.batch_count += 1
+        self.request_count += len(pending)
+
+        # 节点不支持批量请求时，会返回单个错误响应
+        if type(responses) is dict:
+            responses = [dict(responses, id=request['id']) for request, _ in pending]
+
+        responses = {response.get('id'): response for response in responses}
+        for request, future in pending:
+            response = responses.get(request['id']) or {
+                'jsonrpc': '2.0',
+                'id': request['id'],
+                'error': {'code': -32603, 'message': 'response is missing in the batch'},
+            }
+            future.set_result(response)
+
+
+class BatchFuture(Future):
+    """ 批量调用的Future，获取结果时会先执行尚未执行的调用，避免在with语句内获取结果时阻塞
+    """
+
+    def __init__(self, batch: "Batch"):
+        super().__init__()
+        self._batch = batch
+
+    def result(self, timeout=None):
+        self._batch.execute()
+        return super().result(timeout)
+
+    def exception(self, timeout=None):
+        self._batch.execute()
+        return super().exception(timeout)
+
+
+class Batch:
+    """ 批量请求对象，添加的调用每满size个、或者退出with语句时，会一起放入工作线程中并发执行，
+    它们产生的RPC请求会被合并为JSON-RPC批量请求发送。每个调用对应一个Future，调用之间的异常互不影响，用法如下：
+
+    with aide.batch() as batch:
+        futures = [batch.add(aide.transfer.get_balance, address) for address in addresses]
+    balances = [future.result() for future in futures]
+    """
+
+    def __init__(self, aide: "Aide", size=100, window=0.05, workers=None):
+        """
+        Args:
+            aide: 发起请求的aide对象
+            size: 单个批量请求的最大请求数
+            window: 等待合并请求的最长时间/s
+            workers: 工作线程数，默认为size和MAX_WORKERS中的较小值，单个批量请求最多包含workers个调用同时发出的请求
+        """
+        self.aide = aide
+        self.size = size
+        self.futures = []
+        self._queue = []
+        self._lock = threading.Lock()
+
+        workers = workers or min(size, MAX_WORKERS)
+        provider = self.aide.web3.provider
+        if isinstance(provider, HTTPProvider) or (isinstance(provider, MultiProvider) and provider.is_batchable):
+            self.collector = RequestCollector(provider, size=size, window=window, workers=workers)
+        else:
+            warnings.warn('batch request is only supported by HTTPProvider, the calls will be executed concurrently')
+            self.collector = None
+
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _call(self, future, func, args, kwargs):
+        if not future.set_running_or_notify_cancel():
+            return
+
+        _local.collector = self.collector
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+        finally:
+            _local.collector = None
+            if self.collector:
+                self.collector.finish_call()
+
+    def add(self, func: Callable, *args, **kwargs) -> Future:
+        """ 添加一个调用，可以是aide中任意的查询方法，返回该调用的Future
+        """
+        future = BatchFuture(self)
+        with self._lock:
+            self._queue.append((future, func, args, kwargs))
+            self.futures.append(future)
+            is_full = len(self._queue) >= self.size
+
+        if is_full:
+            self.execute()
+
+        return future
+
+    def map(self, func: Callable, *iterables) -> list:
+        """ 对多组参数添加同一个调用，返回Future列表
+        """
+        return [self.add(func, *args) for args in zip(*iterables)]
+
+    def execute(self):
+        """ 立即执行所有已添加、但尚未执行的调用
+        """
+        with self._lock:
+            calls, self._queue = self._queue, []
+
+        if not calls:
+            return
+
+        if self.collector:
+            self.collector.add_calls(len(calls))
+        for call in calls:
+            self._executor.submit(self._call, *call)
+
+    def results(self, raise_error=False) -> list:
+        """ 等待所有调用完成，按添加顺序返回结果
+        调用出现异常时，默认将异常对象作为结果返回，raise_error为True时直接抛出
+        """
+        self.execute()
+        wait(self.futures)
+        results = []
+        for future in self.futures:
+            error = future.exception()
+            if error and raise_error:
+                raise error
+            results.append(error or future.result())
+        return results
+
+    def close(self):
+        """ 执行剩余的调用并等待完成，然后释放工作线程
+        """
+        self.execute()
+        self._executor.shutdown(wait=True)
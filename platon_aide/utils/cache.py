@@ -0,0 +1,82 @@
+import threading
+import time
+from typing import Any, Callable, Hashable
+
+# 缓存中不存在的值
+_MISSING = object()
+
+
+class TTLCache:
+    """ 带有效期的缓存，用于缓存变化很少、但频繁使用的链上数据，如：节点身份信息
+    值超过有效期后会在下次访问时重新获取，也可以手动让缓存失效
+    """
+
+    def __init__(self, ttl: float = 300):
+        """
+        Args:
+            ttl: 缓存的有效期/s，为0时不缓存，为None时永久有效（直到手动失效）
+        """
+        self.ttl = ttl
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        return self._get(key) is not _MISSING
+
+    def _get(self, key):
+        with self._lock:
+            value, expire_time = self._values.get(key, (_MISSING, None))
+            if expire_time is not None and expire_time <= time.monotonic():
+                self._values.pop(key)
+                return _MISSING
+            return value
+
+    def get(self, key: Hashable, getter: Callable[[], Any] = None, default=None):
+        """ 获取缓存的值，缓存不存在或已过期时，通过getter获取并缓存，未指定getter时返回default
+        """
+        value = self._get(key)
+        if value is not _MISSING:
+            return value
+
+        if not getter:
+            return default
+
+        value = getter()
+        self.set(key, value)
+        return value
+
+    def get_remaining(self, key: Hashable):
+        """ 获取缓存值的剩余有效期/s，永久有效时返回None，缓存不存在或已过期时返回0
+        """
+        with self._lock:
+            value, expire_time = self._values.get(key, (_MISSING, None))
+        if value is _MISSING:
+            return 0
+        if expire_time is None:
+            return None
+        return max(expire_time - time.monotonic(), 0)
+
+    def set(self, key: Hashable, value, ttl: float = _MISSING):
+        """ 设置缓存的值
+
+        Args:
+            key: 缓存的键
+            value: 缓存的值
+            ttl: 该值的有效期/s，默认为缓存的有效期，为None时永久有效
+        """
+        if self.ttl == 0:
+            return
+
+        ttl = self.ttl if ttl is _MISSING else ttl
+        expire_time = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._values[key] = (value, expire_time)
+
+    def invalidate(self, *keys: Hashable):
+        """ 让指定的缓存失效，未指定时让全部缓存失效
+        """
+        with self._lock:
+            if not keys:
+                self._values.clear()
+            for key in keys:
+                self._values.pop(key, None)
@@ -0,0 +1,175 @@
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, Iterable, Tuple
+
+from platon.types import InnerFn
+from platon_utils import remove_0x_prefix
+
+from platon_aide.utils.reward import RewardEngine
+
+if TYPE_CHECKING:
+    from platon_aide import Aide
+    from platon_aide.utils.producer_index import ProducerIndex
+
+
+@dataclass
+class NodeReward:
+    """ 节点在结算周期的奖励
+    """
+    node_id: str
+    staking_block_number: int
+    block_count: int
+    reward_ratio: int
+    delegate_total: int
+    node_reward: int
+    staking_reward: int
+    delegate_reward: int
+
+
+@dataclass
+class EpochReward:
+    """ 结算周期的奖励估算结果
+    """
+    epoch: int
+    start_block: int
+    end_block: int
+    total_staking_reward: int
+    per_block_reward: int
+    verifier_count: int
+    nodes: Dict[str, NodeReward] = field(default_factory=dict)  # 节点id -> 节点奖励
+    delegators: Dict[Tuple[str, str], int] = field(default_factory=dict)  # (节点id, 委托地址) -> 委托分红
+
+
+class EpochRewardEstimator:
+    """ 结算周期奖励的估算器，一次遍历估算一个结算周期内所有验证人和委托人的奖励，功能如下：
+    1. 结算周期的区块只获取一次，一次得到所有节点的出块数，也可以从出块节点索引中查询
+    2. 周期的质押奖励、出块奖励和验证人列表在结算周期内的块高上一次批量查询，验证人的质押信息不再逐个查询
+    3. 委托人的委托信息按批量请求查询，每个委托只查询一次
+    4. 使用RewardEngine计算奖励，结果与Calculator中逐个计算的结果一致
+
+    用法如下：
+    estimator = EpochRewardEstimator(aide)
+    epoch_reward = estimator.estimate(epoch, delegators={node_id: [address1, address2]})
+
+    注意：查询历史结算周期时，需要节点保留了对应块高的状态
+    """
+
+    def __init__(self, aide: "Aide", window=500, processes=None, index: "ProducerIndex" = None, batch_size=100):
+        """
+        Args:
+            aide: 获取链上数据的aide对象
+            window: 每个批量获取的区块数，详见BlockSigners
+            processes: 恢复签名节点的进程数，详见BlockSigners
+            index: 出块节点索引，指定时从索引中查询出块数，详见ProducerIndex
+            batch_size: 查询委托信息时，单个批量请求中的请求数
+        """
+        self.aide = aide
+        self.window = window
+        self.processes = processes
+        self.index = index
+        self.batch_size = batch_size
+
+    def _call(self, contract, func_id, kwargs, block_identifier):
+        result = contract.function(func_id, kwargs).call(block_identifier=block_identifier)
+        # 内置合约查询失败时，返回的是错误信息
+        if isinstance(result, str):
+            raise ValueError(f'inner contract function {func_id} failed at block {block_identifier}: {result}')
+        return result
+
+    def get_epoch_state(self, block_identifier):
+        """ 一次批量查询块高所在结算周期的质押奖励、出块奖励和验证人列表
+        """
+        staking = self.aide.web3.ppos.staking
+        with self.aide.batch(size=3) as batch:
+            futures = [batch.add(self._call, staking, func_id, {}, block_identifier) for func_id in
+                       (InnerFn.staking_getStakingReward, InnerFn.staking_getBlockReward, InnerFn.staking_getVerifierList)]
+        total_staking_reward, per_block_reward, verifiers = [future.result() for future in futures]
+        return int(total_staking_reward), int(per_block_reward), verifiers
+
+    def get_block_counts(self, start_bn, end_bn) -> dict:
+        """ 获取[start_bn, end_bn)范围内，各节点的出块数，每个区块只获取一次
+        使用出块节点索引时，索引不包含尚未确认的区块，只统计已确认的区块
+        """
+        if self.index:
+            end_bn = min(end_bn, self.aide.platon.block_number - self.index.confirmations + 1)
+        return self.aide.calculator.get_block_counts(start_bn, end_bn, window=self.window, processes=self.processes, index=self.index)
+
+    def get_delegate_amounts(self, delegations: Iterable[Tuple[str, str, int]], block_identifier) -> list:
+        """ 批量查询委托在块高时的锁定期委托金额，delegations为(节点id, 委托地址, 节点质押块高)的列表，委托不存在时金额为0
+        """
+        delegate = self.aide.web3.ppos.delegate.delegateBase
+        delegations = list(delegations)
+        with self.aide.batch(size=self.batch_size) as batch:
+            for node_id, address, staking_block_number in delegations:
+                kwargs = {'staking_block_identifier': staking_block_number, 'address': address, 'node_id': node_id}
+                batch.add(delegate.function(InnerFn.delegate_getDelegateInfo, kwargs).call, block_identifier=block_identifier)
+
+        amounts = []
+        for future in batch.futures:
+            delegate_info = future.result()
+            # 委托不存在时，返回的是错误信息
+            amounts.append(0 if isinstance(delegate_info, str) else delegate_info['Released'] + delegate_info['RestrictingPlan'])
+        return amounts
+
+    def estimate(self, epoch=None, delegators: Dict[str, Iterable[str]] = None) -> EpochReward:
+        """ 估算一个结算周期内，所有验证人的出块数、节点奖励、质押奖励和全部委托分红，以及指定委托人的委托分红
+        结算周期尚未结束时，按已出的区块估算
+
+        Args:
+            epoch: 结算周期，默认为上一个结算周期
+            delegators: 需要计算委托分红的委托人，{节点id: [委托地址]}
+        """
+        calculator = self.aide.calculator
+        latest = self.aide.platon.block_number
+        if epoch is None:
+            epoch = max(calculator.get_period_info(latest, 'epoch')[0] - 1, 1)
+        start_block, end_block = calculator.get_period_ends(epoch, 'epoch')
+        if start_block > latest:
+            raise ValueError(f'the epoch {epoch} has not started yet')
+
+        # 结算周期的最后一个区块会进行结算，在其之前的块高上查询该结算周期的数据
+        state_block = max(min(end_block - 1, latest), 0)
+        total_staking_reward, per_block_reward, verifiers = self.get_epoch_state(state_block)
+        block_counts = self.get_block_counts(start_block, min(end_block, latest) + 1)
+
+        node_ids = [remove_0x_prefix(verifier['NodeId']) for verifier in verifiers]
+        counts = [block_counts.get(node_id, 0) for node_id in node_ids]
+        ratios = [int(verifier['RewardPer']) for verifier in verifiers]
+        engine = RewardEngine(total_staking_reward, len(verifiers), per_block_reward)
+        node_rewards, staking_rewards, delegate_rewards = engine.node_rewards(counts, ratios)
+
+        result = EpochReward(epoch, start_block, end_block, total_staking_reward, per_block_reward, len(verifiers))
+        for node_id, verifier, count, ratio, node_reward, staking_reward, delegate_reward in \
+                zip(node_ids, verifiers, counts, ratios, node_rewards, staking_rewards, delegate_rewards):
+            delegate_total = int(verifier['DelegateTotal'] or 0)
+            # 节点没有锁定期委托时，不会产生委托分红，奖励全部归节点所有
+            if not delegate_total:
+                staking_reward, delegate_reward = node_reward, 0
+            result.nodes[node_id] = NodeReward(node_id, int(verifier['StakingBlockNum']), count, ratio, delegate_total,
+                                               node_reward, staking_reward, delegate_reward)
+
+        if delegators:
+            self._estimate_delegators(result, delegators, state_block)
+        return result
+
+    def _estimate_delegators(self, result: EpochReward, delegators: Dict[str, Iterable[str]], block_identifier):
+        delegations = []
+        for node_id, addresses in delegators.items():
+            node = result.nodes.get(remove_0x_prefix(node_id))
+            # 不是验证人的节点没有奖励
+            if not node:
+                result.delegators.update({(remove_0x_prefix(node_id), address): 0 for address in addresses})
+                continue
+            delegations.extend((node.node_id, address, node.staking_block_number) for address in addresses)
+
+        amounts = self.get_delegate_amounts(delegations, block_identifier)
+        node_amounts = {}  # 节点id -> [(委托地址, 委托金额)]
+        for (node_id, address, _), amount in zip(delegations, amounts):
+            node_amounts.setdefault(node_id, []).append((address, amount))
+
+        for node_id, items in node_amounts.items():
+            node = result.nodes[node_id]
+            if node.delegate_total:
+                rewards = RewardEngine.delegate_rewards(node.delegate_reward, [amount for _, amount in items], node.delegate_total)
+            else:
+                rewards = [0] * len(items)
+            result.delegators.update({(node_id, address): reward for (address, _), reward in zip(items, rewards)})
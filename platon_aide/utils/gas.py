@@ -0,0 +1,145 @@
+import copy
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Union
+
+from hexbytes import HexBytes
+from platon._utils.inner_contract import InnerContractFunction
+
+# 交易的基础gas，以及交易data中每个零字节、非零字节的gas
+TX_GAS = 21000
+TX_DATA_ZERO_GAS = 4
+TX_DATA_NON_ZERO_GAS = 68
+
+# 内置合约方法的固定gas（不含交易基础gas和data gas），值也可以是通过方法参数计算gas的函数
+INNER_CONTRACT_GAS = {
+    1000: 32000,  # 创建质押
+    1001: 12000,  # 修改质押信息
+    1002: 20000,  # 增持质押
+    1003: 20000,  # 撤销质押
+    1004: 16000,  # 委托
+    1005: 8000,  # 撤销委托
+    2000: 350000,  # 提交文本提案
+    2001: 450000,  # 提交升级提案
+    2002: 500000,  # 提交参数提案
+    2003: 32000,  # 投票
+    2004: 3000,  # 版本声明
+    2005: 500000,  # 提交取消提案
+    3000: 21000,  # 举报双签
+    4000: lambda kwargs: 18000 + 21000 * len(kwargs.get('plans') or []),  # 创建锁仓计划，每个释放计划另需21000
+}
+
+
+def data_gas(data) -> int:
+    """ 计算交易data所需的gas
+    """
+    data = bytes(HexBytes(data or b''))
+    zeros = data.count(0)
+    return zeros * TX_DATA_ZERO_GAS + (len(data) - zeros) * TX_DATA_NON_ZERO_GAS
+
+
+def argument_shape(value):
+    """ 获取参数的形状，即类型和长度，用于区分gas消耗可能不同的调用，参数的具体数值不会影响形状
+    """
+    if isinstance(value, (list, tuple)):
+        return 'list', tuple(argument_shape(item) for item in value)
+    if isinstance(value, dict):
+        return 'dict', tuple((key, argument_shape(item)) for key, item in value.items())
+    if isinstance(value, (str, bytes, bytearray)):
+        return type(value).__name__, len(value)
+    return type(value).__name__
+
+
+class GasStrategy:
+    """ gas策略，在构造交易时提供gas，减少交易前的预估gas请求，功能如下：
+    1. 内置合约方法按方法id查询固定的gas表，加上交易基础gas和data gas，不在gas表中的方法仍然预估gas
+    2. solidity合约调用按(合约地址, 方法选择器, 参数形状)缓存预估过的gas
+    3. 在gas的基础上乘以安全系数，未使用的gas不会被扣除
+    4. 缓存未命中时仍然预估gas并记录结果，交易发送失败或gas耗尽时，丢弃对应的缓存，下次重新预估
+
+    注意：跳过预估gas后，内置合约的业务错误不会在发送交易前返回，而是在交易回执的事件中返回；
+    内置合约交易的结果是解码后的事件，无法判断gas是否耗尽，因此不缓存内置合约预估过的gas
+    """
+
+    def __init__(self,
+                 tables: Dict[int, Union[int, Callable[[dict], int]]] = None,
+                 margin=1.2,
+                 size=4096,
+                 learn=True,
+                 ):
+        """
+        Args:
+            tables: 内置合约方法的固定gas表，会覆盖默认表中的同名项，值为None时表示该方法不使用固定gas
+            margin: gas的安全系数
+            size: 缓存的gas数量上限
+            learn: 是否缓存预估过的gas
+        """
+        self.tables = dict(INNER_CONTRACT_GAS, **(tables or {}))
+        self.margin = margin
+        self.size = size
+        self.learn = learn
+        self._cache = OrderedDict()  # 调用的键 -> gas
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def get_key(fn):
+        """ 获取合约调用的键，区分合约地址、方法选择器和参数形状，内置合约不缓存预估过的gas，返回None
+        """
+        if isinstance(fn, InnerContractFunction):
+            return None
+        return fn.address, getattr(fn, 'selector', None), argument_shape(getattr(fn, 'arguments', None))
+
+    def get_gas(self, fn, key=None):
+        """ 获取合约调用的gas，没有可用的gas时返回None，需要预估gas
+        key为get_key获取的调用键，需要在构造交易之前获取，因为构造交易时会格式化内置合约方法的参数
+        """
+        gas = None
+        if isinstance(fn, InnerContractFunction):
+            gas = self._get_table_gas(fn)
+        elif self.learn:
+            key = key or self.get_key(fn)
+            with self._lock:
+                gas = self._cache.get(key)
+                if gas is not None:
+                    self._cache.move_to_end(key)
+
+        with self._lock:
+            if gas is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return gas
+
+    def _get_table_gas(self, fn: InnerContractFunction):
+        table_gas = self.tables.get(fn.func_id)
+        if table_gas is None:
+            return None
+
+        if callable(table_gas):
+            table_gas = table_gas(fn.kwargs or {})
+        # 编码时会格式化方法参数，使用副本编码，以免影响之后构造交易
+        data = copy.copy(fn)._encode_transaction_data()
+        return int((TX_GAS + data_gas(data) + table_gas) * self.margin)
+
+    def record(self, key, gas):
+        """ 记录调用预估的gas，下次相同形状的调用直接使用
+        """
+        if not self.learn or not gas:
+            return
+
+        with self._lock:
+            self._cache[key] = int(gas * self.margin)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.size:
+                self._cache.popitem(last=False)
+
+    def invalidate(self, *keys):
+        """ 丢弃调用缓存的gas，不指定时丢弃全部缓存
+        """
+        with self._lock:
+            if not keys:
+                self._cache.clear()
+            for key in keys:
+                self._cache.pop(key, None)
@@ -0,0 +1,158 @@
+import asyncio
+import json
+import threading
+import time
+from typing import TYPE_CHECKING
+
+import aiohttp
+from loguru import logger
+
+if TYPE_CHECKING:
+    from platon_aide import Aide
+
+
+class HeadWatcher:
+    """ 共享的区块头监听器，由一个后台线程跟踪最新块高，同时服务任意数量的等待块高请求，功能如下：
+    1. 有websocket链接时，通过newHeads订阅获取新区块，区块产生后立即唤醒等待者
+    2. 没有websocket链接或订阅失败时，根据出块间隔和最近的目标块高自适应地休眠，而不是每秒查询块高
+    3. 没有等待者时，后台线程自动退出，下次等待时重新启动
+    """
+
+    def __init__(self, aide: "Aide", ws_uri: str = None, block_time: float = None):
+        """
+        Args:
+            aide: 查询块高的aide对象
+            ws_uri: 用于订阅新区块的websocket链接，默认在aide使用websocket链接时使用该链接
+            block_time: 出块间隔/s，默认通过经济模型数据或链上平均出块时间获取
+        """
+        self.aide = aide
+        self.ws_uri = ws_uri or (aide.uri if aide.uri.startswith('ws') else None)
+        self.block_number = None  # 最新块高
+        self._block_time = block_time
+        self._targets = []  # 等待中的目标块高
+        self._condition = threading.Condition()
+        self._thread = None
+
+    @property
+    def block_time(self):
+        """ 出块间隔/s，优先使用经济模型数据，其次使用链上的平均出块时间
+        """
+        if self._block_time:
+            return self._block_time
+
+        try:
+            if self.aide.economic:
+                self._block_time = self.aide.economic.block_time
+            else:
+                self._block_time = self.aide.staking.get_avg_block_time() / 1000
+        except Exception as e:
+            logger.warning(f'cannot get the block time, use 1s instead: {e}')
+        self._block_time = self._block_time or 1
+        return self._block_time
+
+    def _set_block_number(self, block_number):
+        with self._condition:
+            if self.block_number is None or block_number > self.block_number:
+                self.block_number = block_number
+                self._condition.notify_all()
+
+    def _start(self):
+        # 需要在持有锁时调用
+        if not self._thread:
+            self._thread = threading.Thread(target=self._run, name='head-watcher', daemon=True)
+            self._thread.start()
+
+    def get_block_number(self):
+        """ 获取最新块高，后台线程运行时直接使用它跟踪的块高，不会发送请求
+        """
+        with self._condition:
+            is_running = self._thread is not None
+        if not is_running or self.block_number is None:
+            self._set_block_number(self.aide.platon.block_number)
+        return self.block_number
+
+    def wait(self, to_block, timeout=None):
+        """ 阻塞等待，直到最新块高大于to_block（即to_block已确定落链），超时后抛出TimeoutError
+        """
+        self.get_block_number()
+        deadline = time.monotonic() + timeout if timeout is not None else None
+
+        with self._condition:
+            self._targets.append(to_block)
+            self._start()
+            self._condition.notify_all()  # 唤醒休眠中的后台线程，以便按新的目标块高调整休眠时长
+            try:
+                while self.block_number <= to_block:
+                    remaining = deadline - time.monotonic() if deadline is not None else None
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError('wait block timeout!')
+                    self._condition.wait(remaining)
+            finally:
+                self._targets.remove(to_block)
+
+        return self.block_number
+
+    def _run(self):
+        ws_failed = False
+        while True:
+            with self._condition:
+                if not self._targets:
+                    self._thread = None
+                    return
+
+            if self.ws_uri and not ws_failed:
+                try:
+                    asyncio.run(self._subscribe())
+                except Exception as e:
+                    logger.warning(f'cannot subscribe new heads from {self.ws_uri}, fallback to polling: {e}')
+                    ws_failed = True
+                continue
+
+            try:
+                self._poll()
+            except Exception as e:
+                logger.warning(f'failed to get block number: {e}')
+                time.sleep(self.block_time)
+
+    def _poll(self):
+        """ 查询一次块高，然后休眠到最近的目标块高预计产生的时间，新的等待者加入时会被提前唤醒
+        """
+        self._set_block_number(self.aide.platon.block_number)
+
+        with self._condition:
+            if not self._targets:
+                return
+            # 距离最近的目标块高确定落链还需要的区块数
+            remaining = min(self._targets) + 1 - self.block_number
+            if remaining > 1:
+                sleep_time = (remaining - 1) * self.block_time
+            else:
+                sleep_time = self.block_time / 4
+            self._condition.wait(max(sleep_time, 0.05))
+
+    async def _subscribe(self):
+        """ 通过websocket订阅新区块，直到没有等待者
+        """
+        async with aiohttp.ClientSession() as session:
+            async with session.ws_connect(self.ws_uri) as ws:
+                await ws.send_json({"jsonrpc": "2.0", "id": 1, "method": "platon_subscribe", "params": ["newHeads"]})
+                while True:
+                    with self._condition:
+                        if not self._targets:
+                            return
+
+                    try:
+                        message = await ws.receive(timeout=1)
+                    except asyncio.TimeoutError:
+                        continue
+
+                    if message.type != aiohttp.WSMsgType.TEXT:
+                        raise ConnectionError(f'the websocket connection is closed: {message.type}')
+
+                    data = json.loads(message.data)
+                    if 'error' in data:
+                        raise ValueError(data['error'])
+
+                    head = data.get('params', {}).get('result')
+                    if isinstance(head, dict) and 'number' in head:
+                        self._set_block_number(int(head['number'], 16))
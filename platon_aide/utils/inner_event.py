@@ -0,0 +1,138 @@
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Any, List, NamedTuple, Union
+
+import rlp
+from hexbytes import HexBytes
+from platon._utils.contract_formatter import INNER_CONTRACT_EVENT_FORMATTERS
+from platon._utils.error_code import ERROR_CODE
+from platon._utils.inner_contract import InnerContractEvent
+from platon._utils.method_formatters import to_hex_if_bytes, to_integer_if_bytes
+from platon_utils import encode_hex
+
+# 常用字段格式化函数的等价实现，省去通用格式化函数的调用开销，其他格式化函数仍使用原函数
+FAST_FORMATTERS = {
+    to_integer_if_bytes: lambda value: int.from_bytes(value, 'big') if isinstance(value, (bytes, bytearray)) else value,
+    to_hex_if_bytes: lambda value: encode_hex(value) if isinstance(value, (bytes, bytearray)) else value,
+}
+
+
+class InnerEvent(NamedTuple):
+    """ 内置合约交易的事件记录，data为普通的dict或dict列表，没有返回数据时为None
+    """
+    tx_hash: str
+    block_number: int
+    func_id: int
+    code: int
+    message: str
+    data: Any
+
+
+@lru_cache(maxsize=None)
+def get_inner_contract_event(func_id=None) -> InnerContractEvent:
+    """ 获取方法id对应的内置合约事件解析对象，它是无状态的，同一方法id共用一个对象
+    """
+    return InnerContractEvent(func_id)
+
+
+class InnerEventDecoder:
+    """ 内置合约事件的快速解析器，与InnerContractEvent的解析结果一致，区别如下：
+    1. 构造时预先取出事件的字段名和格式化函数，同一方法id共用一个解析器
+    2. 直接返回普通的dict，不再递归转换为AttributeDict
+    """
+
+    def __init__(self, func_id=None):
+        """
+        Args:
+            func_id: 内置合约方法id
+        """
+        self.func_id = func_id
+        self.is_list = False
+        self.fields = None  # 字段名 -> 格式化函数，事件没有返回数据时为None
+
+        formatter = INNER_CONTRACT_EVENT_FORMATTERS.get(func_id)
+        if formatter is None:
+            return
+        if formatter.__name__ == 'apply_formatters_to_dict':
+            fields = formatter.args[0]
+        elif formatter.__name__ == 'apply_formatter_to_array':
+            self.is_list = True
+            fields = formatter.args[0].args[0]
+        else:
+            raise ValueError(f'Unknown formatter: {formatter.__name__}')
+        self.fields = tuple((name, FAST_FORMATTERS.get(field_formatter, field_formatter)) for name, field_formatter in fields.items())
+
+    @classmethod
+    @lru_cache(maxsize=None)
+    def get(cls, func_id=None) -> "InnerEventDecoder":
+        """ 获取方法id对应的解析器，解析器会被缓存复用
+        """
+        return cls(func_id)
+
+    def _format(self, args):
+        return {name: formatter(value) for (name, formatter), value in zip(self.fields, args)}
+
+    def decode(self, data: Union[bytes, str]):
+        """ 解析内置合约事件的data，返回(code, message, data)
+        """
+        items = rlp.decode(bytes(HexBytes(data)))
+        code = int(items[0])
+        message = ERROR_CODE.get(code, 'Unknown error code')
+        if not self.fields:
+            return code, message, None
+
+        args = [rlp.decode(arg) for arg in items[1:]]
+        if not self.is_list:
+            return code, message, self._format(args)
+
+        if type(args[0]) is not list:
+            raise ValueError('event data is inconsistent with formatter')
+        return code, message, [self._format(item) for item in args[0]]
+
+
+def decode_inner_events(items: list) -> list:
+    """ 批量解析内置合约事件，用于在进程池中执行，items为(tx_hash, block_number, func_id, data)的列表
+    解析失败时，将异常对象作为结果返回
+    """
+    events = []
+    for tx_hash, block_number, func_id, data in items:
+        try:
+            events.append(InnerEvent(tx_hash, block_number, func_id, *InnerEventDecoder.get(func_id).decode(data)))
+        except Exception as e:
+            events.append(e)
+    return events
+
+
+def decode_receipts(receipts: list, func_ids: Union[int, List[int]] = None, processes=0, chunk_size=2000) -> list:
+    """ 批量解析内置合约交易回执中的事件，按回执顺序返回InnerEvent，单个回执解析失败时，将异常对象作为结果返回
+
+    Args:
+        receipts: 内置合约交易回执列表
+        func_ids: 方法id，可以是所有回执共用的方法id，也可以是与回执一一对应的方法id列表
+        processes: 解析的进程数，为0时在当前进程中解析，为None时为cpu核数
+        chunk_size: 每个进程任务解析的回执数
+    """
+    if func_ids is None or isinstance(func_ids, int):
+        func_ids = [func_ids] * len(receipts)
+    if len(func_ids) != len(receipts):
+        raise ValueError(f'got {len(func_ids)} func ids for {len(receipts)} receipts')
+
+    items = []
+    errors = {}  # 回执序号 -> 取出事件data时的异常
+    for i, (receipt, func_id) in enumerate(zip(receipts, func_ids)):
+        try:
+            tx_hash = receipt.get('transactionHash')
+            items.append((HexBytes(tx_hash).hex() if tx_hash else None, receipt.get('blockNumber'), func_id, receipt['logs'][0]['data']))
+        except Exception as e:
+            errors[i] = e
+
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+    if processes == 0 or len(chunks) <= 1:
+        events = [event for chunk in chunks for event in decode_inner_events(chunk)]
+    else:
+        with ProcessPoolExecutor(processes) as executor:
+            events = [event for result in executor.map(decode_inner_events, chunks) for event in result]
+
+    for i in sorted(errors):
+        events.insert(i, errors[i])
+    return events
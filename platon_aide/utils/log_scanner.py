@@ -0,0 +1,218 @@
+import json
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Iterable, List, Union
+
+from loguru import logger
+from platon._utils.abi import build_default_registry, filter_by_type
+from platon._utils.events import get_event_data
+from platon_abi.codec import ABICodec
+from platon_utils import encode_hex, event_abi_to_log_topic
+
+if TYPE_CHECKING:
+    from platon_aide import Aide
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS checkpoints (key TEXT PRIMARY KEY, block INTEGER NOT NULL);
+'''
+
+# 解析日志使用的编解码器，进程池中的每个进程各自构造一次
+_codec = None
+
+
+def get_event_abis(abi, event_names=None, vm_type='solidity') -> dict:
+    """ 获取合约abi中事件的topic -> 事件abi，匿名事件没有topic，不包含在内
+    """
+    events = [event for event in filter_by_type('event', abi) if not event.get('anonymous')]
+    if event_names:
+        events = [event for event in events if event['name'] in event_names]
+        missing = set(event_names) - {event['name'] for event in events}
+        if missing:
+            raise ValueError(f'the events {missing} are not found in the abi')
+    return {encode_hex(event_abi_to_log_topic(event, vm_type)): event for event in events}
+
+
+def decode_logs(event_abis: dict, logs: list, vm_type='solidity') -> list:
+    """ 按事件abi批量解析日志，用于在进程池中执行，无法匹配事件abi的日志不会返回
+    """
+    global _codec
+    if _codec is None:
+        _codec = ABICodec(build_default_registry())
+
+    events = []
+    for log in logs:
+        topics = log.get('topics')
+        event_abi = event_abis.get(encode_hex(topics[0])) if topics else None
+        if not event_abi:
+            continue
+        events.append(get_event_data(_codec, event_abi, log, vm_type))
+    return events
+
+
+class LogScanner:
+    """ 区块范围日志扫描器，分段获取大范围区块的日志，功能如下：
+    1. 按合约地址和topic过滤日志，分段请求getLogs，请求失败（如：超出节点的结果数量限制、超时）时，将分段减半后重试
+    2. 分段的日志数较少时合并分段，日志数超过target_logs时拆分分段，使每次请求的结果量保持稳定
+    3. 提供事件abi时，在进程池中解析日志，进程池工作时，同时获取下一个分段的日志
+    4. 以生成器的方式按区块顺序返回日志，每个分段返回完毕后记录检查点，指定数据库时检查点会被保存，中断后再次扫描会从检查点继续
+
+    用法如下：
+    with LogScanner(aide, address=address, abi=abi, path='logs.db') as scanner:
+        for event in scanner.scan(0):
+            print(event)
+    """
+
+    def __init__(self,
+                 aide: "Aide",
+                 address: Union[str, List[str]] = None,
+                 topics: list = None,
+                 abi=None,
+                 event_names: List[str] = None,
+                 vm_type='solidity',
+                 chunk_size=1000,
+                 min_chunk_size=1,
+                 max_chunk_size=100000,
+                 target_logs=5000,
+                 confirmations=10,
+                 path=None,
+                 name=None,
+                 processes=None,
+                 decode_batch_size=500,
+                 ):
+        """
+        Args:
+            aide: 获取日志的aide对象
+            address: 合约地址或合约地址列表，为None时不按地址过滤
+            topics: getLogs的topic过滤条件，提供abi时，首个topic默认为所有（或event_names指定的）事件的topic
+            abi: 合约abi，提供时返回解析后的事件，否则返回原始日志
+            event_names: 需要扫描的事件名称，为None时扫描abi中的全部事件
+            vm_type: 合约的vm类型
+            chunk_size: 初始的分段块数
+            min_chunk_size: 最小分段块数，分段已减到最小仍然请求失败时，抛出异常
+            max_chunk_size: 最大分段块数
+            target_logs: 单个分段的目标日志数
+            confirmations: 确认块数，未指定结束块高时，只扫描到当前块高减去确认块数
+            path: 检查点数据库文件路径，为None时只在内存中记录检查点
+            name: 检查点的名称，默认由地址和topic生成，过滤条件不同的扫描互不影响
+            processes: 解析日志的进程数，为0时在当前进程中解析，为None时为cpu核数
+            decode_batch_size: 每个进程任务解析的日志数
+        """
+        self.aide = aide
+        self.address = address
+        self.vm_type = vm_type
+        self.event_abis = get_event_abis(abi, event_names, vm_type) if abi else None
+        if self.event_abis is not None and not topics:
+            topics = [list(self.event_abis.keys())]
+        self.topics = topics
+        self.chunk_size = chunk_size
+        self.min_chunk_size = min_chunk_size
+        self.max_chunk_size = max_chunk_size
+        self.target_logs = target_logs
+        self.confirmations = confirmations
+        self.path = path
+        self.name = name or json.dumps([address, topics], sort_keys=True, default=str)
+        self.decode_batch_size = decode_batch_size
+        self.checkpoint = None  # 已返回全部日志的最高块高
+        self._lock = threading.Lock()
+        self._executor = ProcessPoolExecutor(processes) if processes != 0 and self.event_abis else None
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.executescript(SCHEMA)
+            self._check_chain()
+            row = self._db.execute('SELECT block FROM checkpoints WHERE key = ?', (self.name,)).fetchone()
+            self.checkpoint = row[0] if row else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self._db:
+            self._db.close()
+            self._db = None
+
+    def _check_chain(self):
+        genesis_hash = self.aide.platon.get_block(0)['hash'].hex()
+        with self._lock, self._db:
+            row = self._db.execute('SELECT value FROM meta WHERE key = ?', ('genesis_hash',)).fetchone()
+            if row and row[0] != genesis_hash:
+                raise ValueError(f'the checkpoints {self.path} belong to another chain, genesis hash: {row[0]}')
+            self._db.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', ('genesis_hash', genesis_hash))
+
+    def _save_checkpoint(self, block_number):
+        self.checkpoint = block_number
+        if self._db:
+            with self._lock, self._db:
+                self._db.execute('INSERT OR REPLACE INTO checkpoints (key, block) VALUES (?, ?)', (self.name, block_number))
+
+    def _get_logs(self, from_block, to_block) -> list:
+        log_filter = {'fromBlock': from_block, 'toBlock': to_block}
+        if self.address:
+            log_filter['address'] = self.address
+        if self.topics:
+            log_filter['topics'] = self.topics
+        return self.aide.platon.get_logs(log_filter)
+
+    def _fetch(self, from_block, end_block):
+        """ 获取从from_block开始的一个分段的日志，请求失败时减半分段重试，返回分段的结束块高和日志
+        """
+        while True:
+            to_block = min(from_block + self.chunk_size - 1, end_block)
+            try:
+                logs = self._get_logs(from_block, to_block)
+            except Exception as e:
+                if self.chunk_size <= self.min_chunk_size:
+                    raise
+                self.chunk_size = max(self.chunk_size // 2, self.min_chunk_size)
+                logger.debug(f'failed to get logs of blocks [{from_block}, {to_block}], retry with chunk size {self.chunk_size}: {e}')
+                continue
+
+            # 按本次的日志数调整下一个分段的大小
+            if len(logs) > self.target_logs:
+                self.chunk_size = max(self.chunk_size // 2, self.min_chunk_size)
+            elif len(logs) < self.target_logs // 2 and to_block - from_block + 1 == self.chunk_size:
+                self.chunk_size = min(self.chunk_size * 2, self.max_chunk_size)
+            return to_block, logs
+
+    def _decode(self, logs):
+        if self.event_abis is None:
+            return [logs]
+
+        chunks = [logs[i:i + self.decode_batch_size] for i in range(0, len(logs), self.decode_batch_size)]
+        if not self._executor:
+            return [decode_logs(self.event_abis, chunk, self.vm_type) for chunk in chunks]
+        return [self._executor.submit(decode_logs, self.event_abis, chunk, self.vm_type) for chunk in chunks]
+
+    def _results(self, to_block, chunks):
+        for chunk in chunks:
+            yield from (chunk if type(chunk) is list else chunk.result())
+        self._save_checkpoint(to_block)
+
+    def scan(self, from_block=0, to_block=None) -> Iterable:
+        """ 按区块顺序返回[from_block, to_block]范围内的事件或日志，存在检查点时从检查点之后继续
+        to_block为None时，扫描到当前块高减去确认块数
+        """
+        if to_block is None:
+            to_block = self.aide.platon.block_number - self.confirmations
+        if self.checkpoint is not None:
+            from_block = max(from_block, self.checkpoint + 1)
+
+        pending = None  # 上一个分段正在解析的日志
+        while from_block <= to_block:
+            chunk_end, logs = self._fetch(from_block, to_block)
+            current = (chunk_end, self._decode(logs))
+            if pending:
+                yield from self._results(*pending)
+            pending = current
+            from_block = chunk_end + 1
+
+        if pending:
+            yield from self._results(*pending)
@@ -0,0 +1,143 @@
+import threading
+from typing import TYPE_CHECKING
+
+from loguru import logger
+
+if TYPE_CHECKING:
+    from platon_aide import Aide
+
+# 节点返回的、需要重新同步nonce的错误信息
+NONCE_ERRORS = (
+    'nonce too low',
+    'nonce too high',
+)
+
+# 节点返回的、交易已在交易池中的错误信息，此时交易已发送成功，不能使用新的nonce重发，否则交易会被发送两次
+KNOWN_ERRORS = (
+    'known transaction',
+    'already known',
+)
+
+# 节点返回的、交易池中已有相同nonce交易的错误信息，该nonce已被占用，不能复用，也不能使用新的nonce重发
+REPLACEMENT_ERRORS = (
+    'replacement transaction underpriced',
+)
+
+
+def _match(error, messages) -> bool:
+    message = str(error).lower()
+    return any(err in message for err in messages)
+
+
+def is_nonce_error(error) -> bool:
+    """ 判断交易发送的错误是否由nonce引起，可以重新同步nonce后重发
+    """
+    return _match(error, NONCE_ERRORS)
+
+
+def is_known_error(error) -> bool:
+    """ 判断交易发送的错误是否由交易已在交易池中引起，此时应视为发送成功
+    """
+    return _match(error, KNOWN_ERRORS)
+
+
+def is_replacement_error(error) -> bool:
+    """ 判断交易发送的错误是否由交易池中已有相同nonce的交易引起
+    """
+    return _match(error, REPLACEMENT_ERRORS)
+
+
+class NonceLane:
+    """ 单个账户的nonce通道，同一账户的nonce分配在通道锁内完成
+    """
+
+    def __init__(self, address):
+        self.address = address
+        self.lock = threading.Lock()
+        self.nonce = None  # 下一个可用的nonce，为None时需要从链上同步
+        self.generation = 0  # 通道的同步代数，重新同步通道时增加
+        self.synced = None  # 同步nonce时的(全部通道的同步代数, 通道的同步代数)，与当前代数不同时需要重新同步
+
+    def __repr__(self):
+        return f'NonceLane({self.address}, nonce={self.nonce})'
+
+
+class NonceManager:
+    """ 本地nonce管理器，功能如下：
+    1. 在内存中按账户记录下一个nonce，避免每笔交易都查询链上nonce
+    2. 在多线程下原子地分配nonce，同一账户的并发交易不会冲突
+    3. 仅在首次使用、nonce相关错误或交易丢失后，才从链上重新同步
+
+    注意：分配nonce时会在通道锁内从链上同步，同步的请求可能触发主节点切换回调，而回调会重新同步全部通道，
+    因此重新同步只增加同步代数，不获取通道锁，分配nonce时发现代数变化再从链上同步
+    """
+
+    def __init__(self, aide: "Aide"):
+        self.aide = aide
+        self._lanes = {}
+        self._lock = threading.Lock()
+        self._generation = 0  # 全部通道的同步代数，重新同步全部通道时增加
+
+    def _lane(self, address) -> NonceLane:
+        with self._lock:
+            lane = self._lanes.get(address)
+            if not lane:
+                lane = self._lanes[address] = NonceLane(address)
+            return lane
+
+    def next_nonce(self, address) -> int:
+        """ 为账户分配下一个nonce
+        """
+        lane = self._lane(address)
+        with lane.lock:
+            generation = (self._generation, lane.generation)
+            if lane.nonce is None or lane.synced != generation:
+                # 同步期间再次被标记重新同步时，代数会再次变化，下一次分配时会重新同步
+                lane.nonce = self.fetch_nonce(address)
+                lane.synced = generation
+            nonce = lane.nonce
+            lane.nonce += 1
+            return nonce
+
+    def release(self, address, nonce):
+        """ 归还未成功发送的nonce
+        如果它是最后分配的nonce，则直接回退复用，否则标记通道需要重新同步，以免留下nonce空洞
+        """
+        lane = self._lane(address)
+        with lane.lock:
+            if lane.nonce == nonce + 1:
+                lane.nonce = nonce
+            else:
+                lane.nonce = None
+
+    def resync(self, address=None):
+        """ 标记账户通道需要重新同步，不指定账户时，标记全部通道
+        注意：同步是惰性的，会在下一次分配nonce时进行，不会等待正在进行的nonce分配，因此可以在任意请求中调用
+        """
+        with self._lock:
+            if not address:
+                self._generation += 1
+            elif address in self._lanes:
+                self._lanes[address].generation += 1
+
+    def fetch_nonce(self, address) -> int:
+        """ 从链上获取账户下一个可用的nonce
+        以pending状态的交易数为准，并参考交易池中已存在的连续pending交易
+        """
+        nonce = self.aide.platon.get_transaction_count(address, 'pending')
+
+        try:
+            content = self.aide.txpool.content()
+        except (IOError, ValueError):
+            # 节点可能未开放txpool接口
+            content = None
+
+        if content:
+            pending = content.get('pending') or {}
+            txs = pending.get(address) or {}
+            nonces = {int(n) for n in txs.keys()}
+            while nonce in nonces:
+                nonce += 1
+
+        logger.debug(f'sync nonce of {address}: {nonce}')
+        return nonce
@@ -0,0 +1,154 @@
+import dataclasses
+import threading
+from typing import TYPE_CHECKING, List, NamedTuple
+
+from loguru import logger
+
+if TYPE_CHECKING:
+    from platon_aide import Aide
+    from platon_aide.economic import Economic
+
+# 参数提案的类型
+PARAM_PROPOSAL_TYPE = 3
+# 参数提案通过后的状态，通过的参数提案在投票截止块高的下一个块高生效
+PASSED_STATUS = (2, 5)
+# 提案状态：投票中
+VOTING_STATUS = 1
+
+
+class ParamChange(NamedTuple):
+    """ 参数提案带来的经济模型参数变化
+    """
+    proposal_id: str
+    module: str
+    name: str
+    value: str
+    active_block: int
+
+
+class EconomicRefresher:
+    """ 经济模型参数的增量刷新器，跟踪通过的参数提案，在生效块高将变化的参数设置到经济模型中，功能如下：
+    1. 每次刷新只获取一次提案列表，只对投票已截止、且尚未处理的参数提案批量查询投票结果
+    2. 通过的提案按生效块高排序，到达生效块高后只修改提案对应的参数，派生常量随之重新计算
+    3. 生效块高尚未到达的提案会被保留，之后的刷新中到达生效块高时再修改
+    4. 可以启动后台线程定时刷新，适用于长期运行的服务
+
+    用法如下：
+    refresher = aide.economic_refresher()
+    changes = refresher.refresh()
+
+    注意：只修改经济模型中存在的参数，如：block模块的maxBlockGasLimit不在经济模型中，会被忽略；
+    首次刷新会处理链上所有已通过的参数提案，已经反映在经济模型中的参数会被设置为相同的值
+    """
+
+    def __init__(self, aide: "Aide", economic: "Economic" = None, batch_size=100):
+        """
+        Args:
+            aide: 获取提案的aide对象
+            economic: 需要刷新的经济模型对象，默认为aide的经济模型
+            batch_size: 查询提案结果时，单个批量请求中的请求数
+        """
+        self.aide = aide
+        self.economic = economic or aide.economic
+        if self.economic is None:
+            raise ValueError('the economic data is required, please set it in aide')
+
+        self.batch_size = batch_size
+        self.changes: List[ParamChange] = []  # 已设置到经济模型的参数变化
+        self.pending: List[ParamChange] = []  # 已通过、但尚未生效的参数变化
+        self._done = set()  # 已处理的提案id，包括未通过的提案
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def _get_new_changes(self, block_number) -> List[ParamChange]:
+        """ 获取投票已截止、尚未处理的参数提案中，通过的参数变化
+        """
+        proposals = [proposal for proposal in self.aide.govern.proposal_list(PARAM_PROPOSAL_TYPE)
+                     if proposal.ProposalID not in self._done and proposal.EndVotingBlock <= block_number]
+        if not proposals:
+            return []
+
+        pip = self.aide.web3.pip
+        with self.aide.batch(size=self.batch_size) as batch:
+            futures = [batch.add(pip.get_proposal_result, proposal.ProposalID) for proposal in proposals]
+
+        changes = []
+        for proposal, future in zip(proposals, futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.warning(f'failed to get the result of param proposal {proposal.ProposalID}: {e}')
+                continue
+
+            # 截止块高的结果尚未统计时，返回的是错误信息，下次刷新时再查询
+            if not result or type(result) is str or result['status'] == VOTING_STATUS:
+                continue
+
+            self._done.add(proposal.ProposalID)
+            if result['status'] in PASSED_STATUS:
+                changes.append(ParamChange(proposal.ProposalID, proposal.Module, proposal.Name, proposal.NewValue, proposal.EndVotingBlock + 1))
+        return changes
+
+    def _apply(self, change: ParamChange) -> bool:
+        section = getattr(self.economic, change.module, None)
+        fields = {field.name: field for field in dataclasses.fields(section)} if dataclasses.is_dataclass(section) else {}
+        field = fields.get(change.name)
+        if not field:
+            logger.debug(f'param {change.module}.{change.name} is not in the economic data, ignored')
+            return False
+
+        value = int(change.value) if field.type is int else change.value
+        setattr(section, change.name, value)
+        logger.info(f'economic param {change.module}.{change.name} is changed to {value} at block {change.active_block}')
+        return True
+
+    def refresh(self, block_number=None) -> List[ParamChange]:
+        """ 处理新的参数提案，将到达生效块高的参数变化设置到经济模型中，返回本次设置的参数变化
+
+        Args:
+            block_number: 当前块高，默认为最新块高
+        """
+        if block_number is None:
+            block_number = self.aide.head_watcher.get_block_number()
+
+        with self._lock:
+            self.pending.extend(self._get_new_changes(block_number))
+            self.pending.sort(key=lambda change: change.active_block)
+
+            active = [change for change in self.pending if change.active_block <= block_number]
+            self.pending = self.pending[len(active):]
+            changes = [change for change in active if self._apply(change)]
+            self.changes.extend(changes)
+        return changes
+
+    def _run(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning(f'failed to refresh the economic data: {e}')
+
+    def start(self, interval=60):
+        """ 启动后台线程，每隔interval秒刷新一次
+        """
+        if self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,), name='economic-refresher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """ 停止后台刷新线程
+        """
+        if not self._thread:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
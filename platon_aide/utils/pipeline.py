@@ -0,0 +1,326 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from typing import TYPE_CHECKING, Callable, Union
+
+from loguru import logger
+from platon_account import Account
+from platon_utils import keccak
+
+from platon_aide.base.module import build_only
+from platon_aide.utils.cache import TTLCache
+from platon_aide.utils.nonce import is_nonce_error, is_known_error, is_replacement_error
+
+if TYPE_CHECKING:
+    from platon_aide import Aide
+
+# 结束阶段线程的标记
+_STOP = object()
+
+
+def sign_transactions(transactions: list, hrp) -> list:
+    """ 批量签名交易，用于在进程池中执行，返回签名后的原始交易
+    """
+    return [bytes(Account.sign_transaction(txn, private_key, hrp).rawTransaction) for txn, private_key in transactions]
+
+
+class PipelineTransaction:
+    """ 流水线中的交易
+    """
+
+    def __init__(self, builder: Union[dict, Callable], private_key):
+        self.builder = builder
+        self.private_key = private_key
+        self.future = Future()
+        self.txn = None
+        self.address = None
+        self.raw_transaction = None
+
+    def fail(self, error, nonce_manager=None):
+        # 已分配nonce的交易失败时，需要归还nonce
+        if nonce_manager and self.txn and self.txn.get('nonce') is not None:
+            nonce_manager.release(self.address, self.txn['nonce'])
+        if not self.future.done():
+            self.future.set_exception(error)
+
+
+class TransactionPipeline:
+    """ 交易流水线，将交易的构造、签名、发送拆分为多个阶段，阶段之间通过有界队列连接，功能如下：
+    1. 构造阶段：多线程并发构造交易、预估gas、分配nonce
+    2. 签名阶段：按批次在进程池中签名交易
+    3. 发送阶段：将签名后的交易合并为JSON-RPC批量请求发送
+    队列满时，上游阶段和submit会阻塞等待，以免内存中积压过多的交易。每个交易对应一个Future，结果为交易hash，用法如下：
+
+    with aide.pipeline() as pipeline:
+        futures = [pipeline.submit_call(aide.transfer.transfer, address, amount) for address in addresses]
+    tx_hashes = [future.result() for future in futures]
+    """
+
+    def __init__(self,
+                 aide: "Aide",
+                 build_workers=16,
+                 sign_processes=None,
+                 sign_batch_size=50,
+                 send_workers=4,
+                 send_batch_size=100,
+                 queue_size=1000,
+                 gas_price_ttl=10,
+                 history=True,
+                 ):
+        """
+        Args:
+            aide: 发送交易的aide对象
+            build_workers: 构造阶段的线程数
+            sign_processes: 签名阶段的进程数，默认为cpu核数，为0时在签名线程中签名
+            sign_batch_size: 每个签名任务签名的交易数
+            send_workers: 发送阶段的线程数
+            send_batch_size: 单个批量请求中发送的交易数
+            queue_size: 各阶段之间的队列长度
+            gas_price_ttl: gas price的缓存时间/s，过期后重新查询，为None时只查询一次
+            history: 是否保留全部交易的Future，用于results()，处理海量交易时可以关闭，以免占用内存持续增长
+        """
+        self.aide = aide
+        self.sign_batch_size = sign_batch_size
+        self.send_batch_size = send_batch_size
+        self.history = history
+        self.futures = []
+        self.submitted = 0
+        self.sent = 0
+        self.failed = 0
+        self.start_time = None
+        self.end_time = None
+        self._build_queue = queue.Queue(maxsize=queue_size)
+        self._sign_queue = queue.Queue(maxsize=queue_size)
+        self._send_queue = queue.Queue(maxsize=queue_size)
+        self._executor = ProcessPoolExecutor(sign_processes) if sign_processes != 0 else None
+        # 进程池中同时执行的签名任务数上限，限制签名阶段的积压
+        self._max_signing = (sign_processes or os.cpu_count() or 1) * 2
+        self._cache = TTLCache(ttl=gas_price_ttl)
+        self._lock = threading.Lock()
+        self._gas_price_lock = threading.Lock()
+        self._closed = False
+
+        self._build_threads = self._start(self._build, build_workers)
+        self._sign_threads = self._start(self._sign, 1)
+        self._send_threads = self._start(self._send, send_workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @staticmethod
+    def _start(target, count):
+        threads = [threading.Thread(target=target, name=f'pipeline-{target.__name__.strip("_")}', daemon=True) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def submit(self, txn: Union[dict, Callable[[], dict]], private_key=None) -> Future:
+        """ 提交一个交易，可以是交易dict，也可以是返回交易dict的函数，它会在构造阶段被调用
+        交易中未指定的chainId、gasPrice、gas和nonce会在构造阶段自动填充，队列已满时会阻塞等待
+        """
+        if self._closed:
+            raise RuntimeError('the pipeline is closed')
+
+        self.start_time = self.start_time or time.monotonic()
+        transaction = PipelineTransaction(txn, private_key or self.aide.default_account)
+        transaction.future.add_done_callback(self._count)
+        with self._lock:
+            self.submitted += 1
+        if self.history:
+            self.futures.append(transaction.future)
+        self._build_queue.put(transaction)
+        return transaction.future
+
+    def submit_call(self, func: Callable, *args, private_key=None, **kwargs) -> Future:
+        """ 提交一个aide中发送交易的方法调用，如：aide.transfer.transfer，该方法会在构造阶段以只构造交易的方式调用
+        """
+        def builder():
+            with build_only():
+                return func(*args, private_key=private_key, **kwargs)
+
+        return self.submit(builder, private_key=private_key)
+
+    @property
+    def gas_price(self):
+        # gas price按固定的间隔刷新，避免每个交易都查询一次，过期时只由一个线程重新查询
+        gas_price = self._cache.get('gas_price')
+        if gas_price:
+            return gas_price
+        with self._gas_price_lock:
+            return self._cache.get('gas_price', lambda: self.aide.platon.gas_price)
+
+    def _count(self, future: Future):
+        with self._lock:
+            if future.exception():
+                self.failed += 1
+            else:
+                self.sent += 1
+
+    def _build(self):
+        while True:
+            transaction = self._build_queue.get()
+            if transaction is _STOP:
+                self._sign_queue.put(_STOP)
+                return
+
+            try:
+                txn = transaction.builder() if callable(transaction.builder) else dict(transaction.builder)
+                if not isinstance(txn, dict):
+                    raise ValueError(f'the transaction builder returns {txn} instead of a transaction dict')
+                transaction.txn = txn
+
+                txn.setdefault('chainId', self.aide.chain_id)
+                if not txn.get('gasPrice'):
+                    txn['gasPrice'] = self.gas_price
+                transaction.address = self.aide.get_address(transaction.private_key)
+                if not txn.get('gas'):
+                    txn['gas'] = self.aide.platon.estimate_gas(dict(txn, **{'from': transaction.address}))
+                txn.pop('from', None)
+                if txn.get('nonce') is None:
+                    txn['nonce'] = self.aide.nonce_manager.next_nonce(transaction.address)
+            except Exception as e:
+                transaction.fail(e, self.aide.nonce_manager)
+                continue
+
+            self._sign_queue.put(transaction)
+
+    def _sign(self):
+        pending = []  # 正在签名的批次，按提交顺序交给发送阶段
+        running = len(self._build_threads)  # 未结束的构造线程数
+        while running or pending:
+            transactions = []
+            if running:
+                # 有签名中的批次时不长时间等待新交易，以便及时交出已签名的交易
+                transactions, stopped = self._collect(self._sign_queue, self.sign_batch_size, timeout=0.01 if pending else None)
+                running -= stopped
+
+            if transactions:
+                pending.append((transactions, self._sign_batch(transactions)))
+
+            while pending and (pending[0][1].done() or not running or not transactions or len(pending) >= self._max_signing):
+                self._sign_done(*pending.pop(0))
+
+        for _ in self._send_threads:
+            self._send_queue.put(_STOP)
+
+    def _sign_batch(self, transactions) -> Future:
+        items = [(transaction.txn, self.aide.account_cache.get_signer(transaction.private_key)) for transaction in transactions]
+        if self._executor:
+            # 密钥对象需要转换为私钥，才能传递给签名进程
+            items = [(txn, key.to_bytes() if hasattr(key, 'to_bytes') else key) for txn, key in items]
+            return self._executor.submit(sign_transactions, items, self.aide.hrp)
+
+        future = Future()
+        try:
+            future.set_result(sign_transactions(items, self.aide.hrp))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def _sign_done(self, transactions, future):
+        try:
+            raw_transactions = future.result()
+        except Exception as e:
+            for transaction in transactions:
+                transaction.fail(e, self.aide.nonce_manager)
+            return
+
+        for transaction, raw_transaction in zip(transactions, raw_transactions):
+            transaction.raw_transaction = raw_transaction
+            self._send_queue.put(transaction)
+
+    @staticmethod
+    def _collect(source: queue.Queue, size, timeout=None):
+        """ 从队列中收集最多size个交易，返回收集的交易和是否收到上游的结束标记
+        队列暂时为空时，返回已收集的交易，不会等待凑满一批；未收集到交易时，最多等待timeout秒，默认一直等待
+        """
+        items = []
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while len(items) < size:
+            try:
+                item = source.get(timeout=0.01 if items or deadline else 0.1)
+            except queue.Empty:
+                if items or (deadline and time.monotonic() >= deadline):
+                    break
+                continue
+            if item is _STOP:
+                return items, True
+            items.append(item)
+        return items, False
+
+    def _send(self):
+        while True:
+            transactions, stopping = self._collect(self._send_queue, self.send_batch_size)
+            if transactions:
+                self._send_batch(transactions)
+            if stopping:
+                return
+
+    def _send_batch(self, transactions):
+        # 构造阶段是并发的，同一账户的交易按nonce顺序发送，以免节点先收到高nonce的交易
+        transactions = sorted(transactions, key=lambda transaction: (transaction.address, transaction.txn['nonce']))
+        with self.aide.batch(size=len(transactions)) as batch:
+            futures = batch.map(self.aide.platon.send_raw_transaction, [transaction.raw_transaction for transaction in transactions])
+
+        for transaction, future in zip(transactions, futures):
+            error = future.exception()
+            if error:
+                # 相同的交易已在交易池中，视为发送成功
+                if is_known_error(error):
+                    transaction.future.set_result(keccak(transaction.raw_transaction).hex())
+                elif is_nonce_error(error) or is_replacement_error(error):
+                    logger.warning(f'nonce {transaction.txn["nonce"]} of {transaction.address} is invalid: {error}')
+                    self.aide.nonce_manager.resync(transaction.address)
+                    transaction.future.set_exception(error)
+                else:
+                    transaction.fail(error, self.aide.nonce_manager)
+            else:
+                transaction.future.set_result(bytes(future.result()).hex())
+
+        self.end_time = time.monotonic()
+
+    def close(self):
+        """ 等待所有交易完成，并停止流水线
+        """
+        if self._closed:
+            return
+
+        self._closed = True
+        for _ in self._build_threads:
+            self._build_queue.put(_STOP)
+        for thread in self._build_threads + self._sign_threads + self._send_threads:
+            thread.join()
+        if self._executor:
+            self._executor.shutdown(wait=True)
+
+    def results(self, raise_error=False) -> list:
+        """ 等待所有交易完成，按提交顺序返回交易hash，出现异常时默认将异常对象作为结果返回
+        """
+        if not self.history:
+            raise RuntimeError('the results are not kept when history is disabled')
+
+        wait(self.futures)
+        results = []
+        for future in self.futures:
+            error = future.exception()
+            if error and raise_error:
+                raise error
+            results.append(error or future.result())
+        return results
+
+    def stats(self) -> dict:
+        """ 获取流水线的统计数据，包括交易数量和发送速度（笔/s）
+        """
+        elapsed = (self.end_time - self.start_time) if self.start_time and self.end_time else 0
+        return {
+            'submitted': self.submitted,
+            'sent': self.sent,
+            'failed': self.failed,
+            'elapsed': elapsed,
+            'tps': self.sent / elapsed if elapsed > 0 else 0,
+        }
@@ -0,0 +1,190 @@
+import sqlite3
+import threading
+from typing import TYPE_CHECKING
+
+from loguru import logger
+from platon_utils import remove_0x_prefix
+
+from platon_aide.utils.signer import BlockSigners
+
+if TYPE_CHECKING:
+    from platon_aide import Aide
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS nodes (id INTEGER PRIMARY KEY, node_id TEXT UNIQUE NOT NULL);
+CREATE TABLE IF NOT EXISTS blocks (number INTEGER PRIMARY KEY, node INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS blocks_node ON blocks (node, number);
+'''
+
+
+class ProducerIndex:
+    """ 出块节点索引，将块高 -> 出块节点id保存在本地sqlite数据库中，功能如下：
+    1. 从已索引的块高开始增量索引，每个窗口提交一次，中断后再次调用update即可继续
+    2. 按块高范围和节点查询出块信息，无需再获取区块和恢复签名
+    3. 记录链的创世区块hash，避免不同链的数据混用
+
+    用法如下：
+    index = ProducerIndex(aide, 'producers.db')
+    index.update()
+    block_counts = index.get_block_counts(start_bn, end_bn)
+    """
+
+    def __init__(self, aide: "Aide", path='producers.db', confirmations=10, window=500, processes=None):
+        """
+        Args:
+            aide: 获取区块的aide对象
+            path: 数据库文件路径，为':memory:'时仅保存在内存中
+            confirmations: 确认块数，只索引低于当前块高减去确认块数的区块，以免索引到尚未确定的区块
+            window: 每个批量获取的区块数，也是每次提交的区块数
+            processes: 恢复签名节点的进程数，详见BlockSigners
+        """
+        self.aide = aide
+        self.path = path
+        self.confirmations = confirmations
+        self.window = window
+        self.processes = processes
+        self._node_ids = {}  # 节点id -> 数据库中的节点序号
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._check_chain()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self._db.close()
+
+    def _get_meta(self, key, default=None):
+        row = self._db.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, key, value):
+        self._db.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, str(value)))
+
+    def _check_chain(self):
+        genesis_hash = self.aide.platon.get_block(0)['hash'].hex()
+        with self._lock, self._db:
+            index_hash = self._get_meta('genesis_hash')
+            if index_hash and index_hash != genesis_hash:
+                raise ValueError(f'the index {self.path} belongs to another chain, genesis hash: {index_hash}')
+            self._set_meta('genesis_hash', genesis_hash)
+
+    @property
+    def start_height(self):
+        """ 索引的起始块高，未索引时为None
+        """
+        value = self._get_meta('start_height')
+        return int(value) if value is not None else None
+
+    @property
+    def indexed_height(self):
+        """ 已索引的最高块高，未索引时为None
+        """
+        value = self._get_meta('indexed_height')
+        return int(value) if value is not None else None
+
+    def _node(self, node_id):
+        node = self._node_ids.get(node_id)
+        if node is None:
+            self._db.execute('INSERT OR IGNORE INTO nodes (node_id) VALUES (?)', (node_id,))
+            node = self._db.execute('SELECT id FROM nodes WHERE node_id = ?', (node_id,)).fetchone()[0]
+            self._node_ids[node_id] = node
+        return node
+
+    def update(self, end_bn=None, start_bn=1):
+        """ 从已索引的块高开始，增量索引到end_bn（包含），返回已索引的最高块高
+
+        Args:
+            end_bn: 索引的结束块高，默认为当前块高减去确认块数
+            start_bn: 首次索引时的起始块高，索引建立后不再生效
+        """
+        with self._lock:
+            latest_bn = self.aide.platon.block_number - self.confirmations
+            end_bn = min(end_bn, latest_bn) if end_bn is not None else latest_bn
+
+            indexed_height = self.indexed_height
+            from_bn = indexed_height + 1 if indexed_height is not None else start_bn
+            if from_bn > end_bn:
+                return indexed_height
+
+            if self.start_height is None:
+                with self._db:
+                    self._set_meta('start_height', from_bn)
+
+            logger.info(f'indexing block producers: {from_bn} -> {end_bn}')
+            with BlockSigners(self.aide, window=self.window, processes=self.processes) as signers:
+                rows = []
+                for bn, node_id in signers.iter_signers(from_bn, end_bn + 1):
+                    rows.append((bn, self._node(node_id)))
+                    # 每个窗口提交一次，中断后从最后提交的块高继续
+                    if len(rows) >= self.window:
+                        self._commit(rows, bn)
+                        rows = []
+                self._commit(rows, end_bn)
+
+            return end_bn
+
+    def _commit(self, rows, height):
+        with self._db:
+            self._db.executemany('INSERT OR REPLACE INTO blocks (number, node) VALUES (?, ?)', rows)
+            self._set_meta('indexed_height', height)
+
+    def _check_range(self, start_bn, end_bn, auto_update):
+        """ 检查[start_bn, end_bn)是否已被索引，auto_update为True时自动索引缺少的区块
+        """
+        start_height = self.start_height
+        if start_height is not None and start_bn < start_height:
+            raise ValueError(f'the blocks before {start_height} are not indexed')
+
+        if auto_update and (self.indexed_height is None or end_bn - 1 > self.indexed_height):
+            self.update(end_bn - 1, start_bn=start_bn)
+
+        if self.indexed_height is None or end_bn - 1 > self.indexed_height:
+            raise ValueError(f'the blocks after {self.indexed_height} are not indexed')
+
+    def get_producer(self, block_number):
+        """ 获取区块的出块节点id，区块未被索引或没有签名时返回None
+        """
+        row = self._db.execute('SELECT nodes.node_id FROM blocks JOIN nodes ON blocks.node = nodes.id WHERE blocks.number = ?',
+                               (block_number,)).fetchone()
+        return row[0] if row else None
+
+    def get_producers(self, start_bn, end_bn, auto_update=True) -> list:
+        """ 按块高顺序，获取[start_bn, end_bn)范围内区块的(块高, 出块节点id)
+        """
+        with self._lock:
+            self._check_range(start_bn, end_bn, auto_update)
+            return self._db.execute('SELECT blocks.number, nodes.node_id FROM blocks JOIN nodes ON blocks.node = nodes.id '
+                                    'WHERE blocks.number >= ? AND blocks.number < ? ORDER BY blocks.number',
+                                    (start_bn, end_bn)).fetchall()
+
+    def get_blocks(self, node_id, start_bn, end_bn, auto_update=True) -> list:
+        """ 获取节点在[start_bn, end_bn)范围内出块的块高列表
+        """
+        with self._lock:
+            self._check_range(start_bn, end_bn, auto_update)
+            node_id = remove_0x_prefix(node_id)
+            rows = self._db.execute('SELECT blocks.number FROM blocks JOIN nodes ON blocks.node = nodes.id '
+                                    'WHERE nodes.node_id = ? AND blocks.number >= ? AND blocks.number < ? ORDER BY blocks.number',
+                                    (node_id, start_bn, end_bn)).fetchall()
+            return [number for number, in rows]
+
+    def get_block_counts(self, start_bn, end_bn, auto_update=True) -> dict:
+        """ 获取[start_bn, end_bn)范围内，各个节点的出块数
+        """
+        with self._lock:
+            self._check_range(start_bn, end_bn, auto_update)
+            rows = self._db.execute('SELECT nodes.node_id, COUNT(*) FROM blocks JOIN nodes ON blocks.node = nodes.id '
+                                    'WHERE blocks.number >= ? AND blocks.number < ? GROUP BY blocks.node',
+                                    (start_bn, end_bn)).fetchall()
+            return dict(rows)
+
+    def get_block_count(self, node_id, start_bn, end_bn, auto_update=True) -> int:
+        """ 获取节点在[start_bn, end_bn)范围内的出块数
+        """
+        return len(self.get_blocks(node_id, start_bn, end_bn, auto_update=auto_update))
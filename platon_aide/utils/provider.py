@@ -0,0 +1,211 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, List
+
+import requests
+from loguru import logger
+from platon import HTTPProvider, WebsocketProvider, IPCProvider
+from platon.providers.base import BaseProvider
+
+# 需要固定在主节点执行的请求，包括交易发送、nonce查询和节点相关的接口，避免在节点间切换导致状态不一致
+STICKY_METHODS = (
+    'platon_sendRawTransaction',
+    'platon_sendTransaction',
+    'platon_getTransactionCount',
+    'platon_sign',
+    'platon_signTransaction',
+)
+STICKY_NAMESPACES = ('admin_', 'debug_', 'personal_', 'txpool_', 'miner_')
+
+# 节点不可用时的错误，节点返回的RPC错误不在其中
+CONNECTION_ERRORS = (requests.exceptions.RequestException, ConnectionError, OSError, TimeoutError)
+
+
+def get_provider(uri, **kwargs) -> BaseProvider:
+    """ 通过rpc uri，获取对应的provider
+    """
+    if uri.startswith('http'):
+        return HTTPProvider(uri, **kwargs)
+    elif uri.startswith('ws'):
+        return WebsocketProvider(uri, **kwargs)
+    elif uri.startswith('ipc'):
+        return IPCProvider(uri, **kwargs)
+    else:
+        raise ValueError(f'unidentifiable uri {uri}')
+
+
+def is_sticky(method) -> bool:
+    """ 判断请求是否需要固定在主节点执行
+    """
+    return method in STICKY_METHODS or method.startswith(STICKY_NAMESPACES)
+
+
+class Endpoint:
+    """ 节点链接，记录节点的健康状态、执行中的请求数和响应延迟
+    """
+
+    def __init__(self, uri, provider: BaseProvider):
+        self.uri = uri
+        self.provider = provider
+        self.healthy = True
+        self.outstanding = 0  # 执行中的请求数
+        self.latency = None  # 响应延迟的指数移动平均值/s
+        self.requests = 0
+        self.failures = 0
+
+    def __repr__(self):
+        return f'Endpoint({self.uri}, healthy={self.healthy}, outstanding={self.outstanding}, latency={self.latency})'
+
+    @property
+    def score(self):
+        # 执行中的请求越少、延迟越低，得分越低，越优先使用
+        return (self.outstanding + 1) * (self.latency or 0.001)
+
+
+class MultiProvider(BaseProvider):
+    """ 多节点provider，用于同一条链的多个节点，功能如下：
+    1. 查询请求根据节点执行中的请求数和响应延迟，选择负载最低的节点执行
+    2. 交易发送、nonce查询和节点相关的请求固定在主节点（首个可用节点）执行
+    3. 节点不可用时移出轮换，请求在其他节点重试，并在后台定期探测，恢复后重新加入轮换
+    """
+
+    def __init__(self, uris: List[str], probe_interval=5, latency_decay=0.2):
+        """
+        Args:
+            uris: 节点的rpc链接列表，排在前面的节点优先作为主节点
+            probe_interval: 探测不可用节点的间隔/s
+            latency_decay: 响应延迟的移动平均系数，越大越偏向最近的延迟
+        """
+        super().__init__()
+        if not uris:
+            raise ValueError('at least one uri is required')
+
+        self.endpoints = [Endpoint(uri, get_provider(uri)) for uri in uris]
+        self.probe_interval = probe_interval
+        self.latency_decay = latency_decay
+        self.switch_callbacks: List[Callable] = []  # 主节点切换时的回调，参数为新的主节点
+        self._primary = self.endpoints[0]
+        self._lock = threading.Lock()
+        self._probe_thread = None
+
+    def __str__(self):
+        return f'Multiple RPC connection {[endpoint.uri for endpoint in self.endpoints]}'
+
+    @property
+    def endpoint_uri(self):
+        return self.primary.uri
+
+    @property
+    def is_batchable(self):
+        """ 所有节点都是http链接时，才能发送批量请求
+        """
+        return all(isinstance(endpoint.provider, HTTPProvider) for endpoint in self.endpoints)
+
+    @property
+    def primary(self) -> Endpoint:
+        """ 主节点，即首个可用的节点，主节点变化时会调用switch_callbacks
+        """
+        with self._lock:
+            primary = next((endpoint for endpoint in self.endpoints if endpoint.healthy), self._primary)
+            is_switched, self._primary = primary is not self._primary, primary
+
+        if is_switched:
+            logger.warning(f'the primary endpoint is switched to {primary.uri}')
+            for callback in self.switch_callbacks:
+                callback(primary)
+        return primary
+
+    def select(self, sticky=False, exclude=()) -> Endpoint:
+        """ 选择执行请求的节点，sticky为True时选择主节点，否则选择负载最低的节点
+        """
+        if sticky:
+            primary = self.primary
+            if primary not in exclude:
+                return primary
+
+        with self._lock:
+            endpoints = [endpoint for endpoint in self.endpoints if endpoint not in exclude]
+            healthy_endpoints = [endpoint for endpoint in endpoints if endpoint.healthy]
+            # 没有可用节点时，仍然尝试不可用的节点，它们可能已经恢复
+            endpoints = healthy_endpoints or endpoints
+            if not endpoints:
+                return None
+            return min(endpoints, key=lambda endpoint: endpoint.score)
+
+    @contextmanager
+    def track(self, endpoint: Endpoint):
+        """ 在节点上执行请求，记录执行中的请求数和响应延迟，连接失败时将节点标记为不可用
+        """
+        with self._lock:
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+        start = time.monotonic()
+        try:
+            yield endpoint
+        except CONNECTION_ERRORS as e:
+            self._mark_unhealthy(endpoint, e)
+            raise e
+        else:
+            latency = time.monotonic() - start
+            with self._lock:
+                endpoint.latency = latency if endpoint.latency is None \
+                    else endpoint.latency * (1 - self.latency_decay) + latency * self.latency_decay
+        finally:
+            with self._lock:
+                endpoint.outstanding -= 1
+
+    def execute(self, func: Callable[[Endpoint], Any], sticky=False):
+        """ 选择节点执行func，节点连接失败时在其他节点上重试
+        """
+        tried = []
+        while True:
+            endpoint = self.select(sticky=sticky, exclude=tried)
+            if not endpoint:
+                raise ConnectionError(f'all endpoints are unavailable: {[endpoint.uri for endpoint in tried]}')
+
+            tried.append(endpoint)
+            try:
+                with self.track(endpoint):
+                    return func(endpoint)
+            except CONNECTION_ERRORS as e:
+                logger.warning(f'endpoint {endpoint.uri} is unavailable, retry on other endpoints: {e}')
+
+    def make_request(self, method, params):
+        return self.execute(lambda endpoint: endpoint.provider.make_request(method, params), sticky=is_sticky(method))
+
+    def isConnected(self):
+        return any(endpoint.provider.isConnected() for endpoint in self.endpoints)
+
+    def _mark_unhealthy(self, endpoint: Endpoint, error):
+        with self._lock:
+            endpoint.failures += 1
+            if not endpoint.healthy:
+                return
+            endpoint.healthy = False
+            logger.warning(f'endpoint {endpoint.uri} is removed from rotation: {error}')
+
+            if not self._probe_thread:
+                self._probe_thread = threading.Thread(target=self._probe, name='endpoint-probe', daemon=True)
+                self._probe_thread.start()
+
+    def _probe(self):
+        """ 定期探测不可用的节点，直到所有节点恢复
+        """
+        while True:
+            time.sleep(self.probe_interval)
+            with self._lock:
+                unhealthy_endpoints = [endpoint for endpoint in self.endpoints if not endpoint.healthy]
+                if not unhealthy_endpoints:
+                    self._probe_thread = None
+                    return
+
+            for endpoint in unhealthy_endpoints:
+                try:
+                    response = endpoint.provider.make_request('platon_blockNumber', [])
+                except CONNECTION_ERRORS:
+                    continue
+                if 'result' in response:
+                    with self._lock:
+                        endpoint.healthy = True
+                    logger.info(f'endpoint {endpoint.uri} is recovered')
@@ -0,0 +1,215 @@
+import threading
+import time
+from concurrent.futures import Future, wait
+from typing import TYPE_CHECKING, Union
+
+from loguru import logger
+from platon.exceptions import TimeExhausted, TransactionNotFound
+from platon_utils import add_0x_prefix
+
+from platon_aide.base.module import PendingTransaction
+
+if TYPE_CHECKING:
+    from platon_aide import Aide
+
+
+class TrackedTransaction:
+    """ 跟踪中的交易
+    """
+
+    def __init__(self, tx_hash, pending: PendingTransaction = None):
+        self.tx_hash = tx_hash
+        self.pending = pending
+        self.future = Future()
+        self.sent_time = pending.sent_time if pending else time.monotonic()
+        self.confirmed_time = None
+        self.status = None
+
+    def __repr__(self):
+        return f'TrackedTransaction({self.tx_hash})'
+
+
+class ReceiptTracker:
+    """ 交易回执跟踪器，同时等待任意数量的交易回执，功能如下：
+    1. 每产生一个新区块，将所有未上链交易的回执查询合并为JSON-RPC批量请求发送
+    2. 每个交易对应一个Future，获取到回执或超时后完成
+    3. 统计交易的吞吐量和确认延迟
+
+    可以配合defer_receipt，先发送全部交易，再一起确认，用法如下：
+    with defer_receipt():
+        pending_transactions = [aide.transfer.transfer(address, amount) for address in addresses]
+    with aide.receipt_tracker() as tracker:
+        futures = tracker.track_all(pending_transactions)
+    results = [future.result() for future in futures]
+    """
+
+    def __init__(self, aide: "Aide", timeout=120, batch_size=100, history=True):
+        """
+        Args:
+            aide: 查询交易回执的aide对象
+            timeout: 交易从开始跟踪到上链的最长时间/s，超时的交易会以TimeExhausted异常完成
+            batch_size: 单个批量请求中的最大回执查询数
+            history: 是否保留已完成的交易，用于统计确认延迟的分位数，跟踪海量交易时可以关闭，以免占用内存持续增长
+        """
+        self.aide = aide
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.history = history
+        self.transactions = []
+        self.tracked = 0
+        self.confirmed = 0
+        self.failed = 0
+        self.expired = 0
+        self._latency_sum = 0
+        self._latency_max = None
+        self._start_time = None
+        self._end_time = None
+        self._unconfirmed = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def track(self, transaction: Union[str, bytes, PendingTransaction]) -> Future:
+        """ 跟踪一个交易，可以是交易hash，也可以是defer_receipt中发送交易返回的PendingTransaction
+        交易hash的Future结果为交易回执，PendingTransaction的Future结果与同步发送交易的结果一致
+        """
+        pending = transaction if isinstance(transaction, PendingTransaction) else None
+        tx_hash = pending.tx_hash if pending else transaction
+        tx_hash = add_0x_prefix(tx_hash.hex() if isinstance(tx_hash, bytes) else tx_hash)
+
+        tracked = TrackedTransaction(tx_hash, pending=pending)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('the receipt tracker is closed')
+            self.tracked += 1
+            self._start_time = min(self._start_time or tracked.sent_time, tracked.sent_time)
+            if self.history:
+                self.transactions.append(tracked)
+            self._unconfirmed[tx_hash] = tracked
+            if not self._thread:
+                self._thread = threading.Thread(target=self._run, name='receipt-tracker', daemon=True)
+                self._thread.start()
+
+        return tracked.future
+
+    def track_all(self, transactions) -> list:
+        """ 跟踪多个交易，返回Future列表
+        """
+        return [self.track(transaction) for transaction in transactions]
+
+    def _run(self):
+        while True:
+            block_number = self.aide.head_watcher.get_block_number()
+            with self._lock:
+                unconfirmed = list(self._unconfirmed.values())
+                if not unconfirmed:
+                    self._thread = None
+                    return
+
+            try:
+                self._poll(unconfirmed)
+            except Exception as e:
+                logger.warning(f'failed to get transaction receipts: {e}')
+
+            # 交易回执只会在新区块中产生，等待下一个区块后再查询
+            try:
+                self.aide.head_watcher.wait(block_number, timeout=self.aide.head_watcher.block_time * 2)
+            except TimeoutError:
+                pass
+
+    def _poll(self, unconfirmed):
+        """ 批量查询交易回执，并完成已上链或超时的交易
+        """
+        with self.aide.batch(size=self.batch_size) as batch:
+            futures = batch.map(self.aide.platon.get_transaction_receipt, [tracked.tx_hash for tracked in unconfirmed])
+
+        now = time.monotonic()
+        for tracked, future in zip(unconfirmed, futures):
+            error = future.exception()
+            if not error:
+                self._confirm(tracked, future.result(), now)
+            elif not isinstance(error, TransactionNotFound):
+                logger.warning(f'failed to get the receipt of {tracked.tx_hash}: {error}')
+
+            if not tracked.future.done() and now - tracked.sent_time > self.timeout:
+                self._expire(tracked)
+
+    def _confirm(self, tracked: TrackedTransaction, receipt, now):
+        tracked.confirmed_time = now
+        tracked.status = receipt.get('status')
+        latency = now - tracked.sent_time
+        with self._lock:
+            self._unconfirmed.pop(tracked.tx_hash, None)
+            self.confirmed += 1
+            self.failed += tracked.status == 0
+            self._latency_sum += latency
+            self._latency_max = max(self._latency_max or 0, latency)
+            self._end_time = now
+
+        try:
+            result = tracked.pending.result(receipt) if tracked.pending else receipt
+        except Exception as e:
+            tracked.future.set_exception(e)
+        else:
+            tracked.future.set_result(result)
+
+    def _expire(self, tracked: TrackedTransaction):
+        with self._lock:
+            self._unconfirmed.pop(tracked.tx_hash, None)
+            self.expired += 1
+
+        # 交易可能已被节点丢弃，重新同步nonce，以免后续交易阻塞
+        if tracked.pending and tracked.pending.sender:
+            self.aide.nonce_manager.resync(tracked.pending.sender)
+        tracked.future.set_exception(TimeExhausted(f'transaction {tracked.tx_hash} is not in the chain after {self.timeout} seconds'))
+
+    def wait(self, timeout=None):
+        """ 等待所有跟踪中的交易完成
+        """
+        with self._lock:
+            transactions = self.transactions if self.history else self._unconfirmed.values()
+            futures = [tracked.future for tracked in transactions]
+        wait(futures, timeout=timeout)
+
+    def close(self):
+        """ 等待所有跟踪中的交易完成，之后不能再跟踪新的交易
+        """
+        self.wait()
+        with self._lock:
+            self._closed = True
+
+    def stats(self) -> dict:
+        """ 获取交易的统计数据，包括数量、吞吐量（笔/s）和确认延迟（s），不保留历史交易时，没有延迟的分位数
+        """
+        with self._lock:
+            stats = {
+                'tracked': self.tracked,
+                'confirmed': self.confirmed,
+                'failed': self.failed,
+                'timeout': self.expired,
+                'pending': len(self._unconfirmed),
+                'throughput': 0,
+                'latency_avg': None,
+                'latency_p50': None,
+                'latency_p95': None,
+                'latency_max': self._latency_max,
+            }
+            if self.confirmed:
+                elapsed = self._end_time - self._start_time
+                stats['throughput'] = self.confirmed / elapsed if elapsed > 0 else float(self.confirmed)
+                stats['latency_avg'] = self._latency_sum / self.confirmed
+
+            transactions = list(self.transactions)
+
+        latencies = sorted(tracked.confirmed_time - tracked.sent_time for tracked in transactions if tracked.confirmed_time is not None)
+        if latencies:
+            stats['latency_p50'] = latencies[int((len(latencies) - 1) * 0.5)]
+            stats['latency_p95'] = latencies[int((len(latencies) - 1) * 0.95)]
+
+        return stats
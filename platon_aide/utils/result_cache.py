@@ -0,0 +1,247 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+from loguru import logger
+
+if TYPE_CHECKING:
+    from platon_aide import Aide
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+'''
+
+# 请求方法 -> 块高参数的位置，这些请求在固定块高下的结果不会变化
+BLOCK_PARAM_METHODS = {
+    'platon_call': 1,
+    'platon_getBalance': 1,
+    'platon_getCode': 1,
+    'platon_getTransactionCount': 1,
+    'platon_getStorageAt': 2,
+    'platon_getBlockByNumber': 0,
+    'platon_getBlockTransactionCountByNumber': 0,
+}
+
+# 按hash查询的请求，结果存在且所在区块已确认时，不会再变化
+HASH_METHODS = (
+    'platon_getBlockByHash',
+    'platon_getBlockTransactionCountByHash',
+    'platon_getTransactionByHash',
+    'platon_getTransactionReceipt',
+)
+
+
+def parse_block(block_identifier):
+    """ 解析块高参数，返回块高或区块hash，latest、pending等不固定的块高返回None
+    """
+    if isinstance(block_identifier, dict):
+        block_identifier = block_identifier.get('blockHash') or block_identifier.get('blockNumber')
+
+    if isinstance(block_identifier, int) and not isinstance(block_identifier, bool):
+        return block_identifier
+
+    if isinstance(block_identifier, str) and block_identifier.startswith('0x'):
+        if len(block_identifier) == 66:
+            return block_identifier
+        return int(block_identifier, 16)
+
+    return None
+
+
+class ResultCache:
+    """ 不可变结果缓存，缓存固定在已确认块高或区块hash上的请求结果，功能如下：
+    1. 识别指定了具体块高或区块hash的请求，如：历史块高的call、余额查询、区块和交易回执
+    2. 结果保存在有数量上限的LRU内存缓存中，也可以同时保存在本地sqlite数据库中，供之后的进程复用
+    3. latest、pending等不固定块高的请求、尚未确认的区块、错误和空结果都不会被缓存
+
+    通过aide.enable_result_cache启用，之后aide发出的请求会自动使用缓存，用法如下：
+    aide.enable_result_cache(path='results.db')
+    balance = aide.transfer.get_balance(address, block_identifier=1000)
+    """
+
+    def __init__(self, aide: "Aide", size=10000, path=None, confirmations=10, commit_interval=100):
+        """
+        Args:
+            aide: 发起请求的aide对象
+            size: 内存缓存的结果数量上限
+            path: 数据库文件路径，为None时仅缓存在内存中
+            confirmations: 确认块数，只缓存低于当前块高减去确认块数的结果，以免缓存到尚未确定的区块
+            commit_interval: 每写入多少个结果提交一次数据库
+        """
+        self.aide = aide
+        self.size = size
+        self.path = path
+        self.confirmations = confirmations
+        self.commit_interval = commit_interval
+        self.hits = 0
+        self.misses = 0
+        self._values = OrderedDict()  # 请求的键 -> 结果的json
+        self._lock = threading.RLock()
+        self._head = None  # 已知的最新块高
+        self._head_time = 0
+        self._uncommitted = 0
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.executescript(SCHEMA)
+            self._check_chain()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        if self._db:
+            with self._lock:
+                self._db.commit()
+                self._db.close()
+                self._db = None
+
+    def _check_chain(self):
+        genesis_hash = self.aide.platon.get_block(0)['hash'].hex()
+        with self._lock, self._db:
+            row = self._db.execute('SELECT value FROM meta WHERE key = ?', ('genesis_hash',)).fetchone()
+            if row and row[0] != genesis_hash:
+                raise ValueError(f'the cache {self.path} belongs to another chain, genesis hash: {row[0]}')
+            self._db.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', ('genesis_hash', genesis_hash))
+
+    @staticmethod
+    def get_key(method, params) -> str:
+        return json.dumps([method, params], sort_keys=True, separators=(',', ':'), default=str)
+
+    def get(self, key):
+        """ 获取缓存的结果，不存在时返回None
+        """
+        with self._lock:
+            value = self._values.get(key)
+            if value is not None:
+                self._values.move_to_end(key)
+            elif self._db:
+                row = self._db.execute('SELECT value FROM results WHERE key = ?', (key,)).fetchone()
+                if row:
+                    value = row[0]
+                    self._remember(key, value)
+
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(value)
+
+    def set(self, key, result):
+        value = json.dumps(result, separators=(',', ':'))
+        with self._lock:
+            self._remember(key, value)
+            if self._db:
+                self._db.execute('INSERT OR REPLACE INTO results (key, value) VALUES (?, ?)', (key, value))
+                self._uncommitted += 1
+                if self._uncommitted >= self.commit_interval:
+                    self._db.commit()
+                    self._uncommitted = 0
+
+    def _remember(self, key, value):
+        self._values[key] = value
+        self._values.move_to_end(key)
+        while len(self._values) > self.size:
+            self._values.popitem(last=False)
+
+    def clear(self):
+        """ 清空全部缓存，包括数据库中的缓存
+        """
+        with self._lock:
+            self._values.clear()
+            if self._db:
+                self._db.execute('DELETE FROM results')
+                self._db.commit()
+
+    def _is_confirmed(self, block_number, make_request):
+        """ 判断块高是否已确认，已知的最新块高不足以判断时，重新查询最新块高，每秒最多查询一次
+        """
+        if self._head is not None and block_number <= self._head - self.confirmations:
+            return True
+
+        if time.monotonic() - self._head_time >= 1:
+            response = make_request('platon_blockNumber', [])
+            if 'result' in response:
+                self._head, self._head_time = int(response['result'], 16), time.monotonic()
+
+        return self._head is not None and block_number <= self._head - self.confirmations
+
+    def is_cacheable(self, method, params) -> bool:
+        """ 判断请求是否固定在具体的块高或区块hash上，只有这些请求的结果可能被缓存
+        """
+        if method in HASH_METHODS:
+            return True
+
+        if method == 'platon_getLogs':
+            log_filter = params[0] if params else {}
+            return bool(log_filter.get('blockHash')) or parse_block(log_filter.get('toBlock')) is not None
+
+        position = BLOCK_PARAM_METHODS.get(method)
+        return position is not None and len(params) > position and parse_block(params[position]) is not None
+
+    def _can_store(self, method, params, result, make_request) -> bool:
+        """ 判断结果是否可以缓存，按块高固定的请求需要块高已确认，按hash查询的结果需要所在区块已确认
+        """
+        if result is None:
+            return False
+
+        if method == 'platon_getLogs':
+            log_filter = params[0]
+            if log_filter.get('blockHash'):
+                return True
+            block = parse_block(log_filter.get('toBlock'))
+        elif method in HASH_METHODS:
+            if method in ('platon_getBlockByHash', 'platon_getBlockTransactionCountByHash'):
+                return True
+            block = parse_block(result.get('blockNumber')) if isinstance(result, dict) else None
+        else:
+            block = parse_block(params[BLOCK_PARAM_METHODS[method]])
+
+        if isinstance(block, str):
+            return True
+        return block is not None and self._is_confirmed(block, make_request)
+
+    def middleware(self, make_request, web3):
+        """ 缓存中间件，需要位于批量请求中间件之外，以便命中缓存的请求不会进入批量请求
+        """
+
+        def middleware(method, params):
+            if not self.is_cacheable(method, params):
+                response = make_request(method, params)
+                if method == 'platon_blockNumber' and 'result' in response:
+                    self._head, self._head_time = int(response['result'], 16), time.monotonic()
+                return response
+
+            key = self.get_key(method, params)
+            result = self.get(key)
+            if result is not None:
+                return {'jsonrpc': '2.0', 'id': 0, 'result': result}
+
+            response = make_request(method, params)
+            if 'error' not in response:
+                try:
+                    if self._can_store(method, params, response.get('result'), make_request):
+                        self.set(key, response['result'])
+                except Exception as e:
+                    logger.warning(f'failed to cache the result of {method}: {e}')
+            return response
+
+        return middleware
+
+    def stats(self) -> dict:
+        """ 获取缓存的命中统计
+        """
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0,
+            'size': len(self._values),
+        }
@@ -0,0 +1,231 @@
+from decimal import ROUND_HALF_EVEN, getcontext
+from functools import lru_cache
+from typing import Sequence, Union
+
+# Decimal默认上下文的精度，整数运算按该精度模拟Decimal的舍入
+DECIMAL_PREC = 28
+_POWERS = [10 ** i for i in range(DECIMAL_PREC * 4)]
+
+
+def _pow10(n):
+    return _POWERS[n] if n < len(_POWERS) else 10 ** n
+
+
+def _digits(n):
+    # 由二进制位数估算十进制位数，再用10的幂修正
+    digits = (n.bit_length() * 1233 >> 12) + 1
+    return digits if n >= _pow10(digits - 1) else digits - 1
+
+
+def _round(coef, exp):
+    """ 按Decimal默认上下文（28位有效数字，ROUND_HALF_EVEN）舍入coef * 10 ** exp，返回(coef, exp)
+    """
+    if coef < _POWERS[DECIMAL_PREC]:
+        return coef, exp
+
+    drop = _digits(coef) - DECIMAL_PREC
+    unit = _pow10(drop)
+    coef, remainder = divmod(coef, unit)
+    if remainder * 2 > unit or (remainder * 2 == unit and coef & 1):
+        coef += 1
+        if coef == _POWERS[DECIMAL_PREC]:
+            coef, drop = _POWERS[DECIMAL_PREC - 1], drop + 1
+    return coef, exp + drop
+
+
+def _mul(a, b):
+    return _round(a[0] * b[0], a[1] + b[1])
+
+
+def _add(a, b):
+    exp = min(a[1], b[1])
+    return _round(a[0] * _pow10(a[1] - exp) + b[0] * _pow10(b[1] - exp), exp)
+
+
+def _div(a, b):
+    """ 模拟Decimal除法：精确的商按28位有效数字舍入
+    """
+    if a[0] == 0:
+        return 0, 0
+
+    # 商的最高位的指数
+    shift = _digits(a[0]) - _digits(b[0])
+    if (a[0] * _pow10(-shift) if shift < 0 else a[0]) < (b[0] * _pow10(shift) if shift > 0 else b[0]):
+        shift -= 1
+
+    scale = DECIMAL_PREC - 1 - shift
+    numerator, denominator = (a[0] * _pow10(scale), b[0]) if scale >= 0 else (a[0], b[0] * _pow10(-scale))
+    coef, remainder = divmod(numerator, denominator)
+    exp = a[1] - b[1] - scale
+    if remainder == 0:
+        # 整除时与Decimal一样去掉多余的0，如：5000 / 10000 = 0.5，以免之后的运算处理过长的系数
+        while exp < a[1] - b[1] and coef % 10 == 0:
+            coef, exp = coef // 10, exp + 1
+    elif remainder * 2 > denominator or (remainder * 2 == denominator and coef & 1):
+        coef += 1
+        if coef == _POWERS[DECIMAL_PREC]:
+            coef, exp = _POWERS[DECIMAL_PREC - 1], exp + 1
+    return coef, exp
+
+
+def _int(a):
+    """ 模拟int(Decimal)，非负数向下取整
+    """
+    coef, exp = a
+    return coef * _pow10(exp) if exp >= 0 else coef // _pow10(-exp)
+
+
+def is_exact_context() -> bool:
+    """ 当前线程的Decimal上下文是否为默认的精度和舍入方式，只有此时整数运算才与Decimal运算的结果一致
+    """
+    context = getcontext()
+    return context.prec == DECIMAL_PREC and context.rounding == ROUND_HALF_EVEN
+
+
+def is_natural(*values) -> bool:
+    return all(type(value) is int and value >= 0 for value in values)
+
+
+@lru_cache(maxsize=1024)
+def _staking_reward(total_staking_reward, verifier_count):
+    return _int(_div((total_staking_reward, 0), (verifier_count, 0)))
+
+
+@lru_cache(maxsize=1024)
+def _dividend_ratio(node_reward_ratio):
+    return _div((node_reward_ratio, 0), (10000, 0))
+
+
+def _delegate_reward_pool(staking_reward, per_block_reward, block_count, node_reward_ratio):
+    dividend_ratio = _dividend_ratio(node_reward_ratio)
+    staking_dividends = _int(_mul((staking_reward, 0), dividend_ratio))
+    block_dividends = _mul(_mul((per_block_reward, 0), dividend_ratio), (block_count, 0))
+    return _int(_add((staking_dividends, 0), block_dividends))
+
+
+@lru_cache(maxsize=4096)
+def node_reward(total_staking_reward: int, verifier_count: int, per_block_reward: int, block_count: int) -> int:
+    """ 节点总奖励的整数计算，与Calculator.calc_node_reward的结果一致
+    """
+    return _staking_reward(total_staking_reward, verifier_count) + _int(_mul((per_block_reward, 0), (block_count, 0)))
+
+
+@lru_cache(maxsize=4096)
+def staking_reward(total_staking_reward: int, verifier_count: int, per_block_reward: int, block_count: int, node_reward_ratio: int) -> int:
+    """ 节点质押奖励的整数计算，与Calculator.calc_staking_reward的结果一致，两部分奖励共用同一个质押奖励
+    """
+    staking_reward = _staking_reward(total_staking_reward, verifier_count)
+    node_reward = staking_reward + _int(_mul((per_block_reward, 0), (block_count, 0)))
+    return node_reward - _delegate_reward_pool(staking_reward, per_block_reward, block_count, node_reward_ratio)
+
+
+@lru_cache(maxsize=4096)
+def delegate_reward_pool(total_staking_reward: int, verifier_count: int, per_block_reward: int, block_count: int, node_reward_ratio: int) -> int:
+    """ 节点全部委托分红的整数计算，与Calculator.calc_delegate_reward不指定委托金额时的结果一致
+    """
+    staking_reward = _staking_reward(total_staking_reward, verifier_count)
+    return _delegate_reward_pool(staking_reward, per_block_reward, block_count, node_reward_ratio)
+
+
+def delegate_reward(all_delegate_reward: int, delegate_amount: int, delegate_total_amount: int) -> int:
+    """ 账户委托分红的整数计算，与Calculator.calc_delegate_reward指定委托金额时的结果一致
+    """
+    # 两次舍入的相对误差均不超过1e-27，商的小数部分与整数的距离大于误差上限时，舍入不会影响取整结果，直接使用整数除法
+    quotient, remainder = divmod(all_delegate_reward * delegate_amount, delegate_total_amount)
+    error = 2 * (quotient + 1) * delegate_total_amount
+    if remainder * _POWERS[27] >= error and (delegate_total_amount - remainder) * _POWERS[27] > error:
+        return quotient
+
+    return _int(_div(_mul((all_delegate_reward, 0), (delegate_amount, 0)), (delegate_total_amount, 0)))
+
+
+def _column(value: Union[int, Sequence[int]], size) -> list:
+    if isinstance(value, int):
+        return [value] * size
+    value = list(value)
+    if len(value) != size:
+        raise ValueError(f'expect a column of {size} values, got {len(value)}')
+    return value
+
+
+class RewardEngine:
+    """ 结算周期奖励的批量计算，结果与Calculator中逐个计算的Decimal结果完全一致，功能如下：
+    1. 使用整数运算模拟Decimal的精度和舍入，不再构造Decimal对象
+    2. 同一结算周期共用的质押奖励只计算一次，相同分红比例的中间结果只计算一次
+    3. 节点奖励、质押奖励、委托分红一次计算完成，质押奖励不再重复计算节点奖励
+
+    用法如下：
+    engine = RewardEngine(total_staking_reward, verifier_count, per_block_reward)
+    node_rewards, staking_rewards, delegate_rewards = engine.node_rewards(block_counts, node_reward_ratios)
+    rewards = engine.delegate_rewards(delegate_rewards[0], delegate_amounts, delegate_total_amount)
+    """
+
+    def __init__(self, total_staking_reward: int, verifier_count: int, per_block_reward: int):
+        """
+        Args:
+            total_staking_reward: 结算周期的总质押奖励
+            verifier_count: 结算周期的验证人数
+            per_block_reward: 结算周期的出块奖励
+        """
+        if not is_natural(total_staking_reward, verifier_count, per_block_reward) or verifier_count == 0:
+            raise ValueError('the rewards and verifier count should be non-negative integers')
+        if not is_exact_context():
+            raise ValueError('the decimal context is not the default one, integer results may differ')
+
+        self.total_staking_reward = total_staking_reward
+        self.verifier_count = verifier_count
+        self.per_block_reward = per_block_reward
+        self.staking_reward = _staking_reward(total_staking_reward, verifier_count)
+        self._ratios = {}  # 分红比例 -> (质押奖励分红, 单个区块的出块奖励分红)
+
+    def _get_dividends(self, node_reward_ratio):
+        dividends = self._ratios.get(node_reward_ratio)
+        if dividends is None:
+            dividend_ratio = _dividend_ratio(node_reward_ratio)
+            staking_dividends = _int(_mul((self.staking_reward, 0), dividend_ratio))
+            dividends = self._ratios[node_reward_ratio] = staking_dividends, _mul((self.per_block_reward, 0), dividend_ratio)
+        return dividends
+
+    def node_rewards(self, block_counts: Sequence[int], node_reward_ratios: Union[int, Sequence[int]]):
+        """ 批量计算节点的总奖励、质押奖励和全部委托分红，返回三个与block_counts等长的列表
+
+        Args:
+            block_counts: 各节点在结算周期的出块数
+            node_reward_ratios: 各节点在结算周期的委托分红比例，可以是所有节点共用的比例
+        """
+        block_counts = list(block_counts)
+        node_reward_ratios = _column(node_reward_ratios, len(block_counts))
+        if not is_natural(*block_counts, *node_reward_ratios):
+            raise ValueError('the block counts and reward ratios should be non-negative integers')
+
+        node_rewards, staking_rewards, delegate_rewards = [], [], []
+        for block_count, node_reward_ratio in zip(block_counts, node_reward_ratios):
+            node_reward = self.staking_reward + _int(_mul((self.per_block_reward, 0), (block_count, 0)))
+            staking_dividends, block_dividend = self._get_dividends(node_reward_ratio)
+            all_delegate_reward = _int(_add((staking_dividends, 0), _mul(block_dividend, (block_count, 0))))
+            node_rewards.append(node_reward)
+            staking_rewards.append(node_reward - all_delegate_reward)
+            delegate_rewards.append(all_delegate_reward)
+        return node_rewards, staking_rewards, delegate_rewards
+
+    @staticmethod
+    def delegate_rewards(all_delegate_rewards: Union[int, Sequence[int]],
+                         delegate_amounts: Sequence[int],
+                         delegate_total_amounts: Union[int, Sequence[int]],
+                         ) -> list:
+        """ 批量计算账户的委托分红，返回与delegate_amounts等长的列表
+
+        Args:
+            all_delegate_rewards: 账户所委托节点的全部委托分红，可以是所有账户共用的值
+            delegate_amounts: 结算周期内，各账户对节点的锁定期委托总额
+            delegate_total_amounts: 节点在结算周期的锁定期委托总额，可以是所有账户共用的值
+        """
+        delegate_amounts = list(delegate_amounts)
+        all_delegate_rewards = _column(all_delegate_rewards, len(delegate_amounts))
+        delegate_total_amounts = _column(delegate_total_amounts, len(delegate_amounts))
+        if not is_natural(*all_delegate_rewards, *delegate_amounts, *delegate_total_amounts) or 0 in delegate_total_amounts:
+            raise ValueError('the rewards and amounts should be non-negative integers, and the total amounts should be positive')
+        if not is_exact_context():
+            raise ValueError('the decimal context is not the default one, integer results may differ')
+
+        return [delegate_reward(*values) for values in zip(all_delegate_rewards, delegate_amounts, delegate_total_amounts)]
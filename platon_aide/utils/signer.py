@@ -0,0 +1,132 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Iterable
+
+import rlp
+from platon_account._utils.signing import to_standard_signature_bytes
+from platon_hash.auto import keccak
+from platon_keys.datatypes import Signature
+from platon_utils import to_canonical_address
+
+if TYPE_CHECKING:
+    from platon_aide import Aide
+
+# 区块extraData中，签名之前的额外数据长度
+EXTRA_VANITY = 32
+# 区块签名的长度
+SIGNATURE_LENGTH = 65
+
+
+def get_seal_data(block):
+    """ 从区块中取出签名前的区块头hash和区块签名，用于恢复签名节点的公钥
+    区块没有签名（如：创世区块）时，返回None
+    """
+    extra_data = bytes(block['proofOfAuthorityData'])
+    if len(extra_data) < EXTRA_VANITY + SIGNATURE_LENGTH:
+        return None
+
+    header = [bytes(block['parentHash']),
+              to_canonical_address(block['miner']),
+              bytes(block['stateRoot']),
+              bytes(block['transactionsRoot']),
+              bytes(block['receiptsRoot']),
+              bytes(block['logsBloom']),
+              block['number'],
+              block['gasLimit'],
+              block['gasUsed'],
+              block['timestamp'],
+              extra_data[:EXTRA_VANITY],
+              bytes(block['nonce']),
+              ]
+    return keccak(rlp.encode(header)), extra_data[EXTRA_VANITY:EXTRA_VANITY + SIGNATURE_LENGTH]
+
+
+def recover_signer(message_hash: bytes, signature: bytes) -> str:
+    """ 通过区块头hash和区块签名，恢复签名节点的公钥，即节点id（不带0x）
+    """
+    signature = Signature(signature_bytes=to_standard_signature_bytes(signature))
+    return signature.recover_public_key_from_msg_hash(message_hash).to_bytes().hex()
+
+
+def recover_signers(seal_data: list) -> list:
+    """ 批量恢复签名节点，用于在进程池中执行，以减少进程间通信的次数
+    """
+    return [recover_signer(message_hash, signature) for message_hash, signature in seal_data]
+
+
+class BlockSigners:
+    """ 区块签名节点的批量解析器，功能如下：
+    1. 按窗口批量获取区块，窗口内的请求合并为JSON-RPC批量请求
+    2. 在进程池中恢复签名节点的公钥，进程池工作时，同时获取下一个窗口的区块
+    3. 一次遍历得到区块范围内所有节点的出块数
+
+    用法如下：
+    with BlockSigners(aide) as signers:
+        block_counts = signers.count(start_bn, end_bn)
+    """
+
+    def __init__(self, aide: "Aide", window=500, chunk_size=100, processes=None):
+        """
+        Args:
+            aide: 获取区块的aide对象
+            window: 每个批量获取的区块数
+            chunk_size: 每个进程任务恢复的区块数
+            processes: 进程数，默认为cpu核数，为0时在当前进程中恢复
+        """
+        self.aide = aide
+        self.window = window
+        self.chunk_size = chunk_size
+        self._executor = ProcessPoolExecutor(processes) if processes != 0 else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        if self._executor:
+            self._executor.shutdown(wait=True)
+
+    def _get_blocks(self, block_numbers):
+        with self.aide.batch(size=len(block_numbers)) as batch:
+            futures = batch.map(self.aide.platon.get_block, block_numbers)
+        return [future.result() for future in futures]
+
+    def _recover(self, seal_data):
+        chunks = [seal_data[i:i + self.chunk_size] for i in range(0, len(seal_data), self.chunk_size)]
+        if not self._executor:
+            return [recover_signers(chunk) for chunk in chunks]
+        return [self._executor.submit(recover_signers, chunk) for chunk in chunks]
+
+    def iter_signers(self, start_bn, end_bn) -> Iterable:
+        """ 按块高顺序，遍历[start_bn, end_bn)范围内区块的块高和签名节点id，没有签名的区块不会返回
+        """
+        pending = None  # 上一个窗口正在恢复的区块
+        for window_start in range(start_bn, end_bn, self.window):
+            block_numbers = range(window_start, min(window_start + self.window, end_bn))
+            blocks = self._get_blocks(block_numbers)
+            seals = [(block['number'], get_seal_data(block)) for block in blocks]
+            seals = [(number, seal_data) for number, seal_data in seals if seal_data]
+
+            current = ([number for number, _ in seals], self._recover([seal_data for _, seal_data in seals]))
+            if pending:
+                yield from self._results(*pending)
+            pending = current
+
+        if pending:
+            yield from self._results(*pending)
+
+    @staticmethod
+    def _results(numbers, chunks):
+        signers = []
+        for chunk in chunks:
+            signers.extend(chunk if type(chunk) is list else chunk.result())
+        yield from zip(numbers, signers)
+
+    def count(self, start_bn, end_bn) -> dict:
+        """ 获取[start_bn, end_bn)范围内，各个节点的出块数
+        """
+        block_counts = {}
+        for _, node_id in self.iter_signers(start_bn, end_bn):
+            block_counts[node_id] = block_counts.get(node_id, 0) + 1
+        return block_counts
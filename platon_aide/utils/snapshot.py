@@ -0,0 +1,180 @@
+import dataclasses
+import json
+import sqlite3
+import threading
+import time
+from typing import TYPE_CHECKING, Mapping
+
+from hexbytes import HexBytes
+from loguru import logger
+from platon.datastructures import AttributeDict
+
+from platon_aide.economic import new_economic
+
+if TYPE_CHECKING:
+    from platon_aide import Aide
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS snapshots (
+    endpoint TEXT NOT NULL,
+    genesis_hash TEXT NOT NULL,
+    data TEXT NOT NULL,
+    created_time REAL NOT NULL,
+    PRIMARY KEY (endpoint, genesis_hash)
+);
+'''
+
+# 快照中的节点身份信息，即aide.identity_cache中的键
+IDENTITY_KEYS = ('node_info', 'program_version', 'bls_proof')
+
+
+def _get_identity(aide: "Aide", key) -> dict:
+    """ 获取缓存的节点身份信息及其过期时间，过期时间为时间戳，永久有效时为None
+    """
+    remaining = aide.identity_cache.get_remaining(key)
+    return {
+        'value': _to_json(aide.identity_cache.get(key)),
+        'expire_time': time.time() + remaining if remaining is not None else None,
+    }
+
+
+def _to_json(value):
+    """ 将AttributeDict、bytes等转换为可以json序列化的值
+    """
+    if isinstance(value, Mapping):
+        return {key: _to_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_json(item) for item in value]
+    if isinstance(value, (bytes, bytearray)):
+        return HexBytes(value).hex()
+    return value
+
+
+def get_inner_contracts(web3) -> dict:
+    """ 获取web3中内置合约对象的名称 -> 内置合约对象
+    """
+    return {
+        'restricting': web3.restricting,
+        'staking': web3.ppos.staking,
+        'delegate': web3.ppos.delegate.delegateBase,
+        'delegate_reward': web3.ppos.delegate.delegateReward,
+        'slashing': web3.ppos.slashing,
+        'govern': web3.pip,
+    }
+
+
+class BootstrapSnapshot:
+    """ aide的启动快照，保存启动时需要从节点获取的数据，使新的aide可以不访问节点即完成启动，功能如下：
+    1. 保存链id、hrp、经济模型数据、内置合约地址和节点身份信息，以节点链接和创世区块hash为键保存在本地sqlite数据库中，
+       节点身份信息同时保存其过期时间，只在剩余有效期内恢复
+    2. 加载时默认只发送一个获取创世区块的请求，用于确认节点仍然是快照所属的链，链重置后不会使用旧链的快照
+    3. 不校验时完全不访问节点，适用于大量工作进程同时重启的场景
+
+    通过Aide的snapshot参数使用，用法如下：
+    aide = Aide(uri, snapshot='bootstrap.db')
+    """
+
+    def __init__(self, path='bootstrap.db'):
+        """
+        Args:
+            path: 快照数据库文件路径
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        if self._db:
+            self._db.close()
+            self._db = None
+
+    @staticmethod
+    def get_genesis_hash(aide: "Aide") -> str:
+        return HexBytes(aide.platon.get_block(0)['hash']).hex()
+
+    def get(self, endpoint, genesis_hash=None) -> dict:
+        """ 获取节点链接的快照数据，未指定创世区块hash时返回最新保存的快照，快照不存在时返回None
+        """
+        sql = 'SELECT data FROM snapshots WHERE endpoint = ?'
+        params = (endpoint,)
+        if genesis_hash:
+            sql, params = sql + ' AND genesis_hash = ?', params + (genesis_hash,)
+        with self._lock:
+            row = self._db.execute(sql + ' ORDER BY created_time DESC LIMIT 1', params).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, aide: "Aide") -> dict:
+        """ 保存aide的启动数据，尚未获取的组件会先从节点获取，返回保存的快照数据
+        """
+        # 节点关闭admin接口时，快照中不包含节点身份信息
+        for getter in (aide._node_info, aide._program_version):
+            try:
+                getter()
+            except Exception as e:
+                logger.debug(f'failed to get the node identity of {aide.uri}: {e}')
+
+        data = {
+            'endpoint': aide.uri,
+            'genesis_hash': self.get_genesis_hash(aide),
+            'chain_id': aide.chain_id,
+            'hrp': aide.hrp,
+            'economic': dataclasses.asdict(aide.economic) if aide.economic else None,
+            'inner_contracts': {name: contract.address for name, contract in get_inner_contracts(aide.web3).items()},
+            'identities': {key: _get_identity(aide, key) for key in IDENTITY_KEYS if key in aide.identity_cache},
+        }
+        with self._lock, self._db:
+            self._db.execute('INSERT OR REPLACE INTO snapshots (endpoint, genesis_hash, data, created_time) VALUES (?, ?, ?, ?)',
+                             (data['endpoint'], data['genesis_hash'], json.dumps(data), time.time()))
+        return data
+
+    def load(self, aide: "Aide", verify=True) -> bool:
+        """ 将快照数据设置到aide中，返回是否加载成功，没有可用的快照时返回False
+
+        Args:
+            aide: 需要加载快照的aide对象
+            verify: 是否获取创世区块，只加载同一条链的快照，为False时不访问节点，直接加载该链接最新的快照
+        """
+        genesis_hash = self.get_genesis_hash(aide) if verify else None
+        data = self.get(aide.uri, genesis_hash)
+        if not data:
+            logger.debug(f'no bootstrap snapshot of {aide.uri} in {self.path}, genesis hash: {genesis_hash}')
+            return False
+
+        apply_snapshot(aide, data)
+        return True
+
+
+def apply_snapshot(aide: "Aide", data: dict):
+    """ 将快照数据设置到aide中，已经构造的组件不会被覆盖
+    """
+    aide.web3._chain_id = data['chain_id']
+    aide.web3._hrp = data['hrp']
+    aide.__dict__.setdefault('chain_id', data['chain_id'])
+    aide.__dict__.setdefault('hrp', data['hrp'])
+    # 快照中没有经济模型数据时，仍然由组件尝试从节点获取
+    if data['economic']:
+        aide.__dict__.setdefault('economic', new_economic(data['economic']))
+
+    # 内置合约对象会缓存自己的地址，直接设置以免再次推导
+    inner_contracts = get_inner_contracts(aide.web3)
+    for name, address in data['inner_contracts'].items():
+        if name in inner_contracts:
+            inner_contracts[name]._address = address
+
+    # 节点身份信息只在缓存的剩余有效期内使用，不会因为从快照恢复而延长，已过期的不再恢复
+    for key, identity in data.get('identities', {}).items():
+        expire_time, value = identity['expire_time'], identity['value']
+        ttl = aide.identity_cache.ttl
+        if expire_time is not None:
+            remaining = expire_time - time.time()
+            if remaining <= 0:
+                continue
+            ttl = min(remaining, ttl) if ttl is not None else remaining
+        aide.identity_cache.set(key, AttributeDict.recursive(value) if isinstance(value, dict) else value, ttl=ttl)
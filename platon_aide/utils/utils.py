@@ -3,9 +3,9 @@ import json
 import os
 import sys
 from os.path import abspath
-from typing import cast
+from typing import Mapping, cast
 
-from platon import Web3, HTTPProvider, WebsocketProvider, IPCProvider
+from platon import Web3
 from platon._utils.threads import Timeout
 from platon.datastructures import AttributeDict
 from platon.exceptions import ContractLogicError
@@ -15,22 +15,25 @@ from gql import Client
 from gql.transport.aiohttp import AIOHTTPTransport
 from gql.transport.websockets import WebsocketsTransport
 
+from platon_aide.utils.provider import MultiProvider, get_provider
 
-def get_web3(uri, chain_id=None, hrp=None, timeout=10, modules=None):
+
+def get_web3(uri, chain_id=None, hrp=None, timeout=10, modules=None, check_connection=True):
     """ 通过rpc uri，获取web3对象。可以兼容历史platon版本
+    uri为列表时，使用多节点provider，详见MultiProvider
+    check_connection为False时，不检查节点是否可以连接，不会发送任何请求
     """
-    if uri.startswith('http'):
-        provider = HTTPProvider
-    elif uri.startswith('ws'):
-        provider = WebsocketProvider
-    elif uri.startswith('ipc'):
-        provider = IPCProvider
-    else:
-        raise ValueError(f'unidentifiable uri {uri}')
+    def new_provider():
+        if isinstance(uri, (list, tuple)):
+            return MultiProvider(uri)
+        return get_provider(uri)
+
+    if not check_connection:
+        return Web3(new_provider(), chain_id=chain_id, hrp=hrp, modules=modules)
 
     with Timeout(timeout) as t:
         while True:
-            web3 = Web3(provider(uri), chain_id=chain_id, hrp=hrp, modules=modules)
+            web3 = Web3(new_provider(), chain_id=chain_id, hrp=hrp, modules=modules)
             if web3.isConnected():
                 break
             t.sleep(1)
@@ -69,19 +72,14 @@ def contract_transaction(func_id=None, default_txn=None):
         def wrapper(self, *args, txn: dict = None, private_key=None, **kwargs):
             """
             """
-            # 合并交易体
-            if txn:
-                if default_txn:
-                    default_txn.update(txn)
-                    txn = default_txn
-            else:
-                txn = default_txn if default_txn else {}
+            # 合并交易体，使用副本，以免修改默认交易体
+            txn = dict(default_txn or {}, **(txn or {}))
 
             # 填充from地址，以免合约交易在预估gas时检验地址失败
             if not txn.get('from'):
-                account = self.aide.platon.account.from_key(private_key, hrp=self.aide.hrp) if private_key else self.aide.default_account
-                if account:
-                    txn['from'] = account.address
+                address = self.aide.get_address(private_key)
+                if address:
+                    txn['from'] = address
 
             # 构造合约方法对象
             if func.__name__ == 'fit_func':
@@ -91,6 +89,14 @@ def contract_transaction(func_id=None, default_txn=None):
                 # 内置合约有时候需要用到私钥信息，用于生成参数的默认值，如：staking
                 fn = func(self, *args, private_key=private_key, **kwargs)
 
+            # 通过gas策略获取gas，获取不到时，在构建交易时预估gas
+            strategy, key, learned = self.aide.gas_strategy, None, False
+            if strategy and not txn.get('gas'):
+                key = strategy.get_key(fn)
+                gas = strategy.get_gas(fn, key=key)
+                if gas:
+                    txn['gas'], learned = gas, True
+
             # 构建合约交易体dict
             try:
                 txn = fn.build_transaction(txn)
@@ -105,7 +111,20 @@ def contract_transaction(func_id=None, default_txn=None):
                     return cast(CodeData, AttributeDict.recursive(data))
                 raise e
 
-            return self._transaction_handler_(txn, func_id=func_id, private_key=private_key)
+            if key and not learned:
+                strategy.record(key, txn['gas'])
+
+            try:
+                result = self._transaction_handler_(txn, func_id=func_id, private_key=private_key)
+            except Exception as e:
+                # 使用缓存gas的交易发送失败时，丢弃缓存的gas，下次重新预估
+                if learned and key:
+                    strategy.invalidate(key)
+                raise e
+
+            if learned and key and isinstance(result, Mapping) and result.get('status') == 0 and result.get('gasUsed') == txn['gas']:
+                strategy.invalidate(key)
+            return result
 
         return wrapper
 
@@ -14,7 +14,10 @@ deps = {
         'platon_utils>=1.2.0',
         'rlp>=1.2.0',
         'gql>=3.0.0rc0',
-    ]
+    ],
+    'numpy': [
+        'numpy>=1.17.0',
+    ],
 }
 
 with open('./README.md', encoding='utf-8') as readme:
@@ -0,0 +1,59 @@
+import asyncio
+
+from platon.types import InnerFn
+
+from platon_aide import AsyncAide
+from tests.conftest import *
+
+
+def test_async_query():
+    async def main():
+        async_aide = await AsyncAide.connect(uri)
+        block_number = await async_aide.block_number
+        balances = await asyncio.gather(*[async_aide.transfer.get_balance(account.address) for _ in range(100)])
+        await async_aide.close()
+        return block_number, balances
+
+    block_number, balances = asyncio.run(main())
+    assert block_number > 0
+    assert len(set(balances)) == 1
+
+
+def test_async_transfer():
+    async def main():
+        async_aide = await AsyncAide.connect(uri)
+        async_aide.aide.set_default_account(account)
+        address = aide.platon.account.create().address
+        receipts = await asyncio.gather(*[async_aide.transfer.transfer(address, 1) for _ in range(20)])
+        await async_aide.close()
+        return receipts
+
+    receipts = asyncio.run(main())
+    assert all(receipt['status'] == 1 for receipt in receipts)
+
+
+def test_async_wait_block():
+    async def main():
+        async_aide = await AsyncAide.connect(uri)
+        block_number = await async_aide.block_number
+        await async_aide.wait_block(block_number + 10)
+        block_number_after = await async_aide.block_number
+        await async_aide.close()
+        return block_number_after - block_number
+
+    assert 10 <= asyncio.run(main()) < 15
+
+
+def test_async_native_query():
+    async def main():
+        async_aide = await AsyncAide.connect(uri)
+        balance = await async_aide.platon.get_balance(account.address)
+        block = await async_aide.platon.get_block(1)
+        verifiers = await async_aide.call_inner(aide.web3.ppos.staking.function(InnerFn.staking_getVerifierList, {}), block_identifier=block.number)
+        await async_aide.close()
+        return balance, block, verifiers
+
+    balance, block, verifiers = asyncio.run(main())
+    assert balance == aide.platon.get_balance(account.address)
+    assert block == aide.platon.get_block(1)
+    assert verifiers == aide.web3.ppos.staking.function(InnerFn.staking_getVerifierList, {}).call(block_identifier=1)
@@ -0,0 +1,151 @@
+import random
+import time
+from decimal import Decimal
+
+from loguru import logger
+
+from platon_aide.utils import ProducerIndex
+from tests.conftest import *
+
+
+def test_get_block_counts():
+    end_bn = aide.platon.block_number
+    start_bn = max(end_bn - 200, 1)
+    block_counts = aide.calculator.get_block_counts(start_bn, end_bn)
+    assert sum(block_counts.values()) == end_bn - start_bn
+
+    node_id = list(block_counts)[0]
+    assert aide.calculator.get_block_count(node_id, start_bn, end_bn, processes=0) == block_counts[node_id]
+    assert aide.ec_recover(start_bn) in block_counts
+
+
+def test_get_block_counts_benchmark():
+    """ 对比逐个区块获取、解析，与批量获取、多进程解析的耗时
+    """
+    end_bn = aide.platon.block_number
+    start_bn = max(end_bn - 1000, 1)
+
+    start = time.perf_counter()
+    sequential_counts = {}
+    for bn in range(start_bn, end_bn):
+        node_id = aide.ec_recover(bn)
+        sequential_counts[node_id] = sequential_counts.get(node_id, 0) + 1
+    sequential_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    block_counts = aide.calculator.get_block_counts(start_bn, end_bn)
+    parallel_time = time.perf_counter() - start
+
+    logger.info(f'{end_bn - start_bn} blocks, sequential: {sequential_time:.2f}s, parallel: {parallel_time:.2f}s')
+    assert block_counts == sequential_counts
+
+
+def test_producer_index(tmp_path):
+    path = str(tmp_path / 'producers.db')
+    end_bn = aide.platon.block_number - 10
+    start_bn = max(end_bn - 200, 1)
+
+    with ProducerIndex(aide, path, window=50) as index:
+        assert index.update(start_bn + 100, start_bn=start_bn) == start_bn + 100
+
+    # 重新打开后，从已索引的块高继续索引
+    with ProducerIndex(aide, path, window=50) as index:
+        assert index.indexed_height == start_bn + 100
+        block_counts = index.get_block_counts(start_bn, end_bn)
+        assert block_counts == aide.calculator.get_block_counts(start_bn, end_bn)
+        assert index.get_producer(start_bn) == aide.ec_recover(start_bn)
+
+        # 未指定范围时，从索引的起始块高查询到已确认的块高
+        block_counts = aide.calculator.get_block_counts(index=index)
+        assert sum(block_counts.values()) == index.indexed_height - start_bn + 1
+
+
+def test_get_period_infos():
+    block_numbers = list(range(1, 5000)) + [10 ** 12 + 7]
+    for period_type in ['round', 'consensus', 'epoch', 'increasing']:
+        periods, start_blocks, end_blocks = aide.calculator.get_period_infos(block_numbers, period_type)
+        assert list(zip(periods, start_blocks, end_blocks)) == [aide.calculator.get_period_info(bn, period_type) for bn in block_numbers]
+        assert list(zip(start_blocks, end_blocks)) == list(zip(*aide.calculator.get_periods_ends(periods, period_type)))
+
+
+def test_calc_rewards_benchmark():
+    """ 对比逐个使用Decimal计算奖励，与批量整数计算奖励的耗时，两者的结果需要完全一致
+    """
+    random.seed(0)
+    total_staking_reward, verifier_count, per_block_reward = 2_000_000 * 10 ** 18 + 12345, 25, 3 * 10 ** 18 + 7
+    block_counts = [random.randrange(0, 400) for _ in range(100)]
+    node_reward_ratios = [random.choice([0, 1234, 5000, 8000, 10000]) for _ in range(100)]
+    delegate_amounts = [random.randrange(10 ** 18, 10 ** 24) for _ in range(500)]
+    delegate_total_amount = sum(delegate_amounts)
+    # 参数为Decimal时，使用原有的Decimal运算
+    decimal_args = [Decimal(value) for value in (total_staking_reward, verifier_count, per_block_reward)]
+
+    start = time.perf_counter()
+    expected = []
+    for block_count, ratio in zip(block_counts, node_reward_ratios):
+        expected.append((aide.calculator.calc_node_reward(*decimal_args, block_count),
+                         aide.calculator.calc_staking_reward(*decimal_args, block_count, ratio),
+                         aide.calculator.calc_delegate_reward(*decimal_args, block_count, ratio),
+                         [aide.calculator.calc_delegate_reward(*decimal_args, block_count, ratio, delegate_total_amount, amount)
+                          for amount in delegate_amounts],
+                         ))
+    decimal_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    node_rewards, staking_rewards, delegate_rewards = aide.calculator.calc_rewards(total_staking_reward, verifier_count, per_block_reward,
+                                                                                   block_counts, node_reward_ratios)
+    results = [(node_reward, staking_reward, delegate_reward,
+                aide.calculator.calc_delegate_rewards(delegate_reward, delegate_amounts, delegate_total_amount))
+               for node_reward, staking_reward, delegate_reward in zip(node_rewards, staking_rewards, delegate_rewards)]
+    batch_time = time.perf_counter() - start
+
+    logger.info(f'{len(block_counts)} nodes, {len(delegate_amounts)} delegators, decimal: {decimal_time:.3f}s, batch: {batch_time:.3f}s')
+    assert results == expected
+
+    # 不同的周期参数下，批量整数计算的结果同样与Decimal一致
+    for _ in range(20):
+        args = (random.randrange(10 ** 18, 10 ** 25), random.randrange(1, 200), random.randrange(10 ** 15, 10 ** 20))
+        node_rewards, staking_rewards, delegate_rewards = aide.calculator.calc_rewards(*args, block_counts, node_reward_ratios)
+        decimal_args = [Decimal(value) for value in args]
+        assert node_rewards == [aide.calculator.calc_node_reward(*decimal_args, block_count) for block_count in block_counts]
+        assert staking_rewards == [aide.calculator.calc_staking_reward(*decimal_args, block_count, ratio)
+                                   for block_count, ratio in zip(block_counts, node_reward_ratios)]
+        assert delegate_rewards == [aide.calculator.calc_delegate_reward(*decimal_args, block_count, ratio)
+                                    for block_count, ratio in zip(block_counts, node_reward_ratios)]
+
+    # 整数参数的单次计算同样使用整数运算，结果与Decimal一致
+    block_count, ratio = block_counts[0], node_reward_ratios[0]
+    assert aide.calculator.calc_staking_reward(total_staking_reward, verifier_count, per_block_reward, block_count, ratio) == expected[0][1]
+
+
+def test_estimate_epoch_rewards():
+    """ 对比一次遍历的结算周期奖励估算，与逐个节点查询、计算的结果
+    """
+    epoch_reward = aide.calculator.estimate_epoch_rewards(processes=0)
+    start_bn, end_bn = aide.calculator.get_period_ends(epoch_reward.epoch, 'epoch')
+    assert (epoch_reward.start_block, epoch_reward.end_block) == (start_bn, end_bn)
+    assert sum(node.block_count for node in epoch_reward.nodes.values()) <= end_bn - start_bn + 1
+
+    total_staking_reward = epoch_reward.total_staking_reward
+    verifier_count = epoch_reward.verifier_count
+    per_block_reward = epoch_reward.per_block_reward
+    block_counts = aide.calculator.get_block_counts(start_bn, end_bn + 1, processes=0)
+    for node_id, node in epoch_reward.nodes.items():
+        assert node.block_count == block_counts.get(node_id, 0)
+        assert node.node_reward == aide.calculator.calc_node_reward(total_staking_reward, verifier_count, per_block_reward, node.block_count)
+        if node.delegate_total:
+            assert node.staking_reward == aide.calculator.calc_staking_reward(total_staking_reward, verifier_count, per_block_reward,
+                                                                              node.block_count, node.reward_ratio)
+        assert node.node_reward == node.staking_reward + node.delegate_reward
+
+    # 委托不存在时，委托分红为0
+    node_id = list(epoch_reward.nodes)[0]
+    delegate_reward = aide.calculator.estimate_epoch_rewards(epoch_reward.epoch, {node_id: [account.address]}, processes=0)
+    assert delegate_reward.nodes == epoch_reward.nodes
+    assert (node_id, account.address) in delegate_reward.delegators
+
+    # 使用出块节点索引时，尚未结束的结算周期只统计已确认的区块
+    current_epoch = aide.calculator.get_period_info(aide.platon.block_number, 'epoch')[0]
+    with ProducerIndex(aide, ':memory:', processes=0) as index:
+        epoch_reward = aide.calculator.estimate_epoch_rewards(current_epoch, index=index)
+        assert sum(node.block_count for node in epoch_reward.nodes.values()) == index.indexed_height - epoch_reward.start_block + 1
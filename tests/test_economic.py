@@ -1,5 +1,6 @@
 from decimal import Decimal
 
+from platon_aide.economic import new_economic
 from tests.conftest import *
 
 
@@ -193,3 +194,25 @@ def test_get_period_info():
                         block_number=block_number)
     assert end_block == period * 160
 
+
+def test_economic_constants():
+    economic = new_economic(aide.debug.economic_config())
+    constants = economic.constants
+    assert economic.constants is constants
+    assert constants.epoch_blocks == economic.epoch_consensus * economic.consensus_blocks
+    with pytest.raises(AttributeError):
+        constants.epoch_blocks = 1
+
+    # 参数变化后，派生常量重新计算，其他经济模型的派生常量不受影响
+    other = new_economic(aide.debug.economic_config())
+    other_constants = other.constants
+    economic.common.maxEpochMinutes *= 2
+    assert economic.constants is not constants
+    assert economic.epoch_consensus == (economic.common.maxEpochMinutes * 60) // economic.consensus_time
+    assert other.constants is other_constants
+
+    # 替换一部分参数后，派生常量同样重新计算
+    constants = economic.constants
+    economic.common = other.common
+    assert economic.constants is not constants
+    assert economic.constants.epoch_blocks == other_constants.epoch_blocks
@@ -1,3 +1,4 @@
+from platon_aide.economic import new_economic
 from tests.conftest import *
 
 
@@ -118,3 +119,16 @@ def test_get_govern_param():
     name = 'unStakeFreezeDuration'
     govern_param = aide.govern.get_govern_param(module=module, name=name)
     assert govern_param == '2'
+
+
+def test_economic_refresher():
+    economic = new_economic(aide.debug.economic_config())
+    refresher = aide.economic_refresher(economic=economic)
+    refresher.refresh()
+    assert refresher.refresh() == []
+
+    # 同一参数可能被多次修改，只有最后生效的参数变化，与链上可治理参数的值一致
+    latest_changes = {(change.module, change.name): change for change in refresher.changes}
+    for (module, name), change in latest_changes.items():
+        assert getattr(getattr(economic, module), name) == int(change.value) == int(aide.govern.get_govern_param(module, name))
+    assert all(change.active_block > aide.platon.block_number for change in refresher.pending)
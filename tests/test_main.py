@@ -1,5 +1,12 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import rlp
+from hexbytes import HexBytes
 from loguru import logger
 
+from platon_aide.base import defer_receipt
+from platon_aide.utils import GasStrategy, LogScanner
 from tests.conftest import *
 
 
@@ -9,6 +16,91 @@ def test_main():
     assert aide.chain_id == 201019
 
 
+def test_lazy_init():
+    lazy_aide = Aide(uri, lazy=True)
+    assert lazy_aide.startup_times.keys() == {'web3'}
+    assert 'transfer' not in vars(lazy_aide)
+
+    assert lazy_aide.transfer.get_balance(account.address) == aide.transfer.get_balance(account.address)
+    assert lazy_aide.startup_times.keys() == {'web3', 'transfer'}
+    assert lazy_aide.economic.epoch_blocks == aide.economic.epoch_blocks
+    assert set(aide.startup_times) == {'web3', *Aide.components()}
+
+
+def test_bootstrap_snapshot(tmp_path):
+    path = str(tmp_path / 'bootstrap.db')
+    first_aide = Aide(uri, snapshot=path)
+    assert not first_aide.snapshot_loaded
+
+    snapshot_aide = Aide(uri, snapshot=path)
+    assert snapshot_aide.snapshot_loaded
+    assert snapshot_aide.economic == first_aide.economic
+    assert (snapshot_aide.chain_id, snapshot_aide.hrp) == (first_aide.chain_id, first_aide.hrp)
+    assert snapshot_aide.staking.ADDRESS == first_aide.staking.ADDRESS
+    assert snapshot_aide.transfer.get_balance(account.address) == aide.transfer.get_balance(account.address)
+
+    # 不校验时，启动过程不访问节点
+    offline_aide = Aide('http://127.0.0.1:1', lazy=True, snapshot=path, verify_snapshot=False)
+    assert not offline_aide.snapshot_loaded
+    offline_aide = Aide(uri, lazy=True, snapshot=path, verify_snapshot=False)
+    assert offline_aide.snapshot_loaded and offline_aide.economic.epoch_blocks == aide.economic.epoch_blocks
+
+    # 节点身份信息只在保存时的剩余有效期内恢复，过期后不再恢复
+    assert 0 < snapshot_aide.identity_cache.get_remaining('node_info') <= first_aide.identity_cache.ttl
+    expired_path = str(tmp_path / 'expired.db')
+    Aide(uri, snapshot=expired_path, identity_ttl=0.5)
+    time.sleep(0.5)
+    expired_aide = Aide(uri, snapshot=expired_path)
+    assert expired_aide.snapshot_loaded and 'node_info' not in expired_aide.identity_cache
+
+
+def test_identity_cache():
+    node_id = aide.node_id
+    assert 'node_info' in aide.identity_cache
+    assert aide.node_id == node_id
+
+    aide.invalidate_identity()
+    assert 'node_info' not in aide.identity_cache
+    assert aide.node_id == node_id
+
+
+def test_multi_endpoint():
+    multi_aide = Aide([uri, consensus_uri, 'http://127.0.0.1:1'])
+    provider = multi_aide.web3.provider
+    assert multi_aide.uri == uri
+
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        balances = list(executor.map(multi_aide.transfer.get_balance, [account.address] * 100))
+    assert len(set(balances)) == 1
+
+    # 不可用的节点被移出轮换，查询请求分布在其他节点上
+    assert [endpoint.healthy for endpoint in provider.endpoints] == [True, True, False]
+    assert all(endpoint.requests > 10 for endpoint in provider.endpoints[:2])
+    # 节点相关的请求固定在主节点执行
+    assert multi_aide.node_id == aide.node_id
+
+
+def test_primary_switch_during_fetch_nonce():
+    multi_aide = Aide([uri, consensus_uri])
+    provider = multi_aide.web3.provider
+    nonce_manager = multi_aide.nonce_manager
+    fetch_nonce = nonce_manager.fetch_nonce
+
+    def switch_and_fetch(address):
+        # 同步nonce的请求中切换主节点，切换回调会重新同步全部通道
+        provider.endpoints[0].healthy = False
+        return fetch_nonce(address)
+
+    nonce_manager.fetch_nonce = switch_and_fetch
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        nonce = executor.submit(nonce_manager.next_nonce, account.address).result(timeout=30)
+    assert provider.primary is provider.endpoints[1]
+
+    # 同步期间被标记重新同步，下一次分配时重新同步，而不是继续递增
+    nonce_manager.fetch_nonce = fetch_nonce
+    assert nonce_manager.next_nonce(account.address) == nonce
+
+
 def test_set_returns():
     aide.set_result_type('receipt')
     address = aide.platon.account.create().address
@@ -44,11 +136,244 @@ def test_wait_block():
     assert 0 <= block_number_after - block_number - 160 < 5
 
 
+def test_wait_block_concurrently():
+    block_number = aide.platon.block_number
+    targets = [block_number + i % 5 + 1 for i in range(20)]
+    with ThreadPoolExecutor(max_workers=20) as executor:
+        list(executor.map(aide.wait_block, targets))
+    assert aide.platon.block_number > max(targets)
+    assert aide.head_watcher.block_number > max(targets)
+
+
 def test_ec_recover():
     node_id = aide.ec_recover(1)
     assert node_id
 
 
+def test_nonce_manager():
+    aide.set_result_type('hash')
+    address = aide.platon.account.create().address
+    nonce = aide.nonce_manager.fetch_nonce(aide.default_account.address)
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        tasks = [executor.submit(aide.transfer.transfer, to_address=address, amount=1) for _ in range(50)]
+        tx_hashes = [task.result() for task in tasks]
+    nonces = [aide.platon.get_transaction(tx_hash).nonce for tx_hash in tx_hashes]
+    assert sorted(nonces) == list(range(nonce, nonce + 50))
+    aide.set_result_type('auto')
+
+
+def test_send_known_transaction():
+    address = aide.platon.account.create().address
+    nonce = aide.nonce_manager.fetch_nonce(aide.default_account.address)
+    txn = {'to': address, 'value': 1, 'gas': 21000, 'gasPrice': aide.platon.gas_price, 'chainId': aide.chain_id, 'nonce': nonce}
+    tx_hash = aide.send_transaction(dict(txn))
+    assert aide.send_transaction(dict(txn)) == tx_hash
+    aide.platon.wait_for_transaction_receipt(tx_hash)
+
+
+def test_batch():
+    addresses = [aide.platon.account.create().address for _ in range(200)]
+    with aide.batch() as batch:
+        futures = [batch.add(aide.transfer.get_balance, address) for address in addresses]
+        error = batch.add(aide.platon.get_block, 10 ** 10)
+        block = batch.add(aide.platon.get_block, 0)
+    assert [future.result() for future in futures] == [0] * 200
+    assert error.exception()
+    # 批量请求的结果同样经过其他中间件的处理
+    assert block.result() == aide.platon.get_block(0)
+    assert batch.collector.batch_count < 200
+
+    # 工作线程数与批量大小无关，大批量不会创建同样多的线程
+    with aide.batch(size=500) as batch:
+        futures = batch.map(aide.transfer.get_balance, addresses)
+    assert batch.collector.workers <= 32
+    assert [future.result() for future in futures] == [0] * 200
+
+
+def test_receipt_tracker():
+    addresses = [aide.platon.account.create().address for _ in range(20)]
+    with defer_receipt():
+        pending_transactions = [aide.transfer.transfer(address, 1) for address in addresses]
+
+    with aide.receipt_tracker() as tracker:
+        futures = tracker.track_all(pending_transactions)
+    assert [future.result().status for future in futures] == [1] * 20
+
+    stats = tracker.stats()
+    logger.info(stats)
+    assert stats['confirmed'] == 20
+    assert stats['pending'] == 0
+
+
+def test_register_account():
+    new_account = aide.create_account()
+    registered = aide.register_account(new_account.key)
+    assert registered.address == new_account.address
+    assert aide.account_cache.get_account(new_account.key) is registered
+    assert aide.get_address(new_account.key) == new_account.address
+
+    aide.unregister_account(new_account.address)
+    assert aide.account_cache.get_account(new_account.key) is None
+    assert aide.get_address(new_account.key) == new_account.address
+
+
+def test_pipeline():
+    accounts = [aide.create_account() for _ in range(10)]
+    with aide.pipeline(sign_processes=2) as pipeline:
+        for new_account in accounts:
+            pipeline.submit_call(aide.transfer.transfer, new_account.address, 10 ** 18, private_key=account.key)
+    tx_hashes = pipeline.results(raise_error=True)
+    logger.info(f'pipeline stats: {pipeline.stats()}')
+
+    with aide.receipt_tracker() as tracker:
+        futures = tracker.track_all(tx_hashes)
+    assert all(future.result()['status'] == 1 for future in futures)
+    assert all(aide.transfer.get_balance(new_account.address) == 10 ** 18 for new_account in accounts)
+
+
+def test_gas_strategy():
+    aide.set_gas_strategy(GasStrategy())
+    try:
+        address = aide.platon.account.create().address
+        plans = [{'Epoch': 1, 'Amount': 10 ** 18}, {'Epoch': 2, 'Amount': 10 ** 18}]
+        result = aide.restricting.restricting(address, plans, private_key=account.key)
+        assert result['status'] == 1
+        assert aide.gas_strategy.hits == 1
+
+        # 不在gas表中的内置合约方法，每次都预估gas，不使用缓存
+        for _ in range(2):
+            aide.delegate.withdraw_delegate_reward(private_key=account.key)
+        assert (aide.gas_strategy.hits, aide.gas_strategy.misses) == (1, 2)
+    finally:
+        aide.set_gas_strategy(None)
+
+
+def test_contract_factory_benchmark():
+    """ 对比每次构造web3合约对象，与通过缓存的合约类绑定地址的耗时
+    """
+    abi = [{"inputs": [{"name": "owner", "type": "address"}], "name": "balanceOf", "outputs": [{"name": "", "type": "uint256"}],
+            "stateMutability": "view", "type": "function"},
+           {"inputs": [{"name": "to", "type": "address"}, {"name": "amount", "type": "uint256"}], "name": "transfer",
+            "outputs": [{"name": "", "type": "bool"}], "stateMutability": "nonpayable", "type": "function"}]
+    addresses = [aide.create_account().address for _ in range(1000)]
+
+    start = time.perf_counter()
+    for address in addresses:
+        aide.web3.platon.contract(address=address, abi=abi)
+    origin_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    factory = aide.contract.get_factory(abi)
+    contracts = [factory.bind(address) for address in addresses]
+    factory_time = time.perf_counter() - start
+
+    logger.info(f'bind {len(addresses)} contracts, origin: {origin_time:.3f}s, factory: {factory_time:.3f}s')
+    assert {type(contract) for contract in contracts} == {factory.contract_class}
+    assert [contract.contract_address for contract in contracts] == addresses
+    assert aide.contract.get_factory(abi) is factory
+
+
+def test_contract_bind_threads():
+    abis = [[{"inputs": [], "name": name, "outputs": [{"name": "", "type": "uint256"}], "stateMutability": "view", "type": "function"}]
+            for name in ('getChainID', 'totalSupply')]
+    addresses = [aide.create_account().address for _ in abis]
+
+    def bind(i):
+        return aide.contract.init(abis[i % 2], address=addresses[i % 2])
+
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        contracts = list(executor.map(bind, range(200)))
+
+    # 多个线程同时绑定后，合约类和地址仍然属于同一个合约
+    assert all(contract is aide.contract for contract in contracts)
+    assert aide.contract.abi == abis[addresses.index(aide.contract.contract_address)]
+
+
+def test_decode_receipts_benchmark():
+    """ 对比逐个解析内置合约交易回执，与批量解析的耗时，两者的解析结果需要一致
+    """
+    def encode_int(value):
+        return rlp.encode(value.to_bytes((value.bit_length() + 7) // 8 or 1, 'big'))
+
+    receipts, func_ids = [], []
+    for i in range(10000):
+        if i % 2:
+            # 撤销委托
+            data = rlp.encode([b'0'] + [encode_int(10 ** 18 + i), encode_int(i), encode_int(0), encode_int(0), encode_int(0)])
+            func_ids.append(1005)
+        else:
+            # 领取委托奖励
+            rewards = [[bytes([j]) * 64, i.to_bytes(4, 'big'), (10 ** 17 + i).to_bytes(8, 'big')] for j in range(3)]
+            data = rlp.encode([b'0', rlp.encode(rewards)])
+            func_ids.append(5000)
+        receipts.append({'transactionHash': HexBytes(i.to_bytes(32, 'big')), 'blockNumber': i, 'logs': [{'data': '0x' + data.hex()}]})
+
+    start = time.perf_counter()
+    results = [aide.decode_data(receipt, func_id) for receipt, func_id in zip(receipts, func_ids)]
+    origin_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    events = aide.decode_receipts(receipts, func_ids)
+    batch_time = time.perf_counter() - start
+
+    logger.info(f'decode {len(receipts)} receipts, origin: {origin_time:.3f}s, batch: {batch_time:.3f}s')
+    for result, event in zip(results, events):
+        assert (result.code, result.message) == (event.code, event.message)
+        data = [dict(item) for item in result.data] if isinstance(event.data, list) else dict(result.data)
+        assert data == event.data
+
+
+def test_multicall():
+    abi = [{"inputs": [{"name": "owner", "type": "address"}], "name": "balanceOf", "outputs": [{"name": "", "type": "uint256"}],
+            "stateMutability": "view", "type": "function"}]
+    # 地址上没有合约，每个调用都会失败，但不影响整个批量调用
+    factory = aide.contract.get_factory(abi)
+    contracts = [factory.bind(aide.create_account().address) for _ in range(10)]
+    results = aide.contract.multicall([contract.prepare('balanceOf', account.address) for contract in contracts])
+    assert len(results) == 10
+    assert all(isinstance(result, Exception) for result in results)
+
+
+def test_result_cache(tmp_path):
+    path = str(tmp_path / 'results.db')
+    block_number = aide.platon.block_number - 20
+    cache = aide.enable_result_cache(path=path)
+    try:
+        balance = aide.transfer.get_balance(account.address, block_number)
+        block = aide.platon.get_block(block_number)
+        assert aide.transfer.get_balance(account.address, block_number) == balance
+        assert aide.platon.get_block(block_number) == block
+        assert cache.hits == 2
+
+        # latest不会被缓存
+        aide.transfer.get_balance(account.address)
+        assert cache.hits == 2
+    finally:
+        aide.disable_result_cache()
+
+    new_aide = Aide(uri)
+    cache = new_aide.enable_result_cache(path=path)
+    try:
+        assert new_aide.platon.get_block(block_number) == block
+        assert cache.hits == 1
+    finally:
+        new_aide.disable_result_cache()
+
+
+def test_scan_events(tmp_path):
+    abi = [{"anonymous": False, "inputs": [{"indexed": False, "name": "_chainId", "type": "uint256"}], "name": "_putChainID", "type": "event"}]
+    contract = aide.contract.init(abi, address=aide.create_account().address)
+    path = str(tmp_path / 'logs.db')
+    to_block = aide.platon.block_number - 10
+    # 地址上没有合约，没有事件，但会记录检查点
+    events = list(contract.scan_events(from_block=to_block - 1000, to_block=to_block, chunk_size=100, path=path, processes=0))
+    assert events == []
+
+    with LogScanner(aide, address=contract.contract_address, abi=abi, path=path, processes=0) as scanner:
+        assert scanner.checkpoint == to_block
+        assert list(scanner.scan(0, to_block)) == []
+
+
 def test_set_default_account():
     account = Account().from_key(private_key='f90fd6808860fe869631d978b0582bb59db6189f7908b578a886d582cb6fccfa',
                                  hrp='lat')
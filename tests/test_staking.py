@@ -12,6 +12,12 @@ def test_staking_info():
     assert status is False
 
 
+def test_get_staking_block_number():
+    staking_block_number = consensus_aide.staking.get_staking_block_number()
+    assert staking_block_number == consensus_aide.staking.staking_info.StakingBlockNum
+    assert ('staking_block_number', consensus_aide.node_id) in consensus_aide.identity_cache
+
+
 def test_create_staking():
     # aide.staking.set_default_account(account)
     result = aide.staking.create_staking(
@@ -7,6 +7,16 @@ def test_transfer():
     assert transfer_result['status'] == 1
 
 
+def test_bulk_transfer():
+    addresses = [aide.platon.account.create().address for _ in range(100)]
+    bulk = aide.transfer.bulk_transfer(((address, 10 ** 18) for address in addresses), window=20)
+    results = list(bulk)
+    assert sorted(to_address for to_address, _, _ in results) == sorted(addresses)
+    assert all(result['status'] == 1 for _, _, result in results)
+    stats = bulk.stats()
+    assert stats['confirmed'] == 100 and stats['tps'] > 0
+
+
 def test_restricting():
     address = aide.platon.account.create().address
     amount = aide.staking._economic.staking_limit